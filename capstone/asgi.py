@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'capstone.settings')
 
 application = get_asgi_application()
+
+from capstone.startup import prepare_worker  # noqa: E402  (needs Django set up)
+
+prepare_worker()
@@ -5,8 +5,9 @@ Generated by 'django-admin startproject' using Django 4.0.4.
 """
 
 from pathlib import Path
+import importlib.util
 import os
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +39,7 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'sports.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,6 +66,26 @@ TEMPLATES = [
     },
 ]
 
+# Optional Jinja2 engine for the hottest templates (sports/jinja2/). List the
+# template names to render with it, e.g.
+# JINJA2_TEMPLATES=sports/index.html,sports/event_detail.html
+# Falls back to the Django engine when Jinja2 is not installed.
+JINJA2_TEMPLATES = config('JINJA2_TEMPLATES', default='', cast=Csv())
+
+if importlib.util.find_spec('jinja2'):
+    TEMPLATES.append({
+        'NAME': 'jinja2',
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'environment': 'sports.jinja2_env.environment',
+            'context_processors': TEMPLATES[0]['OPTIONS']['context_processors'],
+        },
+    })
+else:
+    JINJA2_TEMPLATES = []
+
 WSGI_APPLICATION = 'capstone.wsgi.application'
 
 # Database
@@ -74,6 +96,52 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL, tuned pragmas, persistent connections and
+# BEGIN IMMEDIATE so concurrent writers queue on the busy timeout instead of
+# failing with "database is locked". Enabled by default when DEBUG is off.
+SQLITE_PRODUCTION = config('SQLITE_PRODUCTION', default=not DEBUG, cast=bool)
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,         # milliseconds
+    'cache_size': -20000,         # negative means KiB, so ~20 MB
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        },
+    })
+
+# Bounded retry policy for write views that still hit a lock error
+SQLITE_WRITE_RETRIES = config('SQLITE_WRITE_RETRIES', default=3, cast=int)
+SQLITE_RETRY_BACKOFF = 0.05  # seconds, doubled on every attempt
+
+# Write budgets per user (or per IP when anonymous): scope -> (requests, seconds)
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'attendance': (30, 60),
+    'attendance_batch': (10, 60),
+    'comment': (10, 60),
+    'create_event': (20, 3600),
+    # Per IP; load tests log every virtual user in from one address
+    'login': (config('LOGIN_RATE_LIMIT', default=10, cast=int), 300),
+}
+
+# Most events one batch join/leave request may change
+ATTENDANCE_BATCH_MAX = config('ATTENDANCE_BATCH_MAX', default=50, cast=int)
+
+# Concurrent write requests allowed per worker process before answering 503
+WRITE_CONCURRENCY_LIMIT = config('WRITE_CONCURRENCY_LIMIT', default=8, cast=int)
+
 AUTH_USER_MODEL = "sports.User"
 
 # Password validation
@@ -102,9 +170,104 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Outside DEBUG, collectstatic writes content-hashed names plus .gz/.br
+# siblings, and the app serves them itself with far-future cache headers.
+STORAGES = {
+    # Uploads are stored once per distinct content (see sports.storage)
+    'default': {
+        'BACKEND': 'sports.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'sports.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+SERVE_STATIC = config('SERVE_STATIC', default=not DEBUG, cast=bool)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploaded files are served by sports.serving.serve_media. Set to 'nginx' or
+# 'apache' to let the front proxy send the body via X-Accel-Redirect/X-Sendfile.
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default='')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
+# Cache-Control per media sub-directory (first matching prefix wins)
+MEDIA_CACHE_CONTROL = {
+    'events/': 'public, max-age=86400',
+    'profile_pics/': 'public, max-age=3600, must-revalidate',
+    # Content-addressed: a name never changes content
+    'blobs/': 'public, max-age=31536000, immutable',
+}
+MEDIA_DEFAULT_CACHE_CONTROL = 'public, max-age=300'
+
+# E-mail
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='Playfield <noreply@localhost>')
+
+# Absolute base for links in e-mails
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+
+# Changes to an event within this window are merged into one notification
+NOTIFICATION_COALESCE_SECONDS = config('NOTIFICATION_COALESCE_SECONDS', default=300, cast=int)
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=100, cast=int)
+# Attempts at sending a notification before it is marked failed
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+
+# Default cache shared by all worker processes on this host through its own
+# SQLite file (sports/sharedcache.py), so no cache server is needed. Keep the
+# file in a directory only the app's user can write to.
+# Off in development, where Django's per-process LocMemCache is used.
+SHARED_CACHE = config('SHARED_CACHE', default=not DEBUG, cast=bool)
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'sports.sharedcache.SQLiteCache',
+            'LOCATION': config('SHARED_CACHE_PATH', default=str(BASE_DIR / 'cache.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': config('SHARED_CACHE_MAX_ENTRIES', default=10000, cast=int),
+            },
+        },
+    }
+
+# Index pages and event pages are cached per version of their data this long
+SUMMARY_CACHE_SECONDS = config('SUMMARY_CACHE_SECONDS', default=300, cast=int)
+
+# Facet counts on the index are cached per filter combination this long
+FACET_CACHE_SECONDS = config('FACET_CACHE_SECONDS', default=60, cast=int)
+
+# In-memory typeahead index, rebuilt in the background at most this often
+TYPEAHEAD_INDEX = config('TYPEAHEAD_INDEX', default=True, cast=bool)
+TYPEAHEAD_REBUILD_SECONDS = config('TYPEAHEAD_REBUILD_SECONDS', default=900, cast=int)
+
+# Recurring events are materialized this many days ahead by `materialize_series`
+SERIES_HORIZON_DAYS = config('SERIES_HORIZON_DAYS', default=56, cast=int)
+
+# Per-process LRU of user avatar/profile-link cards and how long each is trusted
+USER_CARD_CACHE_SIZE = config('USER_CARD_CACHE_SIZE', default=10000, cast=int)
+USER_CARD_TTL_SECONDS = config('USER_CARD_TTL_SECONDS', default=300, cast=int)
+
+# Brotli/gzip for text responses (streaming ones included) of at least this many bytes
+RESPONSE_COMPRESSION = config('RESPONSE_COMPRESSION', default=True, cast=bool)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=512, cast=int)
+
+# Collapse indentation in HTML from the sports views of at least this many bytes.
+# Off by default: once compressed it saves under 1% for 2-3x the CPU (bench_compression)
+HTML_MINIFY = config('HTML_MINIFY', default=False, cast=bool)
+HTML_MINIFY_MIN_SIZE = config('HTML_MINIFY_MIN_SIZE', default=2048, cast=int)
+
+# `gc_media`: cancelled events are purged this many days after their date, and
+# unreferenced media files are only deleted once older than the grace period
+CANCELLED_EVENT_RETENTION_DAYS = config('CANCELLED_EVENT_RETENTION_DAYS', default=180, cast=int)
+MEDIA_GC_GRACE_HOURS = config('MEDIA_GC_GRACE_HOURS', default=24, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
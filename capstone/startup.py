@@ -0,0 +1,27 @@
+"""
+Work done once per server process, before it serves requests.
+
+Called from the WSGI and ASGI entry points after Django is set up, and so
+before a preloading server (e.g. gunicorn --preload) forks its workers.
+"""
+import gc
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+def prepare_worker():
+    if settings.TYPEAHEAD_INDEX:
+        from sports.typeahead import typeahead
+        try:
+            typeahead.rebuild()
+        except DatabaseError:
+            # e.g. migrations not applied yet: the first search builds it
+            pass
+        # Forked workers must open their own database connections
+        connections.close_all()
+    # Everything loaded so far, the search index included, lives as long as
+    # the process: keep it out of the cyclic GC's full passes, which would
+    # also touch, and so copy, memory a forking server shares with its
+    # workers. Once, here; later rebuilds are collected as usual.
+    gc.freeze()
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'capstone.settings')
 
 application = get_wsgi_application()
+
+from capstone.startup import prepare_worker  # noqa: E402  (needs Django set up)
+
+prepare_worker()
@@ -1,7 +1,145 @@
 from django.contrib import admin
-from .models import *
+from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-# Register your models here.
-admin.site.register(User)
-admin.site.register(Events)
+from .models import User, Events, EventComment, EventSeries, WaitlistEntry
+from . import agenda, rollups
+from .notifications import enqueue_event_changes
+from .recurrence import materialize, sync_future_occurrences
 
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that skips COUNT(*) on unfiltered changelists of large tables.
+
+    PostgreSQL's planner statistics are used when available, otherwise the
+    highest primary key (a single index lookup). Small tables and filtered
+    changelists still get an exact count.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = self._estimate(queryset.model)
+            if estimate and estimate > self.exact_count_threshold:
+                return estimate
+        return super().count
+
+    def _estimate(self, model):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                return row[0] if row else None
+        return model._default_manager.aggregate(highest=Max('pk'))['highest']
+
+
+@admin.register(User)
+class PlayfieldUserAdmin(UserAdmin):
+    fieldsets = UserAdmin.fieldsets + (
+        ('Profile', {'fields': ('bio', 'favorite_sports', 'profile_picture')}),
+    )
+    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'hosted_count')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(hosted_count=Count('events_hosted'))
+
+    @admin.display(description='Hosted events', ordering='hosted_count')
+    def hosted_count(self, obj):
+        return obj.hosted_count
+
+
+@admin.register(Events)
+class EventsAdmin(admin.ModelAdmin):
+    list_display = (
+        'title', 'date', 'start', 'category', 'skill_level', 'host',
+        'attendee_count', 'max_attendees', 'is_cancelled', 'is_archived',
+    )
+    list_select_related = ('host',)
+    list_filter = ('category', 'skill_level', 'is_cancelled', 'is_archived')
+    date_hierarchy = 'date'
+    search_fields = ('title', 'host__username')
+    raw_id_fields = ('host', 'attendees')
+    readonly_fields = ('starts_at', 'timestamp', 'created_at', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['cancel_events', 'archive_events']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_attendee_count()
+
+    def save_related(self, request, form, formsets, change):
+        # After the attendees are saved, so a raised max_attendees or a
+        # removed attendee hands the free spots to the waitlist in the same
+        # transaction
+        super().save_related(request, form, formsets, change)
+        if change:
+            form.instance.fill_from_waitlist()
+
+    @admin.display(description='Attending', ordering='attendee_count')
+    def attendee_count(self, obj):
+        return obj.attendee_count
+
+    @admin.action(description='Cancel selected events')
+    def cancel_events(self, request, queryset):
+        # One UPDATE for the whole selection; updated_at is bumped by hand
+        # because update() skips auto_now
+        to_cancel = list(queryset.filter(is_cancelled=False).values_list('pk', flat=True))
+        with transaction.atomic(), rollups.track(Events.objects.filter(pk__in=to_cancel)):
+            updated = Events.objects.filter(pk__in=to_cancel).update(is_cancelled=True, updated_at=timezone.now())
+            agenda.sync_events(to_cancel)
+            enqueue_event_changes(to_cancel, cancelled=True, actor=request.user)
+        self.message_user(request, f"Cancelled {updated} event(s).")
+
+    @admin.action(description='Archive selected events')
+    def archive_events(self, request, queryset):
+        updated = queryset.filter(is_archived=False).update(is_archived=True, updated_at=timezone.now())
+        self.message_user(request, f"Archived {updated} event(s).")
+
+
+@admin.register(EventSeries)
+class EventSeriesAdmin(admin.ModelAdmin):
+    list_display = ('title', 'host', 'frequency', 'starts_on', 'until', 'materialized_until')
+    list_select_related = ('host',)
+    list_filter = ('frequency', 'category')
+    search_fields = ('title', 'host__username')
+    raw_id_fields = ('host',)
+    readonly_fields = ('materialized_until', 'created_at', 'updated_at')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            sync_future_occurrences(obj, actor=request.user)
+        materialize(series_ids=[obj.pk])
+
+
+@admin.register(EventComment)
+class EventCommentAdmin(admin.ModelAdmin):
+    list_display = ('author', 'event', 'created_at')
+    list_select_related = ('author', 'event')
+    raw_id_fields = ('event', 'author')
+    search_fields = ('content', 'author__username')
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'event', 'created_at')
+    list_select_related = ('user', 'event')
+    raw_id_fields = ('event', 'user')
+    search_fields = ('user__username', 'event__title')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
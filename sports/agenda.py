@@ -0,0 +1,102 @@
+"""
+Per-user agenda rows, kept in step with hosting and attendance.
+
+Every host and attendee of an event has one AgendaEntry holding the
+event's start and end. Cancelled events keep their rows, so My Events and
+profiles still list them with a "Cancelled" badge. Signals in signals.py call
+these helpers when attendees are added or removed and when an event is
+saved. Set-based UPDATEs (series edits, admin actions) call `sync_events`
+themselves, since they bypass signals.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MAX_EVENT_LENGTH, AgendaEntry, Events
+
+# The agenda index's own column order, so rows come out of it presorted
+INDEX_ORDER = ('starts_at', 'ends_at', 'is_host', 'event_id')
+
+
+def event_span(event):
+    """Return the (start, end) Events.save() stored for an event."""
+    return event.starts_at, event.timestamp
+
+
+def _entries(event, user_ids):
+    starts_at, ends_at = event_span(event)
+    return [
+        AgendaEntry(
+            user_id=user_id, event_id=event.pk, starts_at=starts_at, ends_at=ends_at,
+            is_host=user_id == event.host_id
+        )
+        for user_id in user_ids
+    ]
+
+
+def add_attendees(event_ids, user_ids):
+    """Add the agenda rows for users who joined events."""
+    events = Events.objects.filter(pk__in=event_ids).only('starts_at', 'timestamp', 'host_id')
+    entries = [entry for event in events for entry in _entries(event, user_ids)]
+    AgendaEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def add_hosts(event_ids):
+    """Add the hosts' rows for newly created events."""
+    events = Events.objects.filter(pk__in=event_ids).only('starts_at', 'timestamp', 'host_id')
+    entries = [entry for event in events for entry in _entries(event, [event.host_id])]
+    AgendaEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def remove_attendees(event_ids, user_ids=None):
+    """Drop the rows of users who left events; hosts keep theirs."""
+    entries = AgendaEntry.objects.filter(event_id__in=event_ids, is_host=False)
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+
+
+def sync_events(event_ids):
+    """
+    Rebuild the agenda rows of whole events from the events and attendees
+    tables: times and host flag.
+    """
+    event_ids = list(event_ids)
+    Attendance = Events.attendees.through
+    attendees = {}
+    for event_id, user_id in Attendance.objects.filter(events_id__in=event_ids).values_list('events_id', 'user_id'):
+        attendees.setdefault(event_id, set()).add(user_id)
+
+    entries = []
+    for event in Events.objects.filter(pk__in=event_ids).only('starts_at', 'timestamp', 'host_id'):
+        entries.extend(_entries(event, attendees.get(event.pk, set()) | {event.host_id}))
+
+    with transaction.atomic():
+        AgendaEntry.objects.filter(event_id__in=event_ids).delete()
+        AgendaEntry.objects.bulk_create(entries, batch_size=500)
+
+
+def upcoming_entries(user, now=None):
+    """
+    (event id, is host) pairs for events the user hosts or attends that
+    have not ended, in start order, read from the agenda index alone.
+    """
+    now = now or timezone.now()
+    return AgendaEntry.objects.filter(
+        user=user, starts_at__gte=now - MAX_EVENT_LENGTH, ends_at__gte=now
+    ).order_by(*INDEX_ORDER).values_list('event_id', 'is_host')
+
+
+def recent_entries(user, limit, hosting=False):
+    """(event id, is host) pairs for the user's latest events, newest first."""
+    entries = AgendaEntry.objects.filter(user=user)
+    if hosting:
+        entries = entries.filter(is_host=True)
+    return entries.order_by(*('-' + field for field in INDEX_ORDER)).values_list('event_id', 'is_host')[:limit]
+
+
+def events_for(entries, queryset=None):
+    """Load the events of (event id, is host) pairs, keeping agenda order."""
+    entries = list(entries)
+    queryset = queryset if queryset is not None else Events.objects.all()
+    events = queryset.in_bulk([event_id for event_id, _ in entries])
+    return [events[event_id] for event_id, _ in entries if event_id in events]
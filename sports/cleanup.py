@@ -0,0 +1,226 @@
+"""
+Chunked, throttled cleanup of orphaned media files and long-cancelled events.
+
+Nothing deletes an upload when its event or avatar is replaced or
+deleted, and content-addressed blobs are shared between rows, so
+`find_orphans` compares MEDIA_ROOT with the file names the database still
+references. `purge_cancelled_events` deletes old cancelled events in
+bounded transactions and records its position in a MaintenanceCheckpoint,
+so an interrupted run picks up where it stopped. Both jobs work in batches
+paced by a Throttle, and both have a dry run that only reports. The
+`gc_media` command runs them.
+"""
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+
+from .demo import STOCK_MEDIA
+from .models import Events, MaintenanceCheckpoint, MediaBlob
+
+
+class Throttle:
+    """Keeps a job at or below `per_second` items per second by sleeping between batches."""
+
+    def __init__(self, per_second=None, sleep=time.sleep, clock=time.monotonic):
+        self.per_second = per_second
+        self._sleep = sleep
+        self._clock = clock
+        self._started = clock()
+        self._done = 0
+
+    def wait(self, count):
+        """Account for `count` items just processed, sleeping if ahead of the rate."""
+        if not self.per_second:
+            return
+        self._done += count
+        ahead = self._done / self.per_second - (self._clock() - self._started)
+        if ahead > 0:
+            self._sleep(ahead)
+
+
+def file_fields():
+    """(model, field) for every file field in the app."""
+    for model in apps.get_app_config('sports').get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def referenced_media(chunk_size=2000):
+    """Counter of the media file names the database references, streamed in chunks."""
+    names = Counter()
+    for model, field in file_fields():
+        rows = model._base_manager.exclude(**{f'{field.name}__isnull': True}).exclude(**{field.name: ''})
+        names.update(rows.values_list(field.name, flat=True).iterator(chunk_size=chunk_size))
+    return names
+
+
+def media_directories():
+    """The upload_to and blob directories under MEDIA_ROOT; nothing else is touched."""
+    directories = {field.upload_to.strip('/') for _, field in file_fields() if isinstance(field.upload_to, str)}
+    blob_directory = getattr(default_storage, 'blob_directory', None)
+    if blob_directory:
+        directories.add(blob_directory)
+    return sorted(directories)
+
+
+def walk_media(root, directory):
+    """Yield (name relative to root, DirEntry) for every file below `directory`."""
+    try:
+        entries = os.scandir(os.path.join(root, directory))
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            name = f"{directory}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_media(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry
+
+
+def find_orphans(grace=None, now=None, referenced=None):
+    """
+    Yield (name, size) for media files no row references. The referenced set
+    is read before the walk, and files modified within `grace` are skipped,
+    so an upload whose row is still being saved is never taken for an orphan.
+    """
+    grace = grace if grace is not None else timedelta(hours=settings.MEDIA_GC_GRACE_HOURS)
+    cutoff = (now or time.time()) - grace.total_seconds()
+    referenced = referenced if referenced is not None else referenced_media()
+    for directory in media_directories():
+        for name, entry in walk_media(settings.MEDIA_ROOT, directory):
+            if name in referenced or name in STOCK_MEDIA:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime < cutoff:
+                yield name, stat.st_size
+
+
+def delete_orphans(batch_size=200, throttle=None, dry_run=False, grace=None, progress_callback=None):
+    """
+    Delete orphaned media files in batches and recount blob references.
+    Returns (files, bytes).
+    """
+    throttle = throttle or Throttle()
+    referenced = referenced_media()
+    files = size = 0
+    batch = []
+
+    def flush():
+        if not dry_run:
+            for name, _ in batch:
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, name))
+                except FileNotFoundError:
+                    pass  # already gone
+            MediaBlob.objects.filter(name__in=[name for name, _ in batch]).delete()
+        if progress_callback:
+            progress_callback(batch)
+        throttle.wait(len(batch))
+        batch.clear()
+
+    for orphan in find_orphans(grace=grace, referenced=referenced):
+        batch.append(orphan)
+        files += 1
+        size += orphan[1]
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if not dry_run:
+        recount_blobs(referenced, batch_size=batch_size)
+    return files, size
+
+
+def recount_blobs(referenced, batch_size=500):
+    """Correct MediaBlob.refs from a reference count of the whole database."""
+    changed = []
+    for blob in MediaBlob.objects.only('name', 'refs').iterator(chunk_size=batch_size):
+        if blob.refs != referenced.get(blob.name, 0):
+            blob.refs = referenced.get(blob.name, 0)
+            changed.append(blob)
+    MediaBlob.objects.bulk_update(changed, ['refs'], batch_size=batch_size)
+    return len(changed)
+
+
+def purge_cancelled_events(older_than_days=None, batch_size=200, throttle=None, dry_run=False,
+                           progress_callback=None):
+    """
+    Delete events cancelled and dated more than `older_than_days` ago, one
+    bounded transaction per batch. Returns the number of events purged (or,
+    in a dry run, that would be).
+
+    Each batch advances the checkpoint in the same transaction, and a
+    complete pass resets it, so later runs see newly cancelled events again.
+    """
+    if older_than_days is None:
+        older_than_days = settings.CANCELLED_EVENT_RETENTION_DAYS
+    throttle = throttle or Throttle()
+    cutoff = timezone.localdate() - timedelta(days=older_than_days)
+    stale = Events.objects.filter(is_cancelled=True, date__lt=cutoff)
+    checkpoint, _ = MaintenanceCheckpoint.objects.get_or_create(name='purge_cancelled_events')
+    position, purged = checkpoint.position, 0
+
+    while True:
+        event_ids = list(stale.filter(pk__gt=position).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not event_ids:
+            break
+        position = event_ids[-1]
+        if dry_run:
+            purged += len(event_ids)
+        else:
+            with transaction.atomic():
+                # Comments, attendance, waitlists and agenda rows cascade
+                _, deleted = stale.filter(pk__in=event_ids).delete()
+                MaintenanceCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    position=position, updated_at=timezone.now()
+                )
+            purged += deleted.get(Events._meta.label, 0)
+        if progress_callback:
+            progress_callback(purged)
+        throttle.wait(len(event_ids))
+
+    if not dry_run:
+        MaintenanceCheckpoint.objects.filter(pk=checkpoint.pk).update(position=0, updated_at=timezone.now())
+    return purged
+
+
+def deduplicate_media(throttle=None, dry_run=False, progress_callback=None):
+    """
+    Move files saved before content addressing onto shared blobs: each
+    distinct legacy name is stored once and every row using it is pointed
+    at the blob. The old files are left for `delete_orphans`. Returns
+    (names moved, names whose file is missing).
+    """
+    if not hasattr(default_storage, 'is_blob'):
+        return 0, 0
+    throttle = throttle or Throttle()
+    moved = missing = 0
+    for model, field in file_fields():
+        legacy = model._base_manager.exclude(**{f'{field.name}__isnull': True}).exclude(**{field.name: ''}).exclude(
+            **{f'{field.name}__startswith': default_storage.blob_directory + '/'}
+        )
+        for name in list(legacy.order_by().values_list(field.name, flat=True).distinct()):
+            if not default_storage.exists(name):
+                missing += 1
+                continue
+            if not dry_run:
+                with transaction.atomic():
+                    with default_storage.open(name) as content:
+                        blob_name = default_storage.save(name, content)
+                    rows = model._base_manager.filter(**{field.name: name}).update(**{field.name: blob_name})
+                    # save() counted one reference; the UPDATE added `rows`
+                    MediaBlob.objects.filter(name=blob_name).update(refs=models.F('refs') + rows - 1)
+            moved += 1
+            if progress_callback:
+                progress_callback(name)
+            throttle.wait(1)
+    return moved, missing
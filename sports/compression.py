@@ -0,0 +1,220 @@
+"""
+Response compression and HTML whitespace minification.
+
+CompressionMiddleware negotiates brotli (when installed) or gzip from
+Accept-Encoding and compresses text responses. Streaming responses are
+compressed chunk by chunk as they are sent. Responses that are already
+encoded, too small, not of a text-like media type, or that serve byte
+ranges (static and media files handle their own encodings) pass through.
+HTML from the sports views is minified first when HTML_MINIFY is on.
+"""
+import gzip
+import re
+import secrets
+import string
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .serving import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Media types worth compressing; images, video, archives and fonts already are
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # dynamic responses: most of quality 11's gain at a fraction of the CPU
+
+# A random-length file name in the gzip header varies the compressed length,
+# as Django's GZipMiddleware does against BREACH-style length attacks
+GZIP_MAX_RANDOM_BYTES = 100
+
+# Whitespace inside these elements is significant and is left alone
+PRESERVED_RE = re.compile(r'<(pre|textarea|script|style)\b.*?</\1\s*>', re.S | re.I)
+# HTML's own whitespace; a non-breaking space is content and is kept
+HTML_SPACE = ' \t\r\f'
+
+
+def minify_html(html):
+    """
+    Collapse every run of whitespace that contains a line break into a
+    single newline, outside <pre>, <textarea>, <script> and <style>. Under
+    normal white-space handling the page renders the same.
+    """
+    parts, position = [], 0
+    for match in PRESERVED_RE.finditer(html):
+        parts.append(_collapse_lines(html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_collapse_lines(html[position:]))
+    return ''.join(parts)
+
+
+def _collapse_lines(text):
+    # Per-line str.strip() is much faster than a regex over the whole page
+    lines = text.split('\n')
+    if len(lines) == 1:
+        return text
+    first, *middle, last = lines
+    middle = [line.strip(HTML_SPACE) for line in middle]
+    return '\n'.join([first.rstrip(HTML_SPACE), *filter(None, middle), last.lstrip(HTML_SPACE)])
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self):
+        filename = ''.join(
+            secrets.choice(string.ascii_letters) for _ in range(secrets.randbelow(GZIP_MAX_RANDOM_BYTES + 1))
+        )
+        header = gzip.compress(b'', mtime=0)[:10]
+        # FNAME flag plus the random name, then a raw deflate stream
+        self._header = bytes([*header[:3], header[3] | 0x08, *header[4:]]) + filename.encode() + b'\0'
+        self._deflate = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self._crc = self._size = 0
+
+    def compress(self, data):
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        output = self._header + self._deflate.compress(data)
+        self._header = b''
+        return output
+
+    def finish(self):
+        return (
+            self._header + self._deflate.flush()
+            + self._crc.to_bytes(4, 'little') + (self._size & 0xffffffff).to_bytes(4, 'little')
+        )
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def choose_encoder(request):
+    """The preferred encoder the client accepts, or None."""
+    accepted = accepted_encodings(request)
+    if brotli is not None and 'br' in accepted:
+        return BrotliEncoder
+    if 'gzip' in accepted:
+        return GzipEncoder
+    return None
+
+
+def encode(data, encoder_class):
+    encoder = encoder_class()
+    return encoder.compress(data) + encoder.finish()
+
+
+def encode_stream(chunks, encoder_class):
+    encoder = encoder_class()
+    for chunk in chunks:
+        output = encoder.compress(chunk)
+        if output:
+            yield output
+    yield encoder.finish()
+
+
+async def encode_async_stream(chunks, encoder_class):
+    encoder = encoder_class()
+    async for chunk in chunks:
+        output = encoder.compress(chunk)
+        if output:
+            yield output
+    yield encoder.finish()
+
+
+def is_compressible(content_type):
+    content_type = content_type.split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """Minify sports HTML and compress text responses with brotli or gzip."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not settings.RESPONSE_COMPRESSION and not settings.HTML_MINIFY:
+            return response
+        if (
+            response.has_header('Content-Encoding')
+            or response.has_header('Accept-Ranges')
+            or response.status_code == 206
+            or not is_compressible(response.get('Content-Type', ''))
+        ):
+            return response
+
+        if settings.HTML_MINIFY and not response.streaming and self._is_sports_html(request, response):
+            self._minify(response)
+
+        if not settings.RESPONSE_COMPRESSION:
+            return response
+        # Caches must keep compressed and plain copies apart
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoder_class = choose_encoder(request)
+        if encoder_class is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = encode_async_stream(response.streaming_content, encoder_class)
+            else:
+                response.streaming_content = encode_stream(response.streaming_content, encoder_class)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = encode(response.content, encoder_class)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed bytes differ from the ones a strong ETag vouches for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoder_class.name
+        return response
+
+    @staticmethod
+    def _is_sports_html(request, response):
+        match = getattr(request, 'resolver_match', None)
+        return (
+            match is not None
+            and match.func.__module__ == 'sports.views'
+            and response.get('Content-Type', '').startswith('text/html')
+        )
+
+    @staticmethod
+    def _minify(response):
+        if len(response.content) < settings.HTML_MINIFY_MIN_SIZE:
+            return
+        charset = response.charset
+        response.content = minify_html(response.content.decode(charset)).encode(charset)
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
@@ -0,0 +1,53 @@
+"""
+Conditional GET support for pages whose freshness can be computed cheaply.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.views.decorators.http import condition
+
+
+def conditional_page(validator_func):
+    """
+    Wrap a view in Django's condition() with validators from one cheap query.
+
+    `validator_func(request, *args, **kwargs)` returns a (version, last_modified)
+    pair, where `version` is any sequence describing the page's data, or None
+    to skip validation (e.g. when the object does not exist). The ETag
+    also covers the current user and CSRF secret so a cached page is never
+    replayed to another account or with a stale form token. Requests with
+    pending flash messages are always rendered so the messages are shown.
+    """
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_page_validators'):
+            request._page_validators = None
+            result = None if len(get_messages(request)) else validator_func(request, *args, **kwargs)
+            if result is not None:
+                version, last_modified = result
+                parts = [
+                    request.user.pk or 0,
+                    request.META.get('CSRF_COOKIE', ''),
+                    *version,
+                ]
+                digest = hashlib.md5(
+                    '|'.join(str(part) for part in parts).encode(),
+                    usedforsecurity=False,
+                ).hexdigest()
+                request._page_validators = (digest, last_modified)
+                request._page_version = version
+        return request._page_validators
+
+    def etag_func(request, *args, **kwargs):
+        page_validators = validators(request, *args, **kwargs)
+        return page_validators[0] if page_validators else None
+
+    def last_modified_func(request, *args, **kwargs):
+        page_validators = validators(request, *args, **kwargs)
+        return page_validators[1] if page_validators else None
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def page_version(request):
+    """The version the page's validators computed for this request, or None."""
+    return getattr(request, '_page_version', None)
@@ -0,0 +1,54 @@
+"""
+Helpers for running writes against SQLite under concurrent load.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+LOCK_ERROR_MESSAGES = (
+    'database is locked',
+    'database table is locked',
+    'database is busy',
+)
+
+
+def is_lock_error(exc):
+    """Return True if the exception was raised because SQLite was busy."""
+    message = str(exc).lower()
+    return any(text in message for text in LOCK_ERROR_MESSAGES)
+
+
+def retry_delays(attempts=None, backoff=None):
+    """
+    Yield one jittered, exponentially growing delay per retry attempt.
+    """
+    if attempts is None:
+        attempts = settings.SQLITE_WRITE_RETRIES
+    if backoff is None:
+        backoff = settings.SQLITE_RETRY_BACKOFF
+    for attempt in range(attempts):
+        delay = backoff * (2 ** attempt)
+        yield delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_on_locked(view_func):
+    """
+    Retry a write view a bounded number of times when SQLite reports a lock.
+
+    Only retries when the error escaped every transaction, so the failed
+    attempt has already been rolled back and re-running the view is safe.
+    """
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        for delay in retry_delays():
+            try:
+                return view_func(*args, **kwargs)
+            except OperationalError as exc:
+                if connection.in_atomic_block or not is_lock_error(exc):
+                    raise
+                time.sleep(delay)
+        return view_func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,21 @@
+"""
+Stock media shipped in MEDIA_ROOT for the demo data.
+
+populate_demo gives demo rows their own copies of these files, so gc_media
+must never delete the originals.
+"""
+
+# Representative images per category; other categories fall back gracefully
+IMAGE_MAP = {
+    'soccer': ['events/soccer.jpeg'],
+    'volleyball': ['events/volleyball.jpg'],
+    'golf': ['events/golf.jpeg'],
+    'ultimate_frisbee': ['events/ultimate_frisbee.jpeg'],
+    'cricket': ['events/cricket.jpg'],
+}
+PROFILE_PICTURES = {
+    'sarah_runner': 'profile_pics/sarah_runner.png',
+}
+STOCK_MEDIA = frozenset(
+    [path for paths in IMAGE_MAP.values() for path in paths] + list(PROFILE_PICTURES.values())
+)
@@ -0,0 +1,105 @@
+"""
+Streaming bulk export of events for analytics.
+
+Rows come from `Events.objects.values().iterator()`, and host usernames and
+attendee counts are joined with one query each per chunk, so memory use and
+query count stay flat per row however large the table grows.
+"""
+import csv
+import itertools
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
+
+from .models import User, Events
+
+EXPORT_FIELDS = [
+    'id', 'title', 'category', 'skill_level', 'date', 'start', 'end',
+    'timestamp', 'max_attendees', 'is_cancelled', 'created_at', 'updated_at',
+    'host_id',
+]
+EXPORT_COLUMNS = EXPORT_FIELDS + ['host', 'number_attending']
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Bytes gathered before handing a block to the response or file
+BUFFER_SIZE = 64 * 1024
+
+
+def iter_event_rows(chunk_size=2000):
+    """Yield one flat dict per event in primary key order."""
+    rows = Events.objects.order_by('pk').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        usernames = dict(
+            User.objects.filter(pk__in={row['host_id'] for row in chunk}).values_list('pk', 'username')
+        )
+        attendee_counts = dict(
+            Events.attendees.through.objects.filter(
+                events_id__in=[row['id'] for row in chunk]
+            ).values('events_id').annotate(count=Count('id')).values_list('events_id', 'count')
+        )
+        for row in chunk:
+            row['host'] = usernames.get(row['host_id'])
+            row['number_attending'] = attendee_counts.get(row['id'], 0)
+            yield row
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """Pseudo-buffer that hands each CSV line straight back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[column] for column in EXPORT_COLUMNS])
+
+
+def _buffered(lines):
+    """Join small text lines into encoded blocks of roughly BUFFER_SIZE bytes."""
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def _gzipped(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_events(export_format='ndjson', compress=False, chunk_size=2000):
+    """Return an iterator of byte blocks containing every event."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    rows = iter_event_rows(chunk_size=chunk_size)
+    lines = ndjson_lines(rows) if export_format == 'ndjson' else csv_lines(rows)
+    blocks = _buffered(lines)
+    return _gzipped(blocks) if compress else blocks
@@ -0,0 +1,101 @@
+"""
+Facet counts for the index filter bar.
+
+Each facet is counted with one GROUP BY over the upcoming events, filtered
+by every active filter except its own, so each option shows how many events
+picking it would leave. Results are cached per filter signature for a short
+time since listings change often.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.utils import timezone
+
+from .models import TIMES_OF_DAY, WEEKDAYS, Events
+
+FACET_FIELDS = ('category', 'skill_level')
+
+# The `days` filter's values: (label, weekday numbers)
+DAY_FILTERS = {
+    'weekdays': ("Weekdays", (0, 1, 2, 3, 4)),
+    'weekend': ("Weekends", (5, 6)),
+    **{label.lower(): (label, (number,)) for number, label in WEEKDAYS},
+}
+
+
+def upcoming_events(filters, exclude=()):
+    """
+    Return listed upcoming events matching cleaned EventFilterForm data,
+    ignoring the filters named in `exclude`.
+    """
+    events = Events.objects.filter(
+        timestamp__gte=timezone.now(),
+        is_cancelled=False,
+        is_archived=False
+    )
+    active = {name: value for name, value in filters.items() if value and name not in exclude}
+    if 'category' in active:
+        events = events.filter(category=active['category'])
+    if 'skill_level' in active:
+        events = events.filter(skill_level=active['skill_level'])
+    if 'date_from' in active:
+        events = events.filter(date__gte=active['date_from'])
+    if 'date_to' in active:
+        events = events.filter(date__lte=active['date_to'])
+    if 'days' in active or 'time_of_day' in active:
+        # Both columns are always constrained, an unset one to all its values,
+        # so events_listed_when_idx is searched by (weekday, time_of_day)
+        # pairs instead of being skipped for lack of its leading column
+        weekdays = DAY_FILTERS[active['days']][1] if 'days' in active else [number for number, _ in WEEKDAYS]
+        times = [active['time_of_day']] if 'time_of_day' in active else [value for value, _ in TIMES_OF_DAY]
+        events = events.filter(weekday__in=weekdays, time_of_day__in=times)
+    if 'search' in active:
+        events = events.filter(
+            Q(title__icontains=active['search']) |
+            Q(description__icontains=active['search'])
+        )
+    return events
+
+
+def date_buckets(today):
+    """Return (key, label, first day, last day or None) for each date facet."""
+    return [
+        ('today', 'Today', today, today),
+        ('tomorrow', 'Tomorrow', today + timedelta(days=1), today + timedelta(days=1)),
+        ('this_week', 'Later this week', today + timedelta(days=2), today + timedelta(days=6)),
+        ('later', 'Later', today + timedelta(days=7), None),
+    ]
+
+
+def _date_bucket(today):
+    whens = [
+        When(date__range=(first, last), then=Value(key))
+        for key, _, first, last in date_buckets(today) if last
+    ]
+    return Case(*whens, default=Value('later'), output_field=CharField())
+
+
+def _grouped(events, field):
+    return dict(events.order_by().values_list(field).annotate(count=Count('id')))
+
+
+def facet_counts(filters):
+    """Return {'category': {...}, 'skill_level': {...}, 'date': {...}} counts."""
+    today = timezone.localdate()
+    signature = json.dumps(
+        [str(today)] + sorted((name, str(value)) for name, value in filters.items() if value)
+    )
+    key = 'facets:' + hashlib.md5(signature.encode(), usedforsecurity=False).hexdigest()
+    counts = cache.get(key)
+    if counts is None:
+        counts = {field: _grouped(upcoming_events(filters, exclude=(field,)), field) for field in FACET_FIELDS}
+        counts['date'] = _grouped(
+            upcoming_events(filters, exclude=('date_from', 'date_to')).annotate(bucket=_date_bucket(today)),
+            'bucket'
+        )
+        cache.set(key, counts, settings.FACET_CACHE_SECONDS)
+    return counts
@@ -1,9 +1,17 @@
 from django import forms
 from django.forms import ModelForm
 from django.contrib.auth.forms import UserCreationForm
-from .models import Events, User, EventComment
+from django.urls import reverse_lazy
+from .models import Events, User, EventComment, RECURRENCE_FREQUENCIES, TIMES_OF_DAY
+from .facets import DAY_FILTERS
 from datetime import datetime, date, timedelta
-import pytz
+from functools import lru_cache
+from zoneinfo import available_timezones
+
+@lru_cache(maxsize=None)
+def time_zone_choices():
+    # Reading the tz database is slow, so it is done once, on first use
+    return [('', "Site default")] + [(name, name) for name in sorted(available_timezones())]
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -36,9 +44,32 @@ class UserProfileForm(ModelForm):
         }
 
 class EventForm(ModelForm):
+    time_zone = forms.ChoiceField(
+        choices=time_zone_choices,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    repeat = forms.ChoiceField(
+        choices=[('', 'Does not repeat')] + list(RECURRENCE_FREQUENCIES),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    repeat_until = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        })
+    )
+    apply_to_series = forms.BooleanField(
+        required=False,
+        label="Apply to this and all following events in the series",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
     class Meta:
         model = Events
-        fields = ['title', 'description', 'date', 'start', 'end', 'category', 
+        fields = ['title', 'description', 'date', 'start', 'end', 'time_zone', 'category',
                   'skill_level', 'max_attendees', 'image']
         
         widgets = {
@@ -79,6 +110,12 @@ class EventForm(ModelForm):
         if not self.instance.pk:
             today = date.today()
             self.fields['date'].widget.attrs['min'] = today.strftime('%Y-%m-%d')
+        else:
+            # Recurrence is chosen when creating; editing can only follow an existing series
+            del self.fields['repeat']
+            del self.fields['repeat_until']
+        if not self.instance.series_id:
+            del self.fields['apply_to_series']
     
     def clean(self):
         cleaned_data = super().clean()
@@ -106,6 +143,18 @@ class EventForm(ModelForm):
             
             if duration > 8:
                 raise forms.ValidationError("Event cannot be longer than 8 hours.")
+
+        repeat_until = cleaned_data.get('repeat_until')
+        if repeat_until and event_date and repeat_until < event_date:
+            raise forms.ValidationError("A repeating event must end on or after its first date.")
+
+        if event_date and self.instance.series_id:
+            clash = Events.objects.filter(
+                series_id=self.instance.series_id,
+                date=event_date
+            ).exclude(pk=self.instance.pk)
+            if clash.exists():
+                raise forms.ValidationError("Another event in this series is already on that date.")
         
         return cleaned_data
 
@@ -134,14 +183,35 @@ class EventFilterForm(forms.Form):
             'type': 'date'
         })
     )
+    days = forms.ChoiceField(
+        choices=[('', 'Any Day')] + [(value, label) for value, (label, _) in DAY_FILTERS.items()],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    time_of_day = forms.ChoiceField(
+        choices=[('', 'Any Time')] + list(TIMES_OF_DAY),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
     search = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Search events...'
+            'placeholder': 'Search events...',
+            'autocomplete': 'off',
+            'data-typeahead-url': reverse_lazy('typeahead'),
         })
     )
 
+    def show_counts(self, counts):
+        """Append the number of matching upcoming events to each option."""
+        for name in ('category', 'skill_level'):
+            field = self.fields[name]
+            field.choices = [
+                (value, f"{label} ({counts[name].get(value, 0)})" if value else label)
+                for value, label in field.choices
+            ]
+
 class CommentForm(ModelForm):
     class Meta:
         model = EventComment
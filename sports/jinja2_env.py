@@ -0,0 +1,41 @@
+"""
+Jinja2 environment for the templates listed in settings.JINJA2_TEMPLATES.
+
+Exposes the same helpers the Django templates load: `url`, `static`, the
+`url_replace` pagination tag, the `user_card` lookup and the filters used
+by the hot templates.
+"""
+from django.contrib.humanize.templatetags import humanize
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+
+from .templatetags.pagination_tags import url_replace
+from .templatetags.user_tags import user_card
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def environment(**options):
+    options.setdefault('trim_blocks', True)
+    options.setdefault('lstrip_blocks', True)
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'url_replace': url_replace,
+        'user_card': user_card,
+    })
+    env.filters.update({
+        'date': defaultfilters.date,
+        'time': defaultfilters.time,
+        'truncatewords': defaultfilters.truncatewords,
+        'naturaltime': humanize.naturaltime,
+        'naturalday': humanize.naturalday,
+        'intcomma': humanize.intcomma,
+        'apnumber': humanize.apnumber,
+    })
+    return env
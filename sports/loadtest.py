@@ -0,0 +1,321 @@
+"""
+A small asyncio HTTP/1.1 load generator for end-to-end tests of Playfield.
+
+Each virtual user owns one keep-alive connection and a cookie jar, logs in
+through the real login form and sends the CSRF token back the way the
+site's JavaScript does. Only the standard library is used, so it runs
+anywhere the project does.
+"""
+import asyncio
+import random
+import re
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+CSRF_INPUT_RE = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+LOGIN_ATTEMPTS = 3
+# Login outcomes worth another attempt: transport errors, throttling, shedding
+LOGIN_RETRY_STATUSES = (None, 429, 503)
+
+
+class HttpError(Exception):
+    pass
+
+
+class VirtualUser:
+    """One simulated browser: a persistent connection plus cookies."""
+
+    def __init__(self, base_url, stats, username=None, password=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.stats = stats
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.cookies = {}
+        self.last_status = None  # of the latest request, None after a transport error
+        self._reader = self._writer = None
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+    async def request(self, label, method, path, data=None, headers=None):
+        """Send one request, record its latency under `label` and return (status, body)."""
+        started = time.perf_counter()
+        try:
+            status, body = await asyncio.wait_for(self._send(method, path, data, headers), self.timeout)
+        except (OSError, asyncio.TimeoutError, HttpError, asyncio.IncompleteReadError) as exc:
+            await self.close()
+            self.stats.record(label, None, time.perf_counter() - started, error=type(exc).__name__)
+            self.last_status = None
+            return None, b''
+        self.stats.record(label, status, time.perf_counter() - started)
+        self.last_status = status
+        return status, body
+
+    async def _send(self, method, path, data, headers):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+        body = urlencode(data).encode() if data is not None else b''
+        lines = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Connection: keep-alive",
+            "Accept-Encoding: identity",
+            f"Content-Length: {len(body)}",
+        ]
+        if data is not None:
+            lines.append("Content-Type: application/x-www-form-urlencoded")
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise HttpError("connection closed")
+        status = int(status_line.split()[1])
+        response_headers = defaultdict(list)
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()].append(value.strip())
+
+        for cookie in response_headers.get('set-cookie', []):
+            name, _, rest = cookie.partition('=')
+            value = rest.split(';', 1)[0]
+            if value and 'max-age=0' not in cookie.lower():
+                self.cookies[name] = value
+            else:
+                self.cookies.pop(name, None)
+
+        if 'chunked' in ''.join(response_headers.get('transfer-encoding', [])).lower():
+            payload = await self._read_chunked()
+        elif 'content-length' in response_headers:
+            payload = await self._reader.readexactly(int(response_headers['content-length'][0]))
+        elif method == 'HEAD' or status in (204, 304):
+            payload = b''
+        else:
+            payload = await self._reader.read()
+            await self.close()
+            return status, payload
+
+        if 'close' in ''.join(response_headers.get('connection', [])).lower():
+            await self.close()
+        return status, payload
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self._reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readline()
+
+    async def login(self):
+        status, body = await self.request('login', 'GET', '/login/')
+        match = CSRF_INPUT_RE.search(body)
+        if status != 200 or not match:
+            return False
+        status, _ = await self.request('login', 'POST', '/login/', {
+            'csrfmiddlewaretoken': match.group(1).decode(),
+            'username': self.username,
+            'password': self.password,
+            'remember': 'on',
+        })
+        return status == 302 and 'sessionid' in self.cookies
+
+    def ajax_headers(self):
+        # Same headers scripts.js sends with fetch()
+        return {
+            'X-CSRFToken': self.cookies.get('csrftoken', ''),
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+
+
+class Stats:
+    """Latency samples and outcomes per endpoint label."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+        # Virtual users asked for, and those that got past login to the timed run
+        self.users_requested = self.users_started = 0
+
+    def record(self, label, status, seconds, error=None):
+        self.latencies[label].append(seconds * 1000)
+        self.statuses[label][error or status] += 1
+
+    def report(self):
+        """Yield one row per endpoint plus a total row."""
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        everything = []
+        for label in sorted(self.latencies):
+            samples = sorted(self.latencies[label])
+            everything.extend(samples)
+            yield self._row(label, samples, self.statuses[label], elapsed)
+        if everything:
+            totals = defaultdict(int)
+            for statuses in self.statuses.values():
+                for key, count in statuses.items():
+                    totals[key] += count
+            yield self._row('TOTAL', sorted(everything), totals, elapsed)
+
+    @staticmethod
+    def _row(label, samples, statuses, elapsed):
+        count = len(samples)
+        # 429 and 503 are the server protecting itself and are reported apart,
+        # as are other 4xx answers (e.g. joining a full event)
+        errors = sum(
+            n for key, n in statuses.items()
+            if not isinstance(key, int) or (key >= 500 and key != 503)
+        )
+        client_errors = sum(
+            n for key, n in statuses.items() if isinstance(key, int) and 400 <= key < 500 and key != 429
+        )
+        throttled = sum(n for key, n in statuses.items() if key in (429, 503))
+        return {
+            'endpoint': label,
+            'requests': count,
+            'rps': count / elapsed if elapsed else 0,
+            'p50': percentile(samples, 50),
+            'p95': percentile(samples, 95),
+            'p99': percentile(samples, 99),
+            'errors': errors / count * 100 if count else 0,
+            'client_errors': client_errors / count * 100 if count else 0,
+            'throttled': throttled / count * 100 if count else 0,
+        }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0
+    rank = max(1, -(-len(sorted_samples) * pct // 100))  # nearest-rank
+    return sorted_samples[int(rank) - 1]
+
+
+# Scenarios: each runs one iteration for a virtual user
+
+async def browse(user, plan):
+    await user.request('index', 'GET', '/')
+    await user.request('index?page', 'GET', '/?page=2')
+    event_id = random.choice(plan.event_ids)
+    await user.request('event_detail', 'GET', f'/events/{event_id}/')
+
+
+async def search(user, plan):
+    term = random.choice(plan.search_terms)
+    for length in range(2, min(len(term), 5) + 1):
+        await user.request('typeahead', 'GET', '/events/typeahead/?' + urlencode({'q': term[:length]}))
+    query = {'search': term}
+    if random.random() < 0.5:
+        query['category'] = random.choice(plan.categories)
+    await user.request('index?filter', 'GET', '/?' + urlencode(query))
+
+
+async def join_storm(user, plan):
+    await user.request(
+        'toggle_attendance', 'POST', f'/events/{plan.hot_event_id}/toggle-attendance/',
+        data={}, headers=user.ajax_headers()
+    )
+
+
+async def comment_burst(user, plan):
+    await user.request(
+        'add_comment', 'POST', f'/events/{plan.hot_event_id}/comment/',
+        data={'content': f"Load test comment {random.randint(1, 10**6)}"}, headers=user.ajax_headers()
+    )
+
+
+async def mixed(user, plan):
+    roll = random.random()
+    if roll < 0.5:
+        await browse(user, plan)
+    elif roll < 0.8:
+        await search(user, plan)
+    elif roll < 0.95:
+        await join_storm(user, plan)
+    else:
+        await comment_burst(user, plan)
+
+
+SCENARIOS = {
+    'browse': (browse, False),
+    'search': (search, False),
+    'join-storm': (join_storm, True),
+    'comment-burst': (comment_burst, True),
+    'mixed': (mixed, True),
+}
+
+
+class Plan:
+    """Data the scenarios pick from, gathered before the run starts."""
+
+    def __init__(self, event_ids, hot_event_id, search_terms, categories):
+        self.event_ids = event_ids
+        self.hot_event_id = hot_event_id
+        self.search_terms = search_terms
+        self.categories = categories
+
+
+async def run(base_url, scenario, plan, accounts, password, users, duration, think_time=0.0):
+    """
+    Log `users` virtual users in, then run the scenario for `duration`
+    seconds and return Stats. Logins are a ramp-up phase outside the timed
+    window, since password hashing would otherwise dominate short runs.
+    Users that fail to log in are left out of the run; `users_started` on
+    the returned Stats says how many took part.
+    """
+    step, needs_login = SCENARIOS[scenario]
+    stats = Stats()
+    virtual_users = [
+        VirtualUser(base_url, stats, accounts[n % len(accounts)] if accounts else None, password)
+        for n in range(users)
+    ]
+
+    async def log_in(user):
+        for attempt in range(LOGIN_ATTEMPTS):
+            if await user.login():
+                return True
+            if user.last_status not in LOGIN_RETRY_STATUSES or attempt + 1 == LOGIN_ATTEMPTS:
+                return False
+            await asyncio.sleep(1 + attempt)  # shed or throttled; back off
+
+    if needs_login:
+        logged_in = await asyncio.gather(*(log_in(user) for user in virtual_users))
+        virtual_users = [user for user, ok in zip(virtual_users, logged_in) if ok]
+    stats.users_requested, stats.users_started = users, len(virtual_users)
+
+    stats.started = time.perf_counter()
+    deadline = stats.started + duration
+
+    async def loop(user):
+        try:
+            while time.perf_counter() < deadline:
+                await step(user, plan)
+                if think_time:
+                    await asyncio.sleep(random.uniform(0, think_time * 2))
+        finally:
+            await user.close()
+
+    await asyncio.gather(*(loop(user) for user in virtual_users))
+    stats.finished = time.perf_counter()
+    return stats
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+import time
+
+from sports.compression import BrotliEncoder, GzipEncoder, brotli, encode, minify_html
+from sports.models import Events
+
+
+class Command(BaseCommand):
+    help = 'Measure bytes saved against CPU time for HTML minification, gzip and brotli on real pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', help='Page to measure (repeatable; default: index, '
+                                                              'past events and the busiest event page)')
+        parser.add_argument('--iterations', type=int, default=50, help='Runs per page and step')
+
+    def handle(self, *args, **options):
+        paths = options['path']
+        if not paths:
+            event = Events.objects.annotate(
+                activity=Count('comments', distinct=True) + Count('attendees', distinct=True)
+            ).order_by('-activity').first()
+            if event is None:
+                raise CommandError("No events found. Run `python manage.py populate_demo` first.")
+            paths = [reverse('index'), reverse('past_events'), reverse('event_detail', args=[event.pk])]
+
+        # Fetch each page as the middleware sees it before minifying or compressing
+        client = Client(HTTP_HOST='localhost')
+        with override_settings(HTML_MINIFY=False, RESPONSE_COMPRESSION=False):
+            pages = {}
+            for path in paths:
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {path} returned {response.status_code}")
+                pages[path] = response.content
+
+        steps = [('minify', lambda data: minify_html(data.decode()).encode())]
+        steps.append(('gzip', lambda data: encode(data, GzipEncoder)))
+        if brotli is not None:
+            steps.append(('br', lambda data: encode(data, BrotliEncoder)))
+            steps.append(('minify+br', lambda data: encode(minify_html(data.decode()).encode(), BrotliEncoder)))
+        else:
+            self.stdout.write(self.style.WARNING("brotli is not installed; only gzip is measured"))
+        steps.append(('minify+gzip', lambda data: encode(minify_html(data.decode()).encode(), GzipEncoder)))
+
+        self.stdout.write("\n" + "="*60)
+        self.stdout.write(f"Response size and CPU per request over {options['iterations']} iterations")
+        self.stdout.write("="*60)
+        for path, body in pages.items():
+            self.stdout.write(self.style.SUCCESS(f"\n{path}  ({len(body):,} bytes)"))
+            for name, step in steps:
+                output = step(body)
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    step(body)
+                elapsed = (time.perf_counter() - started) * 1000 / options['iterations']
+                saved = 100 - len(output) * 100 / len(body)
+                self.stdout.write(
+                    f"  {name:<12}{len(output):>10,} bytes  {saved:>5.1f}% saved  {elapsed:>6.2f} ms"
+                    f"  ({(len(body) - len(output)) / 1024 / max(elapsed, 0.001):,.0f} KB saved per CPU ms)"
+                )
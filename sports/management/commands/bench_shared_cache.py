@@ -0,0 +1,143 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sports.models import Events
+
+_MISSING = object()
+
+
+def _run_worker(cache_settings, paths):
+    """Fetch `paths` in one worker process; return (hits, lookups, queries, seconds)."""
+    # Each worker opens its own database connection, as a forked server's would
+    connections.close_all()
+    stats = {'hits': 0, 'lookups': 0, 'queries': 0}
+
+    def count_queries(execute, sql, params, many, context):
+        stats['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with override_settings(CACHES=cache_settings):
+        backend = caches['default']
+        get = backend.get
+
+        def counting_get(key, default=None, version=None):
+            value = get(key, _MISSING, version=version)
+            stats['lookups'] += 1
+            stats['hits'] += value is not _MISSING
+            return default if value is _MISSING else value
+
+        def counting_get_or_set(key, default, timeout=DEFAULT_TIMEOUT, version=None):
+            # The stock get_or_set() reads again after a miss, which would count twice
+            value = counting_get(key, _MISSING, version=version)
+            if value is _MISSING:
+                value = default() if callable(default) else default
+                backend.add(key, value, timeout=timeout, version=version)
+            return value
+
+        backend.get, backend.get_or_set = counting_get, counting_get_or_set
+        client = Client(HTTP_HOST='localhost')
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            for path in paths:
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {response.status_code}")
+        elapsed = time.perf_counter() - started
+    connections.close_all()
+    return stats['hits'], stats['lookups'], stats['queries'], elapsed
+
+
+class Command(BaseCommand):
+    help = ('Compare per-process LocMemCache with the shared SQLite cache across worker processes: '
+            'cache hit ratio and database queries for a skewed mix of index and event pages')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per worker')
+        parser.add_argument('--events', type=int, default=30, help='Distinct event pages in the mix')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Zipf exponent of event popularity (higher means fewer hot events)')
+        parser.add_argument('--index-share', type=float, default=0.3, help='Fraction of requests for the index')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError("This benchmark forks worker processes, which this platform does not support.")
+        events = list(Events.objects.filter(
+            timestamp__gte=timezone.now(), is_cancelled=False, is_archived=False
+        ).annotate(activity=Count('attendees')).order_by('-activity', 'pk').values_list('pk', flat=True)[
+            :options['events']
+        ])
+        if not events:
+            raise CommandError("No upcoming events found. Run `python manage.py populate_demo` first.")
+
+        event_paths = [reverse('event_detail', args=[pk]) for pk in events]
+        weights = [1 / rank ** options['skew'] for rank in range(1, len(event_paths) + 1)]
+        index_paths = [reverse('index')] + [
+            reverse('index') + query for query in ('?page=2', '?skill_level=all', '?days=weekend')
+        ]
+        plans = []
+        for worker in range(options['workers']):
+            rng = random.Random(options['seed'] + worker)
+            plans.append([
+                rng.choice(index_paths) if rng.random() < options['index_share']
+                else rng.choices(event_paths, weights)[0]
+                for _ in range(options['requests'])
+            ])
+
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'none (DummyCache)': {'default': {
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                }},
+                'locmem (per process)': {'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': f'bench-{os.getpid()}',
+                    'OPTIONS': {'MAX_ENTRIES': 10000},
+                }},
+                'sqlite (shared)': {'default': {
+                    'BACKEND': 'sports.sharedcache.SQLiteCache',
+                    'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                    'OPTIONS': {'MAX_ENTRIES': 10000},
+                }},
+            }
+
+            self.stdout.write("\n" + "="*72)
+            self.stdout.write(
+                f"{options['workers']} workers x {options['requests']} requests, "
+                f"{len(event_paths)} event pages (Zipf {options['skew']}), "
+                f"{options['index_share']:.0%} index"
+            )
+            self.stdout.write("="*72)
+            totals = {}
+            for label, cache_settings in backends.items():
+                # Forked children must not inherit this process's connection
+                connections.close_all()
+                context = multiprocessing.get_context('fork')
+                with context.Pool(options['workers']) as pool:
+                    results = pool.starmap(_run_worker, [(cache_settings, plan) for plan in plans])
+                hits, lookups, queries, seconds = (sum(column) for column in zip(*results))
+                requests = options['workers'] * options['requests']
+                totals[label] = queries
+                self.stdout.write(self.style.SUCCESS(f"\n{label}"))
+                self.stdout.write(f"  cache hit ratio   {hits / max(lookups, 1):>7.1%}  ({hits:,} of {lookups:,} lookups)")
+                self.stdout.write(f"  DB queries        {queries:>7,}  ({queries / requests:.2f} per request)")
+                self.stdout.write(f"  worker time       {seconds / options['workers']:>7.2f} s "
+                                  f"({seconds * 1000 / requests:.2f} ms per request)")
+
+        uncached, local, shared = totals.values()
+        self.stdout.write(f"\nDB queries against no cache: per-process {100 - local * 100 / max(uncached, 1):.1f}% "
+                          f"fewer, shared {100 - shared * 100 / max(uncached, 1):.1f}% fewer")
+        self.stdout.write(f"Shared against per-process: {100 - shared * 100 / max(local, 1):.1f}% fewer DB queries "
+                          f"({local:,} -> {shared:,})")
@@ -0,0 +1,142 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import sqlite3
+import tempfile
+import threading
+import time
+import os
+import random
+
+from sports.db import is_lock_error, retry_delays
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite writes with the default and production profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers')
+        parser.add_argument('--ops', type=int, default=200, help='Writes per thread')
+        parser.add_argument('--events', type=int, default=3, help='Events the writers compete for')
+
+    def handle(self, *args, **options):
+        profiles = [
+            ('default', {
+                'pragmas': {},
+                'begin': 'BEGIN',
+                'retry': False,
+            }),
+            ('production', {
+                'pragmas': settings.SQLITE_PRAGMAS,
+                'begin': 'BEGIN IMMEDIATE',
+                'retry': True,
+            }),
+        ]
+
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(
+            f"{options['threads']} threads x {options['ops']} join/leave writes "
+            f"on {options['events']} events"
+        )
+        self.stdout.write("="*50)
+
+        for name, profile in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self._create_schema(path, options['events'])
+                result = self._run(path, profile, options)
+
+            total = options['threads'] * options['ops']
+            self.stdout.write(self.style.SUCCESS(f"\n{name}"))
+            self.stdout.write(f"  committed:   {result['ok']}/{total}")
+            self.stdout.write(f"  throughput:  {result['ok'] / result['elapsed']:.0f} writes/s")
+            self.stdout.write(f"  lock errors: {result['errors']} ({100 * result['errors'] / total:.1f}%)")
+            self.stdout.write(f"  retries:     {result['retries']}")
+
+    def _connect(self, path, pragmas):
+        # Same connect() defaults Django uses, with autocommit so BEGIN is explicit
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _create_schema(self, path, events):
+        conn = self._connect(path, {})
+        conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, max_attendees INTEGER)")
+        conn.execute(
+            "CREATE TABLE attendees (event_id INTEGER, user_id INTEGER, "
+            "UNIQUE (event_id, user_id))"
+        )
+        conn.executemany(
+            "INSERT INTO events (id, max_attendees) VALUES (?, 100)",
+            [(i,) for i in range(1, events + 1)]
+        )
+        conn.close()
+
+    def _toggle(self, conn, begin, event_id, user_id):
+        # Mirrors toggle_attendance: read the attendee list, then write
+        conn.execute(begin)
+        try:
+            attending = conn.execute(
+                "SELECT 1 FROM attendees WHERE event_id = ? AND user_id = ?",
+                (event_id, user_id)
+            ).fetchone()
+            conn.execute("SELECT COUNT(*) FROM attendees WHERE event_id = ?", (event_id,))
+            if attending:
+                conn.execute(
+                    "DELETE FROM attendees WHERE event_id = ? AND user_id = ?",
+                    (event_id, user_id)
+                )
+            else:
+                conn.execute(
+                    "INSERT INTO attendees (event_id, user_id) VALUES (?, ?)",
+                    (event_id, user_id)
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    def _run(self, path, profile, options):
+        counters = {'ok': 0, 'errors': 0, 'retries': 0}
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(options['threads'])
+
+        def worker(user_id):
+            conn = self._connect(path, profile['pragmas'])
+            ok = errors = retries = 0
+            start_barrier.wait()
+            for _ in range(options['ops']):
+                event_id = random.randint(1, options['events'])
+                delays = retry_delays() if profile['retry'] else iter(())
+                while True:
+                    try:
+                        self._toggle(conn, profile['begin'], event_id, user_id)
+                        ok += 1
+                        break
+                    except sqlite3.OperationalError as exc:
+                        if not is_lock_error(exc):
+                            raise
+                        delay = next(delays, None)
+                        if delay is None:
+                            errors += 1
+                            break
+                        retries += 1
+                        time.sleep(delay)
+            conn.close()
+            with lock:
+                counters['ok'] += ok
+                counters['errors'] += errors
+                counters['retries'] += retries
+
+        threads = [
+            threading.Thread(target=worker, args=(user_id,))
+            for user_id in range(1, options['threads'] + 1)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters['elapsed'] = time.perf_counter() - started
+        return counters
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+import time
+
+from sports.models import User, Events
+from sports.forms import EventFilterForm, CommentForm
+
+
+class Command(BaseCommand):
+    help = 'Compare Django and Jinja2 render times for the index and event detail templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per template and engine')
+        parser.add_argument('--username', help='Render as this user instead of an anonymous visitor')
+
+    def handle(self, *args, **options):
+        if 'jinja2' not in [engine.name for engine in engines.all()]:
+            raise CommandError("Jinja2 is not installed, so there is nothing to compare against.")
+
+        # The busiest event page is the most expensive one to render
+        event = Events.objects.annotate(
+            activity=Count('comments', distinct=True) + Count('attendees', distinct=True)
+        ).order_by('-activity').first()
+        if event is None:
+            raise CommandError("No events found. Run `python manage.py populate_demo` first.")
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        if options['username']:
+            request.user = User.objects.get(username=options['username'])
+
+        now = timezone.now()
+        upcoming = Events.objects.filter(
+            timestamp__gte=now,
+            is_cancelled=False
+        ).select_related('host').prefetch_related('attendees')
+        paginator = Paginator(upcoming, 9)
+        event = Events.objects.select_related('host').prefetch_related(
+            'attendees',
+            'comments__author'
+        ).get(pk=event.pk)
+
+        contexts = {
+            'sports/index.html': {
+                'page_obj': paginator.get_page(1),
+                'filter_form': EventFilterForm({}),
+                'total_events': paginator.count,
+            },
+            'sports/event_detail.html': {
+                'event': event,
+                'comments': event.comments.all(),
+                'comment_form': CommentForm(),
+                'is_attending': False,
+                'can_join': True,
+            },
+        }
+
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(f"Render times over {options['iterations']} iterations")
+        self.stdout.write("="*50)
+
+        for template_name, context in contexts.items():
+            timings = {}
+            for engine in ('django', 'jinja2'):
+                # Warm up template caches and evaluate querysets once
+                render_to_string(template_name, context, request, using=engine)
+                started = time.perf_counter()
+                for _ in range(options['iterations']):
+                    render_to_string(template_name, context, request, using=engine)
+                timings[engine] = (time.perf_counter() - started) * 1000 / options['iterations']
+
+            self.stdout.write(self.style.SUCCESS(f"\n{template_name}"))
+            self.stdout.write(f"  django: {timings['django']:.2f} ms/render")
+            self.stdout.write(f"  jinja2: {timings['jinja2']:.2f} ms/render")
+            self.stdout.write(f"  speedup: {timings['django'] / timings['jinja2']:.1f}x")
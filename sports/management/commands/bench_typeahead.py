@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+import json
+import random
+import statistics
+import time
+
+from sports.models import SPORTS
+from sports.typeahead import Typeahead, suggestion
+
+ADJECTIVES = [
+    'Morning', 'Evening', 'Sunday', 'Friday Night', 'Casual', 'Competitive', 'Weekend',
+    'Lunchtime', 'Beginner', 'Advanced', 'Pickup', 'Charity', 'Summer', 'Winter', 'Midnight',
+]
+PLACES = [
+    'Riverside', 'Central Park', 'Harbor', 'Hillcrest', 'Oakwood', 'Maple Court', 'Lakeside',
+    'Downtown', 'Westfield', 'Northgate', 'Elm Street', 'Cedar Hall', 'Bayview', 'Greenfield',
+]
+FORMATS = ['Game', 'Match', 'League', 'Meetup', 'Tournament', 'Practice', 'Ladder', 'Clinic', 'Scrimmage']
+
+
+class Command(BaseCommand):
+    help = 'Measure typeahead lookup latency on a synthetic index of many events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1_000_000, help='Synthetic events to index')
+        parser.add_argument('--hosts', type=int, default=50_000, help='Distinct host usernames')
+        parser.add_argument('--queries', type=int, default=20_000, help='Lookups to time')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sports = [label for _, label in SPORTS]
+        usernames = {pk: f"{rng.choice(PLACES).split()[0].lower()}_{rng.choice(sports).split()[0].lower()}{pk}"
+                     for pk in range(1, options['hosts'] + 1)}
+        rows = [
+            (
+                pk,
+                f"{rng.choice(ADJECTIVES)} {rng.choice(sports)} {rng.choice(FORMATS)} at {rng.choice(PLACES)} #{pk % 997}",
+                rng.randint(1, options['hosts']),
+            )
+            for pk in range(1, options['events'] + 1)
+        ]
+
+        self.stdout.write(f"Building index for {len(rows):,} events and {len(usernames):,} hosts...")
+        index = Typeahead()
+        started = time.perf_counter()
+        index.load(rows, usernames)
+        build_seconds = time.perf_counter() - started
+
+        # What users type: the first few letters of a word, sometimes after a full word
+        vocabulary = sorted({word for row in rows[:5000] for word in row[1].split() if word.isalpha()})
+        vocabulary += list(usernames.values())[:1000]
+        queries = []
+        for _ in range(options['queries']):
+            word = rng.choice(vocabulary)
+            prefix = word[:rng.randint(1, min(len(word), 8))]
+            if rng.random() < 0.3:
+                prefix = f"{rng.choice(vocabulary)} {prefix}"
+            queries.append(prefix)
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            # Everything the view does except the HTTP round trip
+            results = [suggestion(kind, label) for kind, label in index.index.search(query)]
+            json.dumps({'results': results})
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        p99 = timings[int(len(timings) * 0.99) - 1]
+
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(f"Index: {len(index.index):,} keys built in {build_seconds:.1f}s")
+        self.stdout.write(f"Lookups: {len(timings):,}")
+        self.stdout.write(f"  p50: {p50:.3f} ms")
+        self.stdout.write(f"  p95: {p95:.3f} ms")
+        self.stdout.write(f"  p99: {p99:.3f} ms")
+        self.stdout.write(f"  max: {timings[-1]:.3f} ms")
+        self.stdout.write("="*50)
+        style = self.style.SUCCESS if p99 < 10 else self.style.WARNING
+        self.stdout.write(style(f"p99 {'within' if p99 < 10 else 'over'} the 10 ms target"))
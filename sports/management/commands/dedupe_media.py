@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from sports.cleanup import Throttle, deduplicate_media
+
+
+class Command(BaseCommand):
+    help = 'Point rows at shared content-addressed blobs instead of per-upload copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would move without changing anything')
+        parser.add_argument('--rate', type=float, default=50, help='Maximum files per second (0: unlimited)')
+
+    def handle(self, *args, **options):
+        def report(name):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  {name}")
+
+        moved, missing = deduplicate_media(
+            throttle=Throttle(options['rate']), dry_run=options['dry_run'], progress_callback=report
+        )
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"✓ {verb} {moved} file name(s) onto shared blobs"))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"  {missing} referenced file(s) are missing from MEDIA_ROOT"))
+        if moved and not options['dry_run']:
+            self.stdout.write("  Run gc_media to delete the old copies once the grace period has passed")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import sys
+
+from sports.export import EXPORT_FORMATS, export_events
+
+
+class Command(BaseCommand):
+    help = 'Export every event as NDJSON or CSV for analytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=sorted(EXPORT_FORMATS),
+            default='ndjson',
+            help='Output format (default: ndjson)',
+        )
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Events fetched per query')
+        parser.add_argument('-o', '--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        blocks = export_events(
+            options['format'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for block in blocks:
+                    f.write(block)
+            self.stderr.write(self.style.SUCCESS(f"✓ Exported events to {options['output']}"))
+        else:
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
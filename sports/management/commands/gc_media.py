@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sports.cleanup import Throttle, delete_orphans, purge_cancelled_events
+
+
+class Command(BaseCommand):
+    help = 'Purge long-cancelled events, then delete media files no row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+        parser.add_argument('--batch-size', type=int, default=200, help='Files or events handled per batch')
+        parser.add_argument('--rate', type=float, default=100, help='Maximum files or events per second (0: unlimited)')
+        parser.add_argument(
+            '--cancelled-days',
+            type=int,
+            default=settings.CANCELLED_EVENT_RETENTION_DAYS,
+            help=f'Purge cancelled events dated this many days ago '
+                 f'(default: {settings.CANCELLED_EVENT_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=settings.MEDIA_GC_GRACE_HOURS,
+            help=f'Keep unreferenced files modified this recently (default: {settings.MEDIA_GC_GRACE_HOURS})',
+        )
+        parser.add_argument('--skip-events', action='store_true', help='Only collect media files')
+        parser.add_argument('--skip-media', action='store_true', help='Only purge cancelled events')
+
+    def handle(self, *args, **options):
+        dry_run, verbosity = options['dry_run'], options['verbosity']
+        verb = "Would delete" if dry_run else "Deleted"
+
+        if not options['skip_events']:
+            purged = purge_cancelled_events(
+                older_than_days=options['cancelled_days'],
+                batch_size=options['batch_size'],
+                throttle=Throttle(options['rate']),
+                dry_run=dry_run,
+                progress_callback=lambda count: self.stdout.write(f"  {count} event(s) so far"),
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {verb} {purged} event(s) cancelled over {options['cancelled_days']} days ago"
+            ))
+
+        if not options['skip_media']:
+            def report(batch):
+                if verbosity > 1:
+                    for name, _ in batch:
+                        self.stdout.write(f"  {name}")
+
+            files, size = delete_orphans(
+                batch_size=options['batch_size'],
+                throttle=Throttle(options['rate']),
+                dry_run=dry_run,
+                grace=timedelta(hours=options['grace_hours']),
+                progress_callback=report,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {verb} {files} orphaned media file(s), {size / 1024 / 1024:.1f} MB"
+            ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+import asyncio
+
+from sports.loadtest import SCENARIOS, Plan, run
+from sports.models import SPORTS, User, Events
+
+
+class Command(BaseCommand):
+    help = 'Load test a running server with scripted user scenarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between steps in seconds')
+        parser.add_argument('--password', default='demo1234', help='Password of the demo accounts')
+
+    def handle(self, *args, **options):
+        if not options['url'].startswith('http://'):
+            raise CommandError("Only plain http:// URLs are supported.")
+
+        # Read the targets from the same database the server uses
+        upcoming = Events.objects.filter(timestamp__gte=timezone.now(), is_cancelled=False, is_archived=False)
+        event_ids = list(upcoming.values_list('pk', flat=True))
+        if not event_ids:
+            raise CommandError("No upcoming events found. Run `python manage.py populate_demo` first.")
+        hot_event_id = upcoming.annotate(n=Count('attendees')).order_by('-n').values_list('pk', flat=True)[0]
+        accounts = list(User.objects.filter(is_staff=False).order_by('pk').values_list('username', flat=True))
+        search_terms = sorted({word for title in upcoming.values_list('title', flat=True)
+                               for word in title.split() if len(word) > 3})
+
+        plan = Plan(event_ids, hot_event_id, search_terms or ['game'], [value for value, _ in SPORTS])
+        self.stdout.write(
+            f"Running '{options['scenario']}' with {options['users']} users for {options['duration']:.0f}s "
+            f"against {options['url']} ({len(accounts)} accounts, hot event #{hot_event_id})..."
+        )
+        stats = asyncio.run(run(
+            options['url'], options['scenario'], plan, accounts, options['password'],
+            options['users'], options['duration'], options['think_time'],
+        ))
+
+        rows = list(stats.report())
+        if not rows:
+            raise CommandError("No requests were completed. Is the server running and can the demo users log in?")
+
+        self.stdout.write(f"{stats.users_started} of {stats.users_requested} virtual users started")
+        header = (
+            f"{'endpoint':<20}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'err %':>8}{'4xx %':>8}{'429/503 %':>11}"
+        )
+        self.stdout.write("\n" + header)
+        self.stdout.write("-" * len(header))
+        for row in rows:
+            line = (
+                f"{row['endpoint']:<20}{row['requests']:>8}{row['rps']:>9.1f}{row['p50']:>9.1f}"
+                f"{row['p95']:>9.1f}{row['p99']:>9.1f}{row['errors']:>8.1f}{row['client_errors']:>8.1f}"
+                f"{row['throttled']:>11.1f}"
+            )
+            self.stdout.write(self.style.SUCCESS(line) if row['endpoint'] == 'TOTAL' else line)
+
+        if rows[-1]['throttled']:
+            self.stdout.write(self.style.WARNING(
+                "\nSome requests were rate limited (429) or shed (503). Start the server with "
+                "RATE_LIMIT_ENABLED=False and WRITE_CONCURRENCY_LIMIT=0 to measure raw capacity."
+            ))
+
+        if stats.users_started < stats.users_requested:
+            message = (
+                f"Only {stats.users_started} of {stats.users_requested} virtual users logged in, so the "
+                f"figures above are for {stats.users_started} concurrent users."
+            )
+            if stats.statuses['login'][429]:
+                message += (
+                    " Logins were rate limited: every virtual user logs in from this machine's address, "
+                    "which gets LOGIN_RATE_LIMIT attempts per 5 minutes. Start the server with a higher "
+                    "LOGIN_RATE_LIMIT or with RATE_LIMIT_ENABLED=False."
+                )
+            raise CommandError(message)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sports.recurrence import materialize
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming occurrences of recurring events up to the rolling horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SERIES_HORIZON_DAYS,
+            help=f'Horizon in days from today (default: {settings.SERIES_HORIZON_DAYS})',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Series handled per bulk insert')
+
+    def handle(self, *args, **options):
+        created = materialize(horizon_days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Materialized {created} occurrence(s) through the next {options['days']} days"
+        ))
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import random
 import os
  
+from sports.demo import IMAGE_MAP, PROFILE_PICTURES
 from sports.models import User, Events, EventComment
 
 
@@ -41,7 +42,6 @@ class Command(BaseCommand):
                 'last_name': 'Johnson',
                 'bio': 'Marathon runner and fitness enthusiast. Love organizing community runs!',
                 'favorite_sports': 'Running, Cycling, Swimming',
-                'profile_picture': 'profile_pics/sarah_runner.png'
             },
             {
                 'username': 'mike_baller',
@@ -110,8 +110,8 @@ class Command(BaseCommand):
 
         users = []
         for user_data in demo_users:
-            # Separate profile picture from other data
-            profile_pic_path = user_data.pop('profile_picture', None)
+            # Stock profile picture, if this demo user has one
+            profile_pic_path = PROFILE_PICTURES.get(user_data['username'])
             password = user_data.pop('password')
 
             user, created = User.objects.update_or_create(
@@ -305,17 +305,6 @@ class Command(BaseCommand):
             },
         ]
 
-        # Map categories to representative images. Assumes images are in MEDIA_ROOT/events/
-        IMAGE_MAP = {
-            # Corrected to use actual available images
-            'soccer': ['events/soccer.jpeg'],
-            'volleyball': ['events/volleyball.jpg'],
-            'golf': ['events/golf.jpeg'],
-            'ultimate_frisbee': ['events/ultimate_frisbee.jpeg'],
-            'cricket': ['events/cricket.jpg'],
-            # Other categories will not have images and will fall back gracefully.
-        }
-
         # Time slots for events
         time_slots = [
             (8, 0),   # 8:00 AM
@@ -382,6 +371,8 @@ class Command(BaseCommand):
                         max_attendees=template['max_attendees'],
                         image=event_image
                     )
+                    if event_image:
+                        event_image.close()
                     
                     # Add host as attendee
                     event.attendees.add(host)
@@ -449,6 +440,8 @@ class Command(BaseCommand):
                 max_attendees=template['max_attendees'],
                 image=event_image
             )
+            if event_image:
+                event_image.close()
             
             # Add attendees to past events
             event.attendees.add(host)
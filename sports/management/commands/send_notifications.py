@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from sports.notifications import send_due_notifications
+
+
+class Command(BaseCommand):
+    help = 'Send coalesced e-mail notifications whose window has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Messages sent between progress updates')
+        parser.add_argument('--limit', type=int, help='Send at most this many notifications')
+
+    def handle(self, *args, **options):
+        stats = send_due_notifications(batch_size=options['batch_size'], limit=options['limit'])
+
+        if stats['failed']:
+            self.stdout.write(self.style.WARNING(
+                f"! {stats['failed']} notification(s) failed and will be retried or marked failed"
+            ))
+        if not stats['notifications']:
+            if not stats['failed']:
+                self.stdout.write("No notifications due.")
+            return
+
+        rate = stats['messages'] / stats['elapsed'] if stats['elapsed'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Sent {stats['messages']} message(s) for {stats['notifications']} event(s) "
+            f"in {stats['batches']} batch(es)"
+        ))
+        self.stdout.write(f"  elapsed: {stats['elapsed']:.2f}s ({rate:.0f} msgs/s)")
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from collections import defaultdict
+import json
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+PHASE_MARK = '-- phase: '
+
+# Runs in a fresh interpreter started with -X importtime, which writes one
+# line per imported module to stderr. Phase marks on stderr attribute each
+# import to the phase that triggered it; timings go to stdout as JSON.
+WORKER = r'''
+import io, json, sys, time
+started = time.perf_counter()
+timings = {}
+
+def phase(name):
+    sys.stderr.write('%s%s\n' % (MARK, name))
+    sys.stderr.flush()
+
+def request(app, path):
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    statuses = []
+    response = app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+phase('settings')
+from django.conf import settings
+settings.INSTALLED_APPS
+timings['settings'] = time.perf_counter() - started
+
+phase('setup')
+mark = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+app = get_wsgi_application()
+timings['setup'] = time.perf_counter() - mark
+
+phase('first request')
+mark = time.perf_counter()
+status = request(app, PATH)
+timings['first request'] = time.perf_counter() - mark
+
+phase('warm request')
+mark = time.perf_counter()
+request(app, PATH)
+timings['warm request'] = time.perf_counter() - mark
+timings['total'] = time.perf_counter() - started
+
+print(json.dumps({'timings': timings, 'status': status}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report per-module import cost and time to first request for a cold worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL path of the first request')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to measure; the fastest is reported')
+
+    def handle(self, *args, **options):
+        runs = [self._cold_start(options['path']) for _ in range(max(1, options['runs']))]
+        fastest = min(runs, key=lambda run: run['timings']['total'])
+        timings, imports = fastest['timings'], fastest['imports']
+
+        self.stdout.write("\n" + "="*60)
+        self.stdout.write(f"Cold start of GET {options['path']} (HTTP {fastest['status']}), "
+                          f"fastest of {len(runs)}")
+        self.stdout.write("="*60)
+        for phase in ('settings', 'setup', 'first request', 'warm request'):
+            count = sum(1 for module in imports if module['phase'] == phase)
+            self.stdout.write(f"  {phase:<15}{timings[phase] * 1000:>9.1f} ms  {count:>5} modules imported")
+        self.stdout.write(self.style.SUCCESS(
+            f"  {'total':<15}{timings['total'] * 1000:>9.1f} ms  {len(imports):>5} modules imported"
+        ))
+
+        # Self time summed per top-level package shows which dependency costs most
+        packages = defaultdict(int)
+        for module in imports:
+            packages[module['name'].split('.')[0]] += module['self']
+        self.stdout.write(f"\nSlowest packages (import self time, ms):")
+        for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {micros / 1000:>8.1f}  {package}")
+
+        self.stdout.write(f"\nSlowest modules (cumulative import time, ms):")
+        for module in sorted(imports, key=lambda module: -module['cumulative'])[:options['top']]:
+            self.stdout.write(
+                f"  {module['cumulative'] / 1000:>8.1f}  {module['name']:<50} [{module['phase']}]"
+            )
+
+        late = sorted(
+            (module for module in imports if module['phase'] == 'first request' and module['depth'] == 0),
+            key=lambda module: -module['cumulative']
+        )
+        if late:
+            self.stdout.write(f"\nImported while serving the first request:")
+            for module in late[:options['top']]:
+                self.stdout.write(f"  {module['cumulative'] / 1000:>8.1f}  {module['name']}")
+
+    def _cold_start(self, path):
+        script = f"MARK = {PHASE_MARK!r}\nPATH = {path!r}\n" + WORKER
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'capstone.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(f"The worker process failed:\n{result.stderr[-2000:]}")
+
+        imports, phase = [], 'interpreter'
+        for line in result.stderr.splitlines():
+            if line.startswith(PHASE_MARK):
+                phase = line[len(PHASE_MARK):]
+                continue
+            match = IMPORT_LINE_RE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                imports.append({
+                    'name': name,
+                    'self': int(self_us),
+                    'cumulative': int(cumulative_us),
+                    'depth': len(indent) // 2,
+                    'phase': phase,
+                })
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['imports'] = imports
+        return report
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='events',
+            name='is_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(fields=['date'], name='events_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(fields=['category'], name='events_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(fields=['skill_level'], name='events_skill_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(fields=['is_cancelled'], name='events_cancelled_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0002_admin_indexes_and_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated', models.BooleanField(default=False)),
+                ('cancelled', models.BooleanField(default=False)),
+                ('new_comments', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('send_after', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='sports.events')),
+            ],
+            options={
+                'ordering': ['send_after'],
+                'indexes': [models.Index(fields=['sent_at', 'send_after'], name='notification_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('sent_at__isnull', True)), fields=('event',), name='one_pending_notification_per_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0004_event_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField(max_length=500)),
+                ('start', models.TimeField()),
+                ('end', models.TimeField()),
+                ('category', models.CharField(choices=[('soccer', 'Soccer'), ('basketball', 'Basketball'), ('tennis', 'Tennis'), ('volleyball', 'Volleyball'), ('baseball', 'Baseball'), ('football', 'Football'), ('softball', 'Softball'), ('golf', 'Golf'), ('ultimate_frisbee', 'Ultimate Frisbee'), ('cycling', 'Cycling'), ('running', 'Running'), ('swimming', 'Swimming'), ('badminton', 'Badminton'), ('table_tennis', 'Table Tennis'), ('cricket', 'Cricket'), ('rugby', 'Rugby'), ('hockey', 'Hockey'), ('chess', 'Chess'), ('other', 'Other')], max_length=64)),
+                ('skill_level', models.CharField(choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'), ('advanced', 'Advanced'), ('all', 'All Levels')], default='all', max_length=20)),
+                ('max_attendees', models.IntegerField(default=10, validators=[django.core.validators.MinValueValidator(2), django.core.validators.MaxValueValidator(100)])),
+                ('image', models.ImageField(blank=True, null=True, upload_to='events/')),
+                ('frequency', models.CharField(choices=[('weekly', 'Every week'), ('biweekly', 'Every two weeks'), ('monthly', 'Every month')], default='weekly', max_length=10)),
+                ('starts_on', models.DateField()),
+                ('until', models.DateField(blank=True, null=True)),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('materialized_until', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_hosted', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Event series',
+                'verbose_name_plural': 'Event series',
+            },
+        ),
+        migrations.AddField(
+            model_name='events',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='sports.eventseries'),
+        ),
+        migrations.AddConstraint(
+            model_name='events',
+            constraint=models.UniqueConstraint(fields=('series', 'date'), name='one_occurrence_per_series_date'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+from datetime import datetime
+
+
+def backfill_agenda(apps, schema_editor):
+    """One row per host and attendee of every event that is not cancelled."""
+    Events = apps.get_model('sports', 'Events')
+    AgendaEntry = apps.get_model('sports', 'AgendaEntry')
+    Attendance = Events.attendees.through
+
+    def span(date, start, end):
+        return (
+            timezone.make_aware(datetime.combine(date, start)),
+            timezone.make_aware(datetime.combine(date, end)),
+        )
+
+    events = Events.objects.filter(is_cancelled=False).order_by('pk').values_list('pk', 'host_id', 'date', 'start', 'end')
+    chunk = []
+    for event in events.iterator(chunk_size=1000):
+        chunk.append(event)
+        if len(chunk) == 1000:
+            _backfill_chunk(AgendaEntry, Attendance, chunk, span)
+            chunk = []
+    if chunk:
+        _backfill_chunk(AgendaEntry, Attendance, chunk, span)
+
+
+def _backfill_chunk(AgendaEntry, Attendance, chunk, span):
+    users = {pk: {host_id} for pk, host_id, *_ in chunk}
+    for event_id, user_id in Attendance.objects.filter(events_id__in=users).values_list('events_id', 'user_id'):
+        users[event_id].add(user_id)
+    entries = []
+    for pk, host_id, date, start, end in chunk:
+        starts_at, ends_at = span(date, start, end)
+        entries.extend(
+            AgendaEntry(user_id=user_id, event_id=pk, starts_at=starts_at, ends_at=ends_at, is_host=user_id == host_id)
+            for user_id in users[pk]
+        )
+    AgendaEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0005_event_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendaEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('is_host', models.BooleanField(default=False)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agenda_entries', to='sports.events')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='agenda', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Agenda entries',
+                'ordering': ['starts_at', 'event'],
+                'indexes': [models.Index(fields=['user', 'starts_at', 'ends_at', 'is_host', 'event'], name='agenda_user_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'user'), name='one_agenda_entry_per_event')],
+            },
+        ),
+        migrations.RunPython(backfill_agenda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+def require_backfill(apps, schema_editor):
+    """Existing history is counted by `backfill_rollups`, not by live updates."""
+    Events = apps.get_model('sports', 'Events')
+    EventComment = apps.get_model('sports', 'EventComment')
+    if Events.objects.exists() or EventComment.objects.exists():
+        apps.get_model('sports', 'RollupProgress').objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0006_agenda_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('events_through', models.BigIntegerField(default=0)),
+                ('comments_through', models.BigIntegerField(default=0)),
+                ('complete', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryWeekStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField(help_text='Monday of the week')),
+                ('category', models.CharField(choices=[('soccer', 'Soccer'), ('basketball', 'Basketball'), ('tennis', 'Tennis'), ('volleyball', 'Volleyball'), ('baseball', 'Baseball'), ('football', 'Football'), ('softball', 'Softball'), ('golf', 'Golf'), ('ultimate_frisbee', 'Ultimate Frisbee'), ('cycling', 'Cycling'), ('running', 'Running'), ('swimming', 'Swimming'), ('badminton', 'Badminton'), ('table_tennis', 'Table Tennis'), ('cricket', 'Cricket'), ('rugby', 'Rugby'), ('hockey', 'Hockey'), ('chess', 'Chess'), ('other', 'Other')], max_length=64)),
+                ('events_created', models.IntegerField(default=0)),
+                ('fill_percent_total', models.IntegerField(default=0)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Category week stats',
+                'ordering': ['-week', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('week', 'category'), name='one_rollup_per_category_week')],
+            },
+        ),
+        migrations.RunPython(require_backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:20
+
+import sports.models
+from django.db import migrations, models
+from django.utils import timezone
+from datetime import datetime
+
+BATCH_SIZE = 1000
+
+
+def backfill_starts_at(apps, schema_editor):
+    """Fill starts_at for existing events in primary-key batches (all in the site's zone)."""
+    Events = apps.get_model('sports', 'Events')
+    last_pk = 0
+    while True:
+        batch = list(Events.objects.filter(pk__gt=last_pk).order_by('pk').only('date', 'start')[:BATCH_SIZE])
+        if not batch:
+            break
+        for event in batch:
+            event.starts_at = timezone.make_aware(datetime.combine(event.date, event.start))
+        Events.objects.bulk_update(batch, ['starts_at'], batch_size=500)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0009_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventseries',
+            name='time_zone',
+            field=models.CharField(blank=True, max_length=64, validators=[sports.models.validate_time_zone]),
+        ),
+        migrations.AddField(
+            model_name='events',
+            name='time_zone',
+            field=models.CharField(blank=True, default='', help_text="IANA time zone of the date and times; blank means the site's", max_length=64, validators=[sports.models.validate_time_zone]),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='events',
+            name='starts_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_starts_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='events',
+            name='starts_at',
+            field=models.DateTimeField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(condition=models.Q(('is_archived', False), ('is_cancelled', False)), fields=['starts_at', 'timestamp'], name='events_listed_start_idx'),
+        ),
+    ]
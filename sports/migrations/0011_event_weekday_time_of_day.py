@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def time_of_day(start):
+    # The bucketing of sports.models.time_of_day when this migration was written
+    if start.hour >= 17:
+        return 'evening'
+    if start.hour >= 12:
+        return 'afternoon'
+    return 'morning'
+
+
+def backfill_derived(apps, schema_editor):
+    """Fill weekday and time_of_day for existing events in primary-key batches."""
+    Events = apps.get_model('sports', 'Events')
+    last_pk = 0
+    while True:
+        batch = list(Events.objects.filter(pk__gt=last_pk).order_by('pk').only('date', 'start')[:BATCH_SIZE])
+        if not batch:
+            break
+        for event in batch:
+            event.weekday, event.time_of_day = event.date.weekday(), time_of_day(event.start)
+        Events.objects.bulk_update(batch, ['weekday', 'time_of_day'], batch_size=500)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0010_event_start_times'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='events',
+            name='weekday',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], null=True),
+        ),
+        migrations.AddField(
+            model_name='events',
+            name='time_of_day',
+            field=models.CharField(blank=True, choices=[('morning', 'Morning'), ('afternoon', 'Afternoon'), ('evening', 'Evening')], default='', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_derived, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='events',
+            name='weekday',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')]),
+        ),
+        migrations.AddIndex(
+            model_name='events',
+            index=models.Index(condition=models.Q(('is_archived', False), ('is_cancelled', False)), fields=['weekday', 'time_of_day', 'timestamp'], name='events_listed_when_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0011_event_weekday_time_of_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventnotification',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='eventnotification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventnotification',
+            name='failed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='eventnotification',
+            name='last_error',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='eventnotification',
+            name='sent_through',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
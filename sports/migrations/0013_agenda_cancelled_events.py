@@ -0,0 +1,47 @@
+from django.db import migrations
+
+
+def backfill_cancelled(apps, schema_editor):
+    """Give cancelled events back the host and attendee rows 0006 skipped."""
+    Events = apps.get_model('sports', 'Events')
+    AgendaEntry = apps.get_model('sports', 'AgendaEntry')
+    Attendance = Events.attendees.through
+
+    events = Events.objects.filter(is_cancelled=True).order_by('pk').values_list('pk', 'host_id', 'starts_at', 'timestamp')
+    chunk = []
+    for event in events.iterator(chunk_size=1000):
+        chunk.append(event)
+        if len(chunk) == 1000:
+            _backfill_chunk(AgendaEntry, Attendance, chunk)
+            chunk = []
+    if chunk:
+        _backfill_chunk(AgendaEntry, Attendance, chunk)
+
+
+def _backfill_chunk(AgendaEntry, Attendance, chunk):
+    users = {pk: {host_id} for pk, host_id, *_ in chunk}
+    for event_id, user_id in Attendance.objects.filter(events_id__in=users).values_list('events_id', 'user_id'):
+        users[event_id].add(user_id)
+    entries = []
+    for pk, host_id, starts_at, ends_at in chunk:
+        entries.extend(
+            AgendaEntry(user_id=user_id, event_id=pk, starts_at=starts_at, ends_at=ends_at, is_host=user_id == host_id)
+            for user_id in users[pk]
+        )
+    AgendaEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+def drop_cancelled(apps, schema_editor):
+    AgendaEntry = apps.get_model('sports', 'AgendaEntry')
+    AgendaEntry.objects.filter(event__is_cancelled=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sports', '0012_notification_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_cancelled, drop_cancelled),
+    ]
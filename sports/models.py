@@ -1,8 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 class User(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
@@ -56,6 +60,127 @@ SKILL_LEVELS = (
     ("all", "All Levels")
 )
 
+WEEKDAYS = (
+    (0, "Monday"),
+    (1, "Tuesday"),
+    (2, "Wednesday"),
+    (3, "Thursday"),
+    (4, "Friday"),
+    (5, "Saturday"),
+    (6, "Sunday"),
+)
+
+# Buckets of the local start time, each starting at the given hour
+TIMES_OF_DAY = (
+    ("morning", "Morning"),
+    ("afternoon", "Afternoon"),
+    ("evening", "Evening"),
+)
+AFTERNOON_HOUR = 12
+EVENING_HOUR = 17
+
+def time_of_day(start):
+    """The TIMES_OF_DAY bucket of a local start time."""
+    if start.hour >= EVENING_HOUR:
+        return "evening"
+    if start.hour >= AFTERNOON_HOUR:
+        return "afternoon"
+    return "morning"
+
+RECURRENCE_FREQUENCIES = (
+    ("weekly", "Every week"),
+    ("biweekly", "Every two weeks"),
+    ("monthly", "Every month"),
+)
+
+# Events start and end on the same local date, so anything still running
+# started less than a day ago. This turns "not over yet" into a range on the
+# start column.
+MAX_EVENT_LENGTH = timedelta(days=1)
+
+def validate_time_zone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"Unknown time zone: {value}")
+
+def event_span(day, start, end, time_zone=''):
+    """
+    Aware (start, end) datetimes of an event held on `day` from `start` to
+    `end` local time in `time_zone` (blank: the site's TIME_ZONE).
+    """
+    zone = ZoneInfo(time_zone) if time_zone else timezone.get_default_timezone()
+    return (
+        timezone.make_aware(datetime.combine(day, start), zone),
+        timezone.make_aware(datetime.combine(day, end), zone),
+    )
+
+class EventSeries(models.Model):
+    """
+    A recurrence rule for a repeating event.
+
+    Occurrences are ordinary `Events` rows linked back through `series`. They
+    are only materialized up to a rolling horizon (see sports.recurrence), so
+    listings keep querying plain events. `exceptions` holds ISO dates that
+    are skipped.
+    """
+    host = models.ForeignKey(User, on_delete=models.CASCADE, related_name="series_hosted")
+    title = models.CharField(max_length=100)
+    description = models.TextField(max_length=500)
+    start = models.TimeField()
+    end = models.TimeField()
+    time_zone = models.CharField(max_length=64, blank=True, validators=[validate_time_zone])
+    category = models.CharField(max_length=64, choices=SPORTS)
+    skill_level = models.CharField(max_length=20, choices=SKILL_LEVELS, default="all")
+    max_attendees = models.IntegerField(
+        default=10,
+        validators=[MinValueValidator(2), MaxValueValidator(100)]
+    )
+    image = models.ImageField(upload_to="events/", null=True, blank=True)
+    frequency = models.CharField(max_length=10, choices=RECURRENCE_FREQUENCIES, default="weekly")
+    starts_on = models.DateField()
+    until = models.DateField(null=True, blank=True)
+    exceptions = models.JSONField(default=list, blank=True)
+    materialized_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Event series"
+        verbose_name_plural = "Event series"
+
+    def __str__(self):
+        return f"{self.title} ({self.get_frequency_display().lower()})"
+
+class EventQuerySet(models.QuerySet):
+    def with_attendee_count(self):
+        """
+        Annotate `attendee_count` with a correlated COUNT on the attendees
+        table, which keeps the outer query free of joins and GROUP BY.
+        """
+        counts = self.model.attendees.through.objects.filter(
+            events_id=OuterRef('pk')
+        ).order_by().values('events_id').annotate(count=Count('id')).values('count')
+        return self.annotate(attendee_count=Coalesce(Subquery(counts), 0))
+
+    # Both listings match events_listed_start_idx's condition and order, so
+    # they are range scans of that index
+
+    def starting_soon(self, now=None, within=timedelta(hours=2)):
+        """Listed events starting in the next `within`, soonest first."""
+        now = now or timezone.now()
+        return self.filter(
+            is_cancelled=False, is_archived=False, starts_at__gte=now, starts_at__lt=now + within
+        ).order_by('starts_at', 'timestamp')
+
+    def live(self, now=None):
+        """Listed events that have started and not yet ended."""
+        now = now or timezone.now()
+        return self.filter(
+            is_cancelled=False, is_archived=False,
+            starts_at__gt=now - MAX_EVENT_LENGTH, starts_at__lte=now, timestamp__gt=now
+        ).order_by('starts_at', 'timestamp')
+
 class Events(models.Model):
     title = models.CharField(max_length=100, null=False, blank=False)
     description = models.TextField(max_length=500, null=False, blank=False)
@@ -64,7 +189,17 @@ class Events(models.Model):
     date = models.DateField(blank=False)
     start = models.TimeField(blank=False)
     end = models.TimeField(blank=False)
+    time_zone = models.CharField(
+        max_length=64, blank=True, validators=[validate_time_zone],
+        help_text="IANA time zone of the date and times; blank means the site's"
+    )
+    # Both set by save() from date, start, end and time_zone, stored in UTC
+    starts_at = models.DateTimeField(blank=True)
     timestamp = models.DateTimeField(blank=True)
+    # Set by save() from the local date and start, so weekday and
+    # time-of-day filters compare plain indexed columns
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS, blank=True)
+    time_of_day = models.CharField(max_length=10, choices=TIMES_OF_DAY, blank=True)
     category = models.CharField(max_length=64, choices=SPORTS, null=False, blank=False)
     skill_level = models.CharField(max_length=20, choices=SKILL_LEVELS, default="all")
     max_attendees = models.IntegerField(
@@ -75,18 +210,40 @@ class Events(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_cancelled = models.BooleanField(default=False)
+    is_archived = models.BooleanField(default=False)
+    series = models.ForeignKey(
+        EventSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name="occurrences"
+    )
+
+    objects = EventQuerySet.as_manager()
     
     class Meta:
         ordering = ['date', 'start']
         verbose_name = "Event"
         verbose_name_plural = "Events"
+        indexes = [
+            models.Index(fields=['date'], name='events_date_idx'),
+            models.Index(fields=['category'], name='events_category_idx'),
+            models.Index(fields=['skill_level'], name='events_skill_level_idx'),
+            models.Index(fields=['is_cancelled'], name='events_cancelled_idx'),
+            models.Index(
+                fields=['starts_at', 'timestamp'], name='events_listed_start_idx',
+                condition=Q(is_cancelled=False, is_archived=False)
+            ),
+            models.Index(
+                fields=['weekday', 'time_of_day', 'timestamp'], name='events_listed_when_idx',
+                condition=Q(is_cancelled=False, is_archived=False)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'date'], name='one_occurrence_per_series_date'),
+        ]
     
     def save(self, *args, **kwargs):
-        """Override save to automatically set the timestamp."""
-        if self.date and self.end:
-            # Combine date and end time to create a datetime object for the event's conclusion
-            event_end_datetime = datetime.combine(self.date, self.end)
-            self.timestamp = timezone.make_aware(event_end_datetime)
+        """Override save to set the UTC start and end and the derived weekday and time of day."""
+        if self.date and self.start and self.end:
+            self.starts_at, self.timestamp = event_span(self.date, self.start, self.end, self.time_zone)
+            self.weekday, self.time_of_day = self.date.weekday(), time_of_day(self.start)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -120,6 +277,27 @@ class Events(models.Model):
     def is_upcoming(self):
         return not self.is_past and not self.is_cancelled
     
+    def fill_from_waitlist(self):
+        """
+        Move waiting users, longest-waiting first, into the event's free
+        spots and return their ids.
+
+        Must run inside the transaction that freed the spots or raised
+        max_attendees. Each head entry is claimed with a conditional DELETE,
+        so when two requests race only the one that removed an entry adds
+        that user.
+        """
+        promoted = []
+        while not self.is_full:
+            head = self.waitlist.order_by('id').values_list('pk', 'user_id').first()
+            if head is None:
+                break
+            entry_id, user_id = head
+            if WaitlistEntry.objects.filter(pk=entry_id).delete()[0]:
+                self.attendees.add(user_id)
+                promoted.append(user_id)
+        return promoted
+
     def can_join(self, user):
         """Check if a user can join this event."""
         if self.is_past or self.is_cancelled or self.is_full:
@@ -165,3 +343,183 @@ class EventComment(models.Model):
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.event.title}"
+
+class EventNotification(models.Model):
+    """
+    Attendee notification waiting to be sent for an event.
+
+    Changes made within the coalescing window are merged into the single
+    unsent row for the event, so attendees get one message per window.
+    """
+    event = models.ForeignKey(Events, on_delete=models.CASCADE, related_name="notifications")
+    updated = models.BooleanField(default=False)
+    cancelled = models.BooleanField(default=False)
+    new_comments = models.PositiveIntegerField(default=0)
+    # Who made the changes; they are not e-mailed about them. Cleared when
+    # changes by different users are merged into the row.
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    # Recipients are e-mailed in primary-key order; a retry resumes after
+    # the last one whose batch went out
+    sent_through = models.BigIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    failed = models.BooleanField(default=False)
+    last_error = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['send_after']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event'],
+                condition=Q(sent_at__isnull=True),
+                name='one_pending_notification_per_event',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['sent_at', 'send_after'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.event.title} ({'sent' if self.sent_at else 'pending'})"
+
+class WaitlistEntry(models.Model):
+    """
+    A user queued for a spot on a full event.
+
+    The queue is served in primary key order. SQLite's AUTOINCREMENT keys only
+    ever grow, so the key doubles as the sequence number and joining the queue
+    needs no counter row or lock. The (event, id) index makes "next in line"
+    a single index lookup; "my position" is an index range count, see
+    `position`.
+    """
+    event = models.ForeignKey(Events, on_delete=models.CASCADE, related_name="waitlist")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="waitlisted")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='one_waitlist_entry_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['event', 'id'], name='waitlist_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
+
+    @property
+    def position(self):
+        """
+        1-based place in the queue.
+
+        Counted over the (event, id) index without touching the table, but
+        the count is linear in the number of entries ahead of this one. Users
+        can leave from the middle of the queue, so the place cannot be
+        derived from sequence numbers alone.
+        """
+        return WaitlistEntry.objects.filter(event_id=self.event_id, id__lte=self.id).count()
+
+class AgendaEntry(models.Model):
+    """
+    One commitment on a user's schedule: an event they host or attend.
+
+    Denormalizes the event's start and end so that a user's agenda is read
+    with a range scan of one covering index, in start order, without
+    touching the attendees table or the events table. Rows are kept in step
+    by sports.agenda; cancelled events keep theirs.
+    """
+    # The agenda index leads with user, so the FK needs no index of its own
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="agenda", db_index=False)
+    event = models.ForeignKey(Events, on_delete=models.CASCADE, related_name="agenda_entries")
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    is_host = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['starts_at', 'event']
+        verbose_name_plural = "Agenda entries"
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='one_agenda_entry_per_event'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'starts_at', 'ends_at', 'is_host', 'event'], name='agenda_user_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.event.title}"
+
+class CategoryWeekStats(models.Model):
+    """
+    Analytics rollup for the events of one category created in one week.
+
+    `events_created`, `fill_percent_total` (the sum of each event's
+    attendance_percentage) and `cancellations` cover the events created that
+    week. `comments` counts the comments posted that week. sports.rollups
+    keeps the counters current from the write paths; the staff dashboard
+    reads nothing else.
+    """
+    week = models.DateField(help_text="Monday of the week")
+    category = models.CharField(max_length=64, choices=SPORTS)
+    events_created = models.IntegerField(default=0)
+    fill_percent_total = models.IntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-week', 'category']
+        verbose_name_plural = "Category week stats"
+        constraints = [
+            models.UniqueConstraint(fields=['week', 'category'], name='one_rollup_per_category_week'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_category_display()} week of {self.week}"
+
+    @property
+    def average_fill(self):
+        return round(self.fill_percent_total / self.events_created) if self.events_created else 0
+
+class RollupProgress(models.Model):
+    """
+    How far `backfill_rollups` has got through history.
+
+    Until the backfill is complete, live updates only touch rows it has
+    already counted, so nothing is counted twice. No row means there is no
+    history to backfill.
+    """
+    events_through = models.BigIntegerField(default=0)
+    comments_through = models.BigIntegerField(default=0)
+    complete = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return "Complete" if self.complete else f"Events through #{self.events_through}"
+
+class MaintenanceCheckpoint(models.Model):
+    """
+    Where a resumable maintenance job (see sports.cleanup) stopped: the last
+    primary key it finished. Jobs reset it to 0 after a complete pass.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at #{self.position}"
+
+class MediaBlob(models.Model):
+    """
+    One stored file of sports.storage.ContentAddressedStorage, named after
+    the SHA-256 of its content. `refs` counts the rows pointing at it; uploads
+    and deletes adjust it, and `gc_media` recounts it from the database.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    size = models.BigIntegerField()
+    refs = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
@@ -0,0 +1,222 @@
+"""
+Coalesced, batched e-mail notifications about event changes.
+
+Views only record that something changed (`enqueue_event_changes`), which is
+one UPDATE or INSERT. The `send_notifications` management command later turns
+each due row into one message per attendee, rendered and sent in batches
+over a single pooled mail connection. Progress is recorded after every
+batch and at a failure, so a notification that fails part-way is retried
+later from the first recipient not yet e-mailed, and the run moves on to
+the next one on a fresh connection.
+"""
+import time
+from contextlib import closing
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import EventNotification
+
+
+def enqueue_event_changes(event_ids, updated=False, cancelled=False, comments=0, actor=None):
+    """
+    Record a change for each event, merging it into the event's pending
+    notification if one is still waiting for its coalescing window.
+
+    `actor`, the user who made the change, is not e-mailed about it unless
+    someone else's change is merged into the same notification.
+    """
+    actor_id = getattr(actor, 'pk', actor)
+    changes = {}
+    if updated:
+        changes['updated'] = True
+    if cancelled:
+        changes['cancelled'] = True
+    if comments:
+        changes['new_comments'] = F('new_comments') + comments
+
+    remaining = set(event_ids)
+    if not remaining or not changes:
+        return
+
+    for _ in range(2):
+        with transaction.atomic():
+            merged = set(EventNotification.objects.filter(
+                event_id__in=remaining, sent_at__isnull=True
+            ).values_list('event_id', flat=True))
+            if merged:
+                EventNotification.objects.filter(
+                    event_id__in=merged, sent_at__isnull=True
+                ).update(
+                    actor=Case(When(actor_id=actor_id, then=F('actor')), default=Value(None)),
+                    **changes
+                )
+                remaining -= merged
+
+            send_after = timezone.now() + timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS)
+            try:
+                with transaction.atomic():
+                    EventNotification.objects.bulk_create([
+                        EventNotification(
+                            event_id=event_id,
+                            updated=updated,
+                            cancelled=cancelled,
+                            new_comments=comments,
+                            actor_id=actor_id,
+                            send_after=send_after,
+                        )
+                        for event_id in remaining
+                    ])
+                return
+            except IntegrityError:
+                # Another request created a pending row first; merge into it
+                continue
+
+
+def send_due_notifications(batch_size=None, limit=None):
+    """
+    Send every notification whose window has passed and return throughput
+    statistics for the run.
+
+    A notification whose sending raises is released for a later retry (or
+    given up on after NOTIFICATION_MAX_ATTEMPTS) and counted under 'failed';
+    the others are still sent.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    template = get_template('sports/emails/event_update.txt')
+    stats = {'notifications': 0, 'messages': 0, 'batches': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    due = EventNotification.objects.filter(
+        sent_at__isnull=True,
+        send_after__lte=timezone.now()
+    ).select_related('event')
+    if limit:
+        due = due[:limit]
+
+    # One connection for the whole run instead of one per message
+    connection = mail.get_connection()
+    try:
+        for notification in due:
+            # Claim the row so concurrent senders never send it twice
+            claimed = EventNotification.objects.filter(
+                pk=notification.pk, sent_at__isnull=True
+            ).update(sent_at=timezone.now())
+            if not claimed:
+                continue
+            try:
+                sent, batches = _send_notification(notification, template, connection, batch_size)
+            except Exception as exc:
+                _release_failed(notification, exc)
+                stats['failed'] += 1
+                # The connection may have broken mid-conversation, so the
+                # next notification starts on a fresh one
+                _close_quietly(connection)
+                connection = mail.get_connection()
+                continue
+            stats['notifications'] += 1
+            stats['messages'] += sent
+            stats['batches'] += batches
+    finally:
+        _close_quietly(connection)
+
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _release_failed(notification, exc):
+    """
+    Record a failed attempt. The row is handed back to later runs with a
+    growing delay, keeping `sent_through` so nobody is e-mailed twice, until
+    it has used up its attempts.
+    """
+    attempts = notification.attempts + 1
+    failure = {'attempts': attempts, 'last_error': f"{type(exc).__name__}: {exc}"[:200]}
+    rows = EventNotification.objects.filter(pk=notification.pk)
+    if attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        rows.update(failed=True, **failure)
+        return
+
+    retry_after = timezone.now() + timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS * attempts)
+    try:
+        with transaction.atomic():
+            rows.update(sent_at=None, send_after=retry_after, **failure)
+    except IntegrityError:
+        # The event changed again since the row was claimed and has a new
+        # pending notification; it will tell every attendee about these
+        # changes as well, so fold them in and close this row
+        changes = {'updated': True} if notification.updated else {}
+        if notification.cancelled:
+            changes['cancelled'] = True
+        with transaction.atomic():
+            EventNotification.objects.filter(event_id=notification.event_id, sent_at__isnull=True).update(
+                new_comments=F('new_comments') + notification.new_comments,
+                actor=Case(When(actor_id=notification.actor_id, then=F('actor')), default=Value(None)),
+                **changes
+            )
+            rows.update(**failure)
+
+
+def _send_notification(notification, template, connection, batch_size):
+    event = notification.event
+    event_url = settings.SITE_URL.rstrip('/') + reverse('event_detail', args=[event.id])
+    if notification.cancelled:
+        subject = f"Cancelled: {event.title}"
+    else:
+        subject = f"Update: {event.title}"
+
+    recipients = event.attendees.exclude(email='').filter(pk__gt=notification.sent_through)
+    if notification.actor_id:
+        recipients = recipients.exclude(pk=notification.actor_id)
+    recipients = recipients.order_by('pk').values_list('pk', 'username', 'email')
+
+    def flush(batch):
+        # Messages go out one per send_messages() call on the open
+        # connection, so when one fails, the ones before it are known to
+        # have been sent. Progress is written once per batch, or at the
+        # failure before it propagates, and later attempts start after it.
+        sent, last_pk = 0, None
+        try:
+            for pk, message in batch:
+                sent += connection.send_messages([message]) or 0
+                last_pk = pk
+        finally:
+            if last_pk is not None:
+                EventNotification.objects.filter(pk=notification.pk).update(sent_through=last_pk)
+        return sent
+
+    sent = batches = 0
+    batch = []
+    # Closed explicitly so a failed send does not leave the cursor open
+    with closing(recipients.iterator(chunk_size=batch_size)) as rows:
+        for pk, username, email in rows:
+            body = template.render({
+                'username': username,
+                'event': event,
+                'event_url': event_url,
+                'notification': notification,
+            })
+            batch.append((pk, mail.EmailMessage(
+                subject, body, settings.DEFAULT_FROM_EMAIL, [email], connection=connection
+            )))
+            if len(batch) >= batch_size:
+                sent += flush(batch)
+                batches += 1
+                batch = []
+    if batch:
+        sent += flush(batch)
+        batches += 1
+    return sent, batches
@@ -0,0 +1,115 @@
+"""
+Per-user rate limiting and load shedding for write views.
+
+Budgets live in the default cache. Each check is a single `cache.incr()` on a
+counter for the current window (plus an `add()` on the first hit of a
+window), so it costs one round trip on the hot path. Load shedding uses a
+per-process semaphore and never touches the cache or the database.
+"""
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_write_slots = {}
+_write_slots_lock = threading.Lock()
+
+
+def client_identity(request, per_user=True):
+    """Identify the caller by user id when logged in, otherwise by IP."""
+    if per_user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def check_rate(scope, identity):
+    """
+    Spend one token from the caller's budget for `scope`.
+
+    Returns 0 when the request is allowed, otherwise the number of seconds
+    until the budget refills.
+    """
+    limit, period = settings.RATE_LIMITS[scope]
+    now = time.time()
+    window = int(now // period)
+    key = f'ratelimit:{scope}:{identity}:{window}'
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # First request in this window
+        if cache.add(key, 1, timeout=period):
+            count = 1
+        else:
+            count = cache.incr(key)
+    if count <= limit:
+        return 0
+    return max(1, math.ceil((window + 1) * period - now))
+
+
+def _error_response(request, message, status, retry_after):
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = JsonResponse({'success': False, 'message': message}, status=status)
+    else:
+        response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, per_user=True):
+    """
+    Reject unsafe requests with 429 once the caller's budget for `scope` is spent.
+
+    Set `per_user=False` to always budget by IP, e.g. for the login form.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED and request.method not in SAFE_METHODS:
+                retry_after = check_rate(scope, client_identity(request, per_user))
+                if retry_after:
+                    return _error_response(
+                        request,
+                        f"Too many requests. Please try again in {retry_after} seconds.",
+                        429,
+                        retry_after
+                    )
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _get_write_slots(limit):
+    slots = _write_slots.get(limit)
+    if slots is None:
+        with _write_slots_lock:
+            slots = _write_slots.setdefault(limit, threading.BoundedSemaphore(limit))
+    return slots
+
+
+def shed_load(view_func):
+    """
+    Answer 503 instead of queueing when too many writes are already running.
+
+    The cap is per worker process (WRITE_CONCURRENCY_LIMIT); requests over it
+    fail fast rather than piling up behind SQLite's single writer.
+    """
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        limit = settings.WRITE_CONCURRENCY_LIMIT
+        if not limit or request.method in SAFE_METHODS:
+            return view_func(request, *args, **kwargs)
+
+        slots = _get_write_slots(limit)
+        if not slots.acquire(blocking=False):
+            return _error_response(request, "The server is busy. Please try again shortly.", 503, 1)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            slots.release()
+    return wrapper
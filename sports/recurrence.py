@@ -0,0 +1,175 @@
+"""
+Recurring events.
+
+An `EventSeries` holds the rule; its occurrences are plain `Events` rows that
+are materialized in bulk only up to a rolling horizon by the
+`materialize_series` command. Changes to a series are pushed to its future
+occurrences with set-based UPDATEs rather than one save() per row.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Exists, OuterRef, Q, Value, When
+from django.utils import timezone
+
+from .models import Events, EventSeries, event_span, time_of_day
+from . import agenda, rollups
+from .notifications import enqueue_event_changes
+
+FREQUENCY_DAYS = {
+    'weekly': 7,
+    'biweekly': 14,
+}
+
+# Fields copied from a series onto each of its occurrences
+SERIES_FIELDS = ['title', 'description', 'start', 'end', 'time_zone', 'category', 'skill_level', 'max_attendees', 'image']
+
+
+def occurrence_dates(series, start, end):
+    """Yield the dates the series falls on between `start` and `end` inclusive."""
+    start = max(start, series.starts_on)
+    if series.until:
+        end = min(end, series.until)
+    skipped = {date.fromisoformat(value) for value in series.exceptions}
+
+    if series.frequency == 'monthly':
+        candidates = _monthly_dates(series.starts_on.day, start, end)
+    else:
+        step = FREQUENCY_DAYS[series.frequency]
+        offset = -(-(start - series.starts_on).days // step)  # ceiling division
+        first = series.starts_on + timedelta(days=offset * step)
+        candidates = (first + timedelta(days=step * n) for n in range((end - first).days // step + 1))
+
+    for day in candidates:
+        if start <= day <= end and day not in skipped:
+            yield day
+
+
+def _monthly_dates(day_of_month, start, end):
+    # Months without that day (e.g. the 31st in April) are skipped
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        if day_of_month <= calendar.monthrange(year, month)[1]:
+            yield date(year, month, day_of_month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _occurrence(series, day):
+    starts_at, timestamp = event_span(day, series.start, series.end, series.time_zone)
+    return Events(
+        series=series,
+        host_id=series.host_id,
+        date=day,
+        starts_at=starts_at,
+        timestamp=timestamp,
+        weekday=day.weekday(),
+        time_of_day=time_of_day(series.start),
+        **{field: getattr(series, field) for field in SERIES_FIELDS}
+    )
+
+
+def materialize(horizon_days=None, today=None, series_ids=None, batch_size=500):
+    """
+    Create every missing occurrence up to the horizon and return how many
+    were created.
+
+    Works through the due series in chunks: one bulk INSERT of events, one of
+    host attendance rows and one UPDATE of `materialized_until` per chunk.
+    """
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=horizon_days or settings.SERIES_HORIZON_DAYS)
+
+    due = EventSeries.objects.filter(
+        Q(until__isnull=True) | Q(until__gte=today),
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon),
+    ).order_by('pk')
+    if series_ids is not None:
+        due = due.filter(pk__in=series_ids)
+
+    created = 0
+    chunk = []
+    for series in due.iterator(chunk_size=batch_size):
+        chunk.append(series)
+        if len(chunk) >= batch_size:
+            created += _materialize_chunk(chunk, today, horizon)
+            chunk = []
+    if chunk:
+        created += _materialize_chunk(chunk, today, horizon)
+    return created
+
+
+def _materialize_chunk(chunk, today, horizon):
+    occurrences = []
+    for series in chunk:
+        first = today
+        if series.materialized_until:
+            first = max(first, series.materialized_until + timedelta(days=1))
+        occurrences.extend(_occurrence(series, day) for day in occurrence_dates(series, first, horizon))
+
+    series_ids = [series.pk for series in chunk]
+    Attendance = Events.attendees.through
+    window = Events.objects.filter(series_id__in=series_ids, date__gte=today, date__lte=horizon)
+    with transaction.atomic(), rollups.track(window):
+        # The (series, date) constraint makes re-runs and overlapping jobs harmless
+        Events.objects.bulk_create(occurrences, ignore_conflicts=True)
+        hosts = window.values_list('pk', 'host_id')
+        Attendance.objects.bulk_create(
+            [Attendance(events_id=event_id, user_id=host_id) for event_id, host_id in hosts],
+            ignore_conflicts=True
+        )
+        # Bulk inserts skip the signals that maintain agendas and rollups
+        agenda.add_hosts([event_id for event_id, _ in hosts])
+        EventSeries.objects.filter(pk__in=series_ids).update(materialized_until=horizon)
+    return len(occurrences)
+
+
+def sync_future_occurrences(series, since=None, actor=None):
+    """
+    Push the series' fields onto its upcoming occurrences and cancel the ones
+    that now fall on an exception or after `until`.
+
+    Occurrences other users have joined keep their details, as edit_event
+    refuses to change an event once others have joined; that also keeps
+    max_attendees from dropping below who is already going. Returns
+    (updated, cancelled) counts. Attendees of every touched occurrence are
+    notified, except `actor`, who made the change.
+    """
+    since = max(since or date.min, timezone.localdate())
+    upcoming = Events.objects.filter(series=series, date__gte=since, is_cancelled=False)
+
+    dropped = Q(date__in=series.exceptions)
+    if series.until:
+        dropped |= Q(date__gt=series.until)
+    cancelled_ids = list(upcoming.filter(dropped).values_list('pk', flat=True))
+    joined = Events.attendees.through.objects.filter(events_id=OuterRef('pk')).exclude(user_id=OuterRef('host_id'))
+    updated = dict(upcoming.exclude(pk__in=cancelled_ids).exclude(Exists(joined)).values_list('pk', 'date'))
+    updated_ids = list(updated)
+
+    # A zone's UTC offset can differ from one date to the next (DST), so the
+    # UTC times are computed per date and applied in the same UPDATE
+    spans = {day: event_span(day, series.start, series.end, series.time_zone) for day in set(updated.values())}
+
+    now = timezone.now()
+    with transaction.atomic(), rollups.track(Events.objects.filter(pk__in=cancelled_ids + updated_ids)):
+        Events.objects.filter(pk__in=cancelled_ids).update(is_cancelled=True, updated_at=now)
+        Events.objects.filter(pk__in=updated_ids).update(
+            starts_at=_by_date(spans, 0),
+            timestamp=_by_date(spans, 1),
+            time_of_day=time_of_day(series.start),
+            updated_at=now,
+            **{field: getattr(series, field) for field in SERIES_FIELDS}
+        )
+        agenda.sync_events(cancelled_ids + updated_ids)
+        enqueue_event_changes(cancelled_ids, cancelled=True, actor=actor)
+        enqueue_event_changes(updated_ids, updated=True, actor=actor)
+    return len(updated_ids), len(cancelled_ids)
+
+
+def _by_date(spans, index):
+    # Occurrence dates are unique within a series, so the date picks the row
+    return Case(
+        *(When(date=day, then=Value(span[index])) for day, span in spans.items()),
+        output_field=DateTimeField()
+    )
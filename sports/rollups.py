@@ -0,0 +1,186 @@
+"""
+Incremental analytics rollups per category and week (CategoryWeekStats).
+
+Each event contributes to the row for the week it was created in and its
+category: 1 to `events_created`, its attendance percentage to
+`fill_percent_total` and 1 to `cancellations` if cancelled. Write paths
+snapshot the contributions of the events they touch before and after the
+change and add the difference, so a join costs two indexed lookups and one
+counter UPDATE instead of a scan. Comments add 1 to the week they were
+posted in, under the event's category.
+
+Signals in signals.py cover model saves, deletes and attendee changes.
+Set-based writes wrap themselves in `track()`. `backfill()` counts existing
+history in primary-key chunks; until it finishes, live updates skip rows it
+has not reached yet (see RollupProgress).
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CategoryWeekStats, EventComment, Events, RollupProgress
+
+COUNTERS = ('events_created', 'fill_percent_total', 'cancellations', 'comments')
+
+
+def week_of(moment):
+    """Monday of the local week containing a datetime."""
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def fill_percent(attending, max_attendees):
+    """Same value as Events.attendance_percentage."""
+    if max_attendees == 0:
+        return 100
+    return min(int(attending / max_attendees * 100), 100)
+
+
+def snapshot(event_ids):
+    """Return {event id: (bucket, fill percent, cancelled)} for the events."""
+    rows = Events.objects.filter(pk__in=list(event_ids)).with_attendee_count().values_list(
+        'pk', 'created_at', 'category', 'max_attendees', 'is_cancelled', 'attendee_count'
+    )
+    return {
+        pk: ((week_of(created_at), category), fill_percent(attending, max_attendees), int(cancelled))
+        for pk, created_at, category, max_attendees, cancelled, attending in rows
+    }
+
+
+def _progress():
+    return RollupProgress.objects.filter(pk=1).values_list('complete', 'events_through', 'comments_through').first()
+
+
+def apply_changes(before, after):
+    """Add the difference between two snapshots to the rollups."""
+    progress = _progress()
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    recategorized = {}
+    for event_id in before.keys() | after.keys():
+        if progress and not progress[0] and event_id > progress[1]:
+            continue  # the backfill will count it as it is then
+        old, new = before.get(event_id), after.get(event_id)
+        _contribute(deltas, old, -1)
+        _contribute(deltas, new, 1)
+        if old and new and old[0][1] != new[0][1]:
+            recategorized[event_id] = (old[0][1], new[0][1])
+
+    if recategorized:
+        # Comments are counted under their event's category, so they move with it
+        comments = EventComment.objects.filter(event_id__in=recategorized)
+        if progress and not progress[0]:
+            comments = comments.filter(pk__lte=progress[2])
+        for event_id, created_at in comments.values_list('event_id', 'created_at'):
+            old_category, new_category = recategorized[event_id]
+            week = week_of(created_at)
+            deltas[(week, old_category)]['comments'] -= 1
+            deltas[(week, new_category)]['comments'] += 1
+    _add(deltas)
+
+
+def _contribute(deltas, state, sign):
+    if state:
+        bucket, fill, cancelled = state
+        deltas[bucket]['events_created'] += sign
+        deltas[bucket]['fill_percent_total'] += sign * fill
+        deltas[bucket]['cancellations'] += sign * cancelled
+
+
+def record_comment(comment, sign=1):
+    """Count a posted (sign=1) or deleted (sign=-1) comment."""
+    progress = _progress()
+    if progress and not progress[0] and comment.pk > progress[2]:
+        return
+    category = Events.objects.filter(pk=comment.event_id).values_list('category', flat=True).first()
+    if category:
+        _add({(week_of(comment.created_at), category): {'comments': sign}})
+
+
+@contextmanager
+def track(events):
+    """
+    Apply the rollup changes made by set-based writes to `events`, a
+    queryset evaluated before and after the block.
+    """
+    before = snapshot(events.values_list('pk', flat=True))
+    yield
+    after = snapshot(before.keys() | set(events.values_list('pk', flat=True)))
+    apply_changes(before, after)
+
+
+def _add(deltas):
+    """Add counter deltas to each (week, category) row, creating rows as needed."""
+    deltas = {
+        bucket: {name: value for name, value in counters.items() if value}
+        for bucket, counters in deltas.items()
+    }
+    deltas = {bucket: counters for bucket, counters in deltas.items() if counters}
+    if not deltas:
+        return
+    # Missing rows are created empty first, so concurrent writers never race
+    # on the unique constraint and every change is a relative UPDATE
+    CategoryWeekStats.objects.bulk_create(
+        [CategoryWeekStats(week=week, category=category) for week, category in deltas],
+        ignore_conflicts=True
+    )
+    for (week, category), counters in deltas.items():
+        CategoryWeekStats.objects.filter(week=week, category=category).update(
+            **{name: F(name) + value for name, value in counters.items()}
+        )
+
+
+def backfill(batch_size=1000, rebuild=False, progress_callback=None):
+    """
+    Count existing events, then comments, in primary-key chunks, resuming
+    where a previous run stopped. Returns (events, comments) counted.
+
+    Each chunk is one transaction that also advances RollupProgress, and
+    the run is only marked complete by a transaction that finds nothing
+    left, so rows created meanwhile are counted either here or live.
+    """
+    if rebuild:
+        with transaction.atomic():
+            CategoryWeekStats.objects.all().delete()
+            RollupProgress.objects.update_or_create(
+                pk=1, defaults={'events_through': 0, 'comments_through': 0, 'complete': False}
+            )
+
+    counted = {'events': 0, 'comments': 0}
+    while True:
+        with transaction.atomic():
+            progress = RollupProgress.objects.select_for_update().filter(pk=1).first()
+            if progress is None or progress.complete:
+                break
+            event_ids = list(Events.objects.filter(pk__gt=progress.events_through).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size])
+            if event_ids:
+                deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+                for state in snapshot(event_ids).values():
+                    _contribute(deltas, state, 1)
+                _add(deltas)
+                progress.events_through = event_ids[-1]
+                kind, count = 'events', len(event_ids)
+            else:
+                comments = list(EventComment.objects.filter(
+                    pk__gt=progress.comments_through
+                ).order_by('pk').values_list('pk', 'created_at', 'event__category')[:batch_size])
+                if not comments:
+                    progress.complete = True
+                    progress.save()
+                    break
+                deltas = defaultdict(lambda: {'comments': 0})
+                for _, created_at, category in comments:
+                    deltas[(week_of(created_at), category)]['comments'] += 1
+                _add(deltas)
+                progress.comments_through = comments[-1][0]
+                kind, count = 'comments', len(comments)
+            progress.save()
+        counted[kind] += count
+        if progress_callback:
+            progress_callback(kind, counted[kind])
+    return counted['events'], counted['comments']
@@ -0,0 +1,228 @@
+"""
+Views for serving static and media files from the application process.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# ManifestStaticFilesStorage inserts a 12 character md5 prefix before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=60'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Precompressed siblings in order of preference
+PRECOMPRESSED_ENCODINGS = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+
+
+def accepted_encodings(request):
+    """Return the content codings the client accepts with a non-zero q-value."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def resolve_file(root, path):
+    """Return the absolute path of `path` inside `root`, or raise Http404."""
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+    return full_path
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serve a collected static file, preferring a precompressed sibling the
+    client accepts. Hashed file names never change, so they are cached forever.
+    """
+    full_path = resolve_file(settings.STATIC_ROOT, path)
+    content_type, _ = mimetypes.guess_type(full_path)
+
+    served_path, encoding = full_path, None
+    accepted = accepted_encodings(request)
+    for coding, suffix in PRECOMPRESSED_ENCODINGS:
+        if coding in accepted and os.path.isfile(full_path + suffix):
+            served_path, encoding = full_path + suffix, coding
+            break
+
+    stat = os.stat(served_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(
+            open(served_path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+            filename=os.path.basename(full_path),
+        )
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+class FileRange:
+    """
+    File-like wrapper that reads at most `length` bytes from `offset`.
+
+    It deliberately exposes no fileno(), so WSGI servers stream it with
+    read() instead of sending the rest of the underlying file.
+    """
+
+    def __init__(self, file, offset, length):
+        self.file = file
+        self.file.seek(offset)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range` header into an inclusive (start, end) pair.
+
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range) and raises ValueError when the range is unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def media_cache_control(path):
+    """Return the Cache-Control value configured for a media sub-directory."""
+    for prefix, value in settings.MEDIA_CACHE_CONTROL.items():
+        if path.startswith(prefix):
+            return value
+    return settings.MEDIA_DEFAULT_CACHE_CONTROL
+
+
+def _range_applies(request, etag, mtime):
+    """Honour If-Range: only serve a partial body if the validator still matches."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file with ETag/Last-Modified validation and byte ranges.
+
+    When MEDIA_ACCEL_REDIRECT is set, the body is left to the front proxy via
+    X-Accel-Redirect (nginx) or X-Sendfile (Apache); otherwise the file is
+    streamed with FileResponse so WSGI servers can use sendfile.
+    """
+    full_path = resolve_file(settings.MEDIA_ROOT, path)
+    stat = os.stat(full_path)
+    etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        accel = settings.MEDIA_ACCEL_REDIRECT
+        if accel == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        elif accel == 'apache':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+        else:
+            response = _file_response(request, full_path, stat, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = media_cache_control(path)
+    return response
+
+
+def _file_response(request, full_path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    if request.method == 'GET' and _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        if end == size - 1:
+            # Open-ended ranges keep a real file so sendfile still applies
+            file.seek(start)
+            response = FileResponse(file, content_type=content_type, status=206)
+        else:
+            response = FileResponse(FileRange(file, start, end - start + 1), content_type=content_type, status=206)
+            response['Content-Length'] = end - start + 1
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+    response['Accept-Ranges'] = 'bytes'
+    return response
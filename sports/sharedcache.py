@@ -0,0 +1,256 @@
+"""
+A Django cache backend shared by every worker process on one host.
+
+Entries live in their own SQLite file in WAL mode, so readers in any
+process never block on a writer, and nothing else needs to run beside the
+app. Each operation is one statement or one short transaction, so a reader
+sees an entry either before or after a write, never half of one. Integers
+are stored as SQLite integers so `incr()` is a single atomic UPDATE, which
+the rate limiter relies on when several workers count the same window.
+
+Eviction is least-recently-used: hits refresh an entry's access time (at
+most once per ACCESS_RESOLUTION seconds, so hot keys are not rewritten on
+every read), and a write that takes the table past MAX_ENTRIES first drops
+expired entries, then the least recently used 1/CULL_FREQUENCY.
+
+Values are pickled, like in Django's own cache backends, so whoever can
+write the file can run code in the workers. The file is created readable
+and writable by its owner only, and a cache file, WAL or shared-memory file
+that belongs to another user or that others may write is refused. Keep it
+in a directory only the app's user can write to, never in a shared one
+such as /tmp or /dev/shm.
+
+Django's DatabaseCache would share the application database's single
+writer lock, and FileBasedCache has neither atomic increments nor LRU
+eviction, hence this backend.
+
+    CACHES = {'default': {
+        'BACKEND': 'sports.sharedcache.SQLiteCache',
+        'LOCATION': '/var/lib/playfield/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }}
+"""
+import math
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Seconds a hit may leave an entry's access time stale before refreshing it
+ACCESS_RESOLUTION = 5.0
+
+BUSY_TIMEOUT = 5.0  # seconds a write waits for another process's write
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed);
+CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires);
+"""
+
+
+def _encode(value):
+    # Plain ints stay integers so incr() can add to them in SQL
+    if type(value) is int and -2**63 <= value < 2**63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+def _open_private(path):
+    """
+    Create the cache file owner-only if it is missing, and refuse files that
+    someone else could have written to, before SQLite opens them.
+    """
+    # O_NOFOLLOW: a planted symlink must not redirect the file elsewhere
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        _check_private(path, os.fstat(fd))
+    finally:
+        os.close(fd)
+    # SQLite gives the WAL and shared-memory files the database file's mode,
+    # but ones left behind by someone else would be reused as they are
+    for suffix in ('-wal', '-shm'):
+        try:
+            _check_private(path + suffix, os.lstat(path + suffix))
+        except FileNotFoundError:
+            pass
+
+
+def _check_private(path, status):
+    if hasattr(os, 'getuid') and status.st_uid != os.getuid():
+        raise ImproperlyConfigured(f"Cache file {path} belongs to another user.")
+    if not stat.S_ISREG(status.st_mode) or status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ImproperlyConfigured(f"Cache file {path} must be a regular file that only its owner can write.")
+
+
+class SQLiteCache(BaseCache):
+    """Cache entries in a SQLite file shared by all processes that name it."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork so a worker
+        # never shares its parent's SQLite handle
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            _open_private(self.path)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def _expiry(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        return math.inf if timeout is None else timeout
+
+    def _key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _insert(self, statements):
+        """
+        Run INSERTs from _set_sql() in one IMMEDIATE transaction, culling if
+        the table outgrew MAX_ENTRIES, and return the number of rows written.
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            written = sum(connection.execute(sql, params).rowcount for sql, params in statements)
+            self._cull(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return written
+
+    def _cull(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache_entries WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries + self._max_entries // self._cull_frequency
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key IN '
+                '(SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+                (excess,)
+            )
+
+    def _set_sql(self, key, value, timeout, only_if_missing=False):
+        now = time.time()
+        sql = (
+            'INSERT INTO cache_entries (key, value, expires, accessed) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed'
+        )
+        params = (key, _encode(value), self._expiry(timeout), now)
+        if only_if_missing:
+            sql += ' WHERE cache_entries.expires <= ?'
+            params += (now,)
+        return sql, params
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._insert([self._set_sql(key, value, timeout, only_if_missing=True)]) > 0
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {keys[key]: value for key, value in self._get_many(list(keys)).items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT key, value, accessed FROM cache_entries WHERE key IN (%s) AND expires > ?'
+            % ', '.join('?' * len(keys)),
+            (*keys, now)
+        ).fetchall()
+        stale = [key for key, _, accessed in rows if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            # A lost refresh only makes eviction slightly less exact, so a
+            # write that times out here is not an error for the reader
+            try:
+                connection.execute(
+                    'UPDATE cache_entries SET accessed = ? WHERE key IN (%s)' % ', '.join('?' * len(stale)),
+                    (now, *stale)
+                )
+            except sqlite3.OperationalError:
+                pass
+        return {key: _decode(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._insert([self._set_sql(key, value, timeout)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if data:
+            self._insert([self._set_sql(self._key(key, version), value, timeout) for key, value in data.items()])
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ? WHERE key = ? AND expires > ?',
+            (self._expiry(timeout), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            "UPDATE cache_entries SET value = value + ? "
+            "WHERE key = ? AND expires > ? AND typeof(value) = 'integer' RETURNING value",
+            (delta, key, time.time())
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._connection().execute(
+                'DELETE FROM cache_entries WHERE key IN (%s)' % ', '.join('?' * len(keys)), keys
+            )
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Connections are kept for the life of the worker, like the
+        # persistent database connections
+        pass
@@ -0,0 +1,121 @@
+from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import agenda, rollups
+from .models import EventComment, Events, EventSeries, User
+from .typeahead import typeahead
+from .usercards import user_cards
+
+
+@receiver(post_save, sender=Events)
+def index_saved_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        typeahead.event_changed(instance)
+
+
+@receiver(post_delete, sender=Events)
+def unindex_deleted_event(sender, instance, **kwargs):
+    typeahead.event_deleted(instance)
+
+
+@receiver(post_save, sender=User)
+def reindex_renamed_user(sender, instance, raw=False, **kwargs):
+    if not raw:
+        typeahead.user_changed(instance)
+
+
+@receiver(post_save, sender=User)
+def drop_user_card(sender, instance, **kwargs):
+    # Covers edit_profile and admin edits of names and avatars
+    user_cards.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Events)
+def sync_agenda(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        agenda.add_hosts([instance.pk])
+    else:
+        agenda.sync_events([instance.pk])
+
+
+@receiver(m2m_changed, sender=Events.attendees.through)
+def track_attendance(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward: event.attendees.add(users); reverse: user.attending.add(events)
+    if action == 'post_add':
+        event_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        agenda.add_attendees(event_ids, user_ids)
+    elif action == 'post_remove':
+        event_ids, user_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+        agenda.remove_attendees(event_ids, user_ids)
+    elif action == 'pre_clear':
+        if reverse:
+            agenda.remove_attendees(instance.attending.values_list('pk', flat=True), [instance.pk])
+        else:
+            agenda.remove_attendees([instance.pk])
+
+
+# Rollups: snapshot the touched events' contributions before a change and
+# add the difference afterwards. The snapshot rides on the instance.
+
+@receiver(pre_save, sender=Events)
+def snapshot_event_before_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._rollup_before = rollups.snapshot([instance.pk])
+
+
+@receiver(post_save, sender=Events)
+def roll_up_saved_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.apply_changes(instance.__dict__.pop('_rollup_before', {}), rollups.snapshot([instance.pk]))
+
+
+@receiver(pre_delete, sender=Events)
+def snapshot_event_before_delete(sender, instance, **kwargs):
+    instance._rollup_before = rollups.snapshot([instance.pk])
+
+
+@receiver(post_delete, sender=Events)
+def roll_up_deleted_event(sender, instance, **kwargs):
+    rollups.apply_changes(instance.__dict__.pop('_rollup_before', {}), {})
+
+
+@receiver(m2m_changed, sender=Events.attendees.through)
+def roll_up_attendance(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        if not reverse:
+            event_ids = [instance.pk]
+        elif pk_set is None:
+            event_ids = list(instance.attending.values_list('pk', flat=True))
+        else:
+            event_ids = pk_set
+        instance._rollup_before = rollups.snapshot(event_ids)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        before = instance.__dict__.pop('_rollup_before', {})
+        rollups.apply_changes(before, rollups.snapshot(before.keys()))
+
+
+@receiver(post_save, sender=EventComment)
+def roll_up_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record_comment(instance)
+
+
+@receiver(post_delete, sender=EventComment)
+def roll_down_comment(sender, instance, **kwargs):
+    rollups.record_comment(instance, sign=-1)
+
+
+@receiver(post_delete, sender=Events)
+@receiver(post_delete, sender=EventSeries)
+@receiver(post_delete, sender=User)
+def release_media(sender, instance, **kwargs):
+    # Blobs may be shared, so a delete only drops a reference; gc_media
+    # removes the file once nothing points at it
+    for field in sender._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            name = getattr(instance, field.attname).name
+            if name and hasattr(field.storage, 'release'):
+                field.storage.release(name)
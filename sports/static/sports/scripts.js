@@ -7,6 +7,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // This uses event delegation to handle elements that might be added to the DOM later.
     document.body.addEventListener('click', (event) => {
         const toggleBtn = event.target.closest('#toggle-attendance-btn');
+        const waitlistBtn = event.target.closest('#toggle-waitlist-btn');
         const cancelBtn = event.target.closest('#cancel-event-btn');
         const cancelBtnConfirm = event.target.closest('.cancel-event-btn-confirm');
 
@@ -15,6 +16,11 @@ document.addEventListener('DOMContentLoaded', () => {
             handleToggleAttendance(toggleBtn);
         }
 
+        // Waitlist Button
+        if (waitlistBtn) {
+            handleToggleWaitlist(waitlistBtn);
+        }
+
         // Cancel Event Button
         if (cancelBtn) {
             if (confirm('Are you sure you want to cancel this event? This action cannot be undone.')) {
@@ -35,8 +41,67 @@ document.addEventListener('DOMContentLoaded', () => {
     if (commentForm) {
         commentForm.addEventListener('submit', handleCommentSubmit);
     }
+
+    // Typeahead suggestions for the search box
+    const searchInput = document.querySelector('input[data-typeahead-url]');
+    if (searchInput) {
+        initTypeahead(searchInput);
+    }
 });
 
+/**
+ * Shows event, sport and host suggestions under the search box while typing.
+ * @param {HTMLInputElement} input The search input.
+ */
+function initTypeahead(input) {
+    const list = document.createElement('div');
+    list.className = 'list-group position-absolute shadow-sm d-none';
+    list.style.zIndex = 1000;
+    input.parentElement.classList.add('position-relative');
+    input.parentElement.appendChild(list);
+
+    const kindLabels = {event: 'Event', category: 'Sport', host: 'Host'};
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const query = input.value.trim();
+            if (controller) controller.abort();
+            if (!query) {
+                list.classList.add('d-none');
+                return;
+            }
+            controller = new AbortController();
+            try {
+                const url = `${input.dataset.typeaheadUrl}?q=${encodeURIComponent(query)}`;
+                const response = await fetch(url, {signal: controller.signal});
+                const data = await response.json();
+                list.replaceChildren(...data.results.map((result) => {
+                    const item = document.createElement('a');
+                    item.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+                    item.href = result.url;
+                    item.textContent = result.label;
+                    const kind = document.createElement('small');
+                    kind.className = 'text-muted ms-2';
+                    kind.textContent = kindLabels[result.kind];
+                    item.appendChild(kind);
+                    return item;
+                }));
+                list.classList.toggle('d-none', data.results.length === 0);
+            } catch (error) {
+                if (error.name !== 'AbortError') console.error('Error loading suggestions:', error);
+            }
+        }, 150);
+    });
+
+    input.addEventListener('blur', () => {
+        // Delay so a click on a suggestion still lands
+        setTimeout(() => list.classList.add('d-none'), 200);
+    });
+}
+
 /**
  * Handles the AJAX request for joining or leaving an event.
  * @param {HTMLButtonElement} button The button that was clicked.
@@ -101,6 +166,42 @@ async function handleToggleAttendance(button) {
     }
 }
 
+/**
+ * Handles the AJAX request for joining or leaving an event's waitlist.
+ * @param {HTMLButtonElement} button The button that was clicked.
+ */
+async function handleToggleWaitlist(button) {
+    const url = button.dataset.url;
+    const csrfToken = getCookie('csrftoken');
+
+    button.disabled = true;
+
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': csrfToken,
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        });
+
+        const data = await response.json();
+
+        if (!response.ok || !data.success) {
+            alert(data.message || 'An unexpected error occurred.');
+            return;
+        }
+
+        // Reload to show the new queue position and waitlist size
+        window.location.reload();
+    } catch (error) {
+        console.error('Error updating waitlist:', error);
+        alert('An error occurred. Please try again.');
+    } finally {
+        button.disabled = false;
+    }
+}
+
 /**
  * Handles the AJAX request for cancelling an event.
  * @param {HTMLButtonElement} button The button that was clicked.
@@ -0,0 +1,150 @@
+"""
+Storage backends for Playfield's static and media files.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+
+from .models import MediaBlob
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip siblings are always written
+    brotli = None
+
+
+def compress_gzip(data):
+    # mtime=0 keeps the output byte-for-byte reproducible between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes precompressed .gz and .br siblings of
+    every hashed text asset during collectstatic.
+    """
+    compressible_extensions = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.html')
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            self._write_compressed(hashed_name)
+
+    def _write_compressed(self, name):
+        if os.path.splitext(name)[1].lower() not in self.compressible_extensions:
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < self.min_compress_size:
+            return
+
+        encoders = [('.gz', compress_gzip)]
+        if brotli is not None:
+            encoders.append(('.br', compress_brotli))
+        for suffix, encode in encoders:
+            compressed = encode(data)
+            # Only keep siblings that actually save bytes
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Media storage that keeps one file per distinct content.
+
+    Uploads are hashed in chunks while they stream to a temporary file
+    under blobs/, which is then renamed to blobs/<aa>/<bb>/<sha256><ext>, or
+    dropped if that blob already exists. The same image saved twice is
+    stored once and both rows point at the same name. MediaBlob counts
+    references. Blobs are shared, so deleting through the storage only
+    drops a reference; `gc_media` removes blobs once no row points at them.
+    Files saved before this backend was enabled keep working.
+    """
+    blob_directory = 'blobs'
+    chunk_size = 64 * 1024
+
+    def blob_name(self, digest, extension):
+        return f"{self.blob_directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+    def is_blob(self, name):
+        return name.startswith(self.blob_directory + '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        temp_path, digest, size = self._spool(content)
+        name = self.blob_name(digest, os.path.splitext(name)[1])
+        try:
+            blob, _ = MediaBlob.objects.get_or_create(name=name, defaults={'size': size})
+            if self.exists(name):
+                os.unlink(temp_path)
+                # Bump the mtime so gc_media's grace period covers the new reference
+                os.utime(self.path(name))
+            else:
+                self._commit_blob(temp_path, name)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        MediaBlob.objects.filter(pk=blob.pk).update(refs=F('refs') + 1)
+        return name
+
+    def _spool(self, content):
+        """
+        Stream the upload once into a temporary file under the blob
+        directory, hashing each chunk on the way. Returns (path, sha256
+        hex digest, size).
+        """
+        directory = self.path(self.blob_directory)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        sha256, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks(self.chunk_size):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    temp.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path, sha256.hexdigest(), size
+
+    def _commit_blob(self, temp_path, name):
+        # Renamed into place on the same filesystem, so readers and
+        # concurrent writers of the same content never see a partial file
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(temp_path, self.file_permissions_mode)
+        os.replace(temp_path, full_path)
+
+    def release(self, name):
+        """Drop one reference to a blob."""
+        if self.is_blob(name):
+            MediaBlob.objects.filter(name=name, refs__gt=0).update(refs=F('refs') - 1)
+
+    def delete(self, name):
+        if self.is_blob(name):
+            self.release(name)
+        else:
+            super().delete(name)
@@ -0,0 +1,84 @@
+"""
+The data behind the index listing and event pages, shared between workers
+through the default cache.
+
+Each entry is keyed by the version its page's conditional GET validators
+already computed (see conditional.py). Every change to an event, its
+attendees or its comments bumps that version, so a changed page gets a new
+key instead of needing an invalidation, and old entries age out through
+the cache's timeout and eviction. With the shared cache (SHARED_CACHE) one
+worker's miss fills the entry for all of them.
+
+Only the fields the pages render are loaded, so cached entries never hold
+password hashes, e-mail addresses or other account data: events carry
+their listed columns, hosts their id and username, attendees their id.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+
+from .models import EventComment, Events, User
+
+INDEX_PAGE_SIZE = 9
+
+# Event columns the index and event pages render
+RENDERED_FIELDS = (
+    'title', 'description', 'date', 'start', 'end', 'time_zone', 'timestamp',
+    'category', 'skill_level', 'max_attendees', 'image', 'is_cancelled',
+    'host__id', 'host__username',
+)
+
+
+def _key(prefix, version):
+    return f'{prefix}:' + hashlib.md5(repr(version).encode(), usedforsecurity=False).hexdigest()
+
+
+def rendered(events):
+    """Limit `events` to the rendered columns, with hosts and attendee ids."""
+    # Attendees are only counted and compared; avatars and names come
+    # from user cards, so only their ids are loaded
+    return events.select_related('host').only(*RENDERED_FIELDS).prefetch_related(
+        Prefetch('attendees', queryset=User.objects.only('id'))
+    )
+
+
+def event_page(event_id, version):
+    """
+    Return the event with its host, attendee ids and comments loaded, or
+    raise Http404. `version` None (e.g. flash messages pending) skips the cache.
+    """
+    def load():
+        return get_object_or_404(
+            rendered(Events.objects).prefetch_related(
+                Prefetch('comments', queryset=EventComment.objects.only('event_id', 'author_id', 'content', 'created_at'))
+            ),
+            pk=event_id
+        )
+
+    if version is None:
+        return load()
+    return cache.get_or_set(_key('event-page', version), load, settings.SUMMARY_CACHE_SECONDS)
+
+
+def index_page(events, page_number, version):
+    """
+    Return the page of `events` for `page_number`, with its events loaded.
+    The total count and that page's events are cached together.
+    """
+    paginator = Paginator(rendered(events), INDEX_PAGE_SIZE)
+    key = _key('index-page', version) if version is not None else None
+    cached = cache.get(key) if key else None
+    if cached is not None:
+        paginator.count, objects = cached
+        page = paginator.get_page(page_number)
+    else:
+        page = paginator.get_page(page_number)
+        objects = list(page.object_list)
+        if key:
+            cache.set(key, (paginator.count, objects), settings.SUMMARY_CACHE_SECONDS)
+    page.object_list = objects
+    return page
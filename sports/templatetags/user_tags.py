@@ -0,0 +1,13 @@
+from django import template
+
+from sports.usercards import user_cards
+
+register = template.Library()
+
+@register.simple_tag
+def user_card(user_id):
+    """
+    Look up a user's cached mini card (username, avatar_url, profile_url).
+    Usage: {% user_card comment.author_id as author %}
+    """
+    return user_cards.get(user_id)
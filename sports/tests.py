@@ -1,10 +1,58 @@
-from django.test import TestCase
+from django.test import LiveServerTestCase, TestCase, SimpleTestCase, TransactionTestCase, override_settings
+import unittest
+import unittest.mock
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory
+from django.http import HttpResponse
+from datetime import date, datetime, time, timedelta
+from html import unescape
+import csv
+import gzip
+import hashlib
+import importlib.util
+import io
+import itertools
+import multiprocessing
+import asyncio
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
 
-from sports.models import Events, EventComment
+from sports.forms import EventForm
+from sports.models import (
+    AgendaEntry, CategoryWeekStats, Events, EventComment, EventNotification, EventSeries, MaintenanceCheckpoint,
+    MediaBlob, RollupProgress, WaitlistEntry,
+)
+from sports import agenda, rollups
+from sports.db import retry_on_locked
+from sports.serving import serve_static
+from sports.export import iter_event_rows
+from sports.admin import EstimatedCountPaginator
+from sports.notifications import enqueue_event_changes, send_due_notifications
+from sports.ratelimit import check_rate, shed_load
+from sports.facets import facet_counts, upcoming_events
+from sports.typeahead import PrefixIndex, typeahead
+from sports.loadtest import Plan, Stats, percentile, run as run_loadtest
+from sports.recurrence import materialize, occurrence_dates, sync_future_occurrences
+from sports.usercards import UserCardCache, avatar_url, user_cards
+from sports.cleanup import Throttle, deduplicate_media, delete_orphans, purge_cancelled_events
+from sports.storage import ContentAddressedStorage
+from sports.sharedcache import SQLiteCache
+from sports.compression import brotli, minify_html
 
 User = get_user_model()
 
@@ -379,3 +427,2467 @@ class SportsAppTests(TestCase):
         self.attendee_user.refresh_from_db()
         self.assertEqual(self.attendee_user.first_name, 'John')
         self.assertEqual(self.attendee_user.bio, 'A new bio.')
+
+
+@override_settings(SQLITE_WRITE_RETRIES=3, SQLITE_RETRY_BACKOFF=0)
+class WriteRetryTests(SimpleTestCase):
+    """
+    Tests for the bounded retry policy applied to write views.
+    """
+
+    def test_retries_lock_errors_until_success(self):
+        """Test that a view is re-run when SQLite reports a lock."""
+        calls = []
+
+        @retry_on_locked
+        def view():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "ok"
+
+        self.assertEqual(view(), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_gives_up_after_bounded_attempts(self):
+        """Test that the lock error is raised once the retry budget is spent."""
+        calls = []
+
+        @retry_on_locked
+        def view():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            view()
+        self.assertEqual(len(calls), 4) # First attempt + 3 retries
+
+    def test_other_errors_are_not_retried(self):
+        """Test that unrelated database errors propagate immediately."""
+        calls = []
+
+        @retry_on_locked
+        def view():
+            calls.append(1)
+            raise OperationalError("no such table: sports_events")
+
+        with self.assertRaises(OperationalError):
+            view()
+        self.assertEqual(len(calls), 1)
+
+
+class StaticAssetTests(SimpleTestCase):
+    """
+    Tests for hashed, precompressed static assets and their serving path.
+    """
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.settings_override = override_settings(
+            DEBUG=False,
+            STATIC_ROOT=self.static_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'sports.storage.CompressedManifestStaticFilesStorage'},
+            },
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.factory = RequestFactory()
+
+    def _hashed_name(self, name):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        return staticfiles_storage.stored_name(name)
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        """Test that hashed CSS gets gzip and brotli siblings."""
+        hashed = self._hashed_name('sports/styles.css')
+        self.assertNotEqual(hashed, 'sports/styles.css')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, hashed + '.gz')))
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, hashed + '.br')))
+
+    def test_default_avatar_resolves_to_hashed_name(self):
+        """Test that the avatar fallback points at the hashed file."""
+        user = User(username='nopic')
+        url = avatar_url(user)
+        self.assertEqual(url, '/static/' + self._hashed_name('sports/images/default_avatar.png'))
+
+    def test_serves_negotiated_encoding_with_immutable_cache(self):
+        """Test that the serving view picks the best encoding and caches forever."""
+        hashed = self._hashed_name('sports/scripts.js')
+        request = self.factory.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0.9')
+        response = serve_static(request, hashed)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Type'], 'text/javascript')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response.close()
+
+        request = self.factory.get('/static/' + hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        response = serve_static(request, hashed)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response.close()
+
+    def test_unhashed_names_revalidate(self):
+        """Test that original file names are not cached as immutable."""
+        request = self.factory.get('/static/sports/styles.css')
+        response = serve_static(request, 'sports/styles.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+
+
+class MediaServingTests(SimpleTestCase):
+    """
+    Tests for the production media view: validators, ranges and proxy hand-off.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_ACCEL_REDIRECT='')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'events'))
+        self.data = bytes(range(256)) * 4
+        with open(os.path.join(self.media_root, 'events', 'game.jpg'), 'wb') as f:
+            f.write(self.data)
+        self.url = '/media/events/game.jpg'
+
+    def test_full_response_has_validators_and_directory_cache(self):
+        """Test that a plain GET streams the file with ETag and cache headers."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_conditional_get_returns_not_modified(self):
+        """Test that a matching If-None-Match short-circuits to 304."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        """Test bounded, open-ended and suffix byte ranges."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[1000:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-4:])
+        self.assertEqual(response['Content-Range'], 'bytes 1020-1023/1024')
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        """Test 416 for out-of-bounds ranges and full bodies for stale If-Range."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='nginx', MEDIA_ACCEL_PREFIX='/protected/')
+    def test_accel_redirect_hands_off_to_proxy(self):
+        """Test that nginx mode returns an empty body with X-Accel-Redirect."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/events/game.jpg')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_traversal_paths_404(self):
+        """Test that unknown files and paths escaping MEDIA_ROOT are not served."""
+        self.assertEqual(self.client.get('/media/events/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Tests for ETag/Last-Modified handling on the event listing and detail pages.
+    """
+
+    def setUp(self):
+        self.host_user = User.objects.create_user(username='host', password='password123')
+        self.attendee_user = User.objects.create_user(username='attendee', password='password123')
+        start = timezone.now() + timedelta(days=3)
+        self.event = Events.objects.create(
+            title="Cached Volleyball",
+            description="Beach game.",
+            host=self.host_user,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            timestamp=start + timedelta(hours=2),
+            category='volleyball',
+        )
+        self.event.attendees.add(self.host_user)
+        self.detail_url = reverse('event_detail', args=[self.event.id])
+
+    def test_unchanged_event_page_returns_not_modified(self):
+        """Test that a repeat request with the ETag skips rendering."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_and_attendance_change_the_validator(self):
+        """Test that new comments and joins invalidate the event page."""
+        self.client.login(username='attendee', password='password123')
+        etag = self.client.get(self.detail_url)['ETag']
+
+        self.client.post(reverse('add_comment', args=[self.event.id]), {'content': 'See you there'})
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.client.post(reverse('toggle_attendance', args=[self.event.id]))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Leave Event")
+
+    def test_validator_varies_per_user(self):
+        """Test that one user's ETag does not match another user's page."""
+        anonymous_etag = self.client.get(self.detail_url)['ETag']
+        self.client.login(username='attendee', password='password123')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+
+    def test_listing_validator_tracks_filters_and_new_events(self):
+        """Test that the index ETag changes with the query and new events."""
+        response = self.client.get(reverse('index'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.get(reverse('index'), {'category': 'volleyball'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        start = timezone.now() + timedelta(days=4)
+        Events.objects.create(
+            title="Another Game",
+            description="More volleyball.",
+            host=self.host_user,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            category='volleyball',
+        )
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Another Game")
+
+    def test_missing_event_still_404s(self):
+        """Test that an unknown event is not given validators."""
+        response = self.client.get(reverse('event_detail', args=[999]), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 404)
+
+
+def _normalize_html(content):
+    """Reduce rendered HTML to a form comparable across template engines."""
+    html = content.decode()
+    # The CSRF token is re-masked on every render
+    html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', 'name="csrfmiddlewaretoken"', html)
+    # Django and Jinja2 escape quotes with different entities
+    html = unescape(html)
+    html = re.sub(r'>\s+<', '><', html)
+    return ' '.join(html.split())
+
+
+@unittest.skipUnless(importlib.util.find_spec('jinja2'), "Jinja2 is not installed")
+class JinjaParityTests(TestCase):
+    """
+    Tests that the Jinja2 ports of the hot templates match the Django ones.
+    """
+
+    jinja_templates = ['sports/index.html', 'sports/event_detail.html']
+
+    def setUp(self):
+        self.host_user = User.objects.create_user(username='host', password='password123')
+        self.attendee_user = User.objects.create_user(username='attendee', password='password123')
+        start = timezone.now() + timedelta(days=2)
+        # Enough events for the paginator to render page links
+        for i in range(12):
+            event = Events.objects.create(
+                title=f"Pickup Game {i}",
+                description="Bring \"water\" & shoes. " * 8,
+                host=self.host_user,
+                date=(start + timedelta(days=i)).date(),
+                start=start.time(),
+                end=(start + timedelta(hours=2)).time(),
+                category='basketball',
+                max_attendees=12,
+            )
+            event.attendees.add(self.host_user)
+        self.event = event
+        for user_id in range(11):
+            self.event.attendees.add(User.objects.create(username=f'player{user_id}'))
+        for text in ["Who's bringing the ball?", "<b>me</b>"]:
+            EventComment.objects.create(event=self.event, author=self.attendee_user, content=text)
+        # Comments far enough in the past that naturaltime is stable across renders
+        EventComment.objects.update(created_at=timezone.now() - timedelta(days=3))
+
+    def assertEnginesMatch(self, url, data=None):
+        django_html = self.client.get(url, data)
+        with override_settings(JINJA2_TEMPLATES=self.jinja_templates):
+            jinja_html = self.client.get(url, data)
+        self.assertEqual(django_html.status_code, 200)
+        self.assertEqual(jinja_html.status_code, 200)
+        # The test client only records templates rendered by the Django engine
+        page_template = django_html.templates[0].name
+        self.assertNotIn(page_template, [t.name for t in jinja_html.templates])
+        self.assertEqual(_normalize_html(django_html.content), _normalize_html(jinja_html.content))
+
+    def test_index_matches(self):
+        """Test the listing page, including pagination links, for both engines."""
+        self.assertEnginesMatch(reverse('index'))
+        self.assertEnginesMatch(reverse('index'), {'category': 'basketball', 'page': 2})
+
+    def test_event_detail_matches_for_each_viewer(self):
+        """Test the detail page for anonymous users, attendees and the host."""
+        url = reverse('event_detail', args=[self.event.id])
+        self.assertEnginesMatch(url)
+        self.client.login(username='attendee', password='password123')
+        self.assertEnginesMatch(url)
+        self.client.login(username='host', password='password123')
+        self.assertEnginesMatch(url)
+
+
+class EventExportTests(TestCase):
+    """
+    Tests for the staff-only streaming export of events.
+    """
+
+    def setUp(self):
+        self.staff_user = User.objects.create_user(username='analyst', password='password123', is_staff=True)
+        self.host_user = User.objects.create_user(username='host', password='password123')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(5):
+            event = Events.objects.create(
+                title=f"Run {i}",
+                description="Morning run.",
+                host=self.host_user,
+                date=start.date(),
+                start=start.time(),
+                end=(start + timedelta(hours=1)).time(),
+                category='running',
+            )
+            event.attendees.add(self.host_user)
+            if i % 2:
+                event.attendees.add(self.staff_user)
+        self.url = reverse('export_events')
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        """Test that hosts and attendee counts are joined once per chunk."""
+        # 1 streamed SELECT + 2 lookups for each of the 3 chunks
+        with self.assertNumQueries(7):
+            rows = list(iter_event_rows(chunk_size=2))
+        self.assertEqual([row['number_attending'] for row in rows], [1, 2, 1, 2, 1])
+        self.assertTrue(all(row['host'] == 'host' for row in rows))
+
+    def test_ndjson_export(self):
+        """Test that staff get one JSON object per event."""
+        self.client.login(username='analyst', password='password123')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[1])['title'], "Run 1")
+
+    def test_gzipped_csv_export(self):
+        """Test the CSV writer through the gzip stream."""
+        self.client.login(username='analyst', password='password123')
+        response = self.client.get(self.url, {'format': 'csv', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('events.csv.gz', response['Content-Disposition'])
+        text = gzip.decompress(b''.join(response.streaming_content)).decode()
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['host'], 'host')
+
+    def test_export_is_staff_only(self):
+        """Test that regular users are sent to the admin login."""
+        self.client.login(username='host', password='password123')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_management_command_writes_file(self):
+        """Test that the export command writes the same data to a file."""
+        output = os.path.join(tempfile.mkdtemp(), 'events.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        call_command('export_events', output=output, stderr=io.StringIO())
+        with open(output) as f:
+            self.assertEqual(len(f.readlines()), 5)
+
+
+class AdminTests(TestCase):
+    """
+    Tests for the events admin: annotated changelist and set-based actions.
+    """
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='password123')
+        self.client.login(username='admin', password='password123')
+        start = timezone.now() + timedelta(days=1)
+        self.events = []
+        for i in range(4):
+            event = Events.objects.create(
+                title=f"Chess Night {i}",
+                description="Blitz games.",
+                host=self.admin_user,
+                date=start.date(),
+                start=start.time(),
+                end=(start + timedelta(hours=2)).time(),
+                category='chess',
+            )
+            event.attendees.add(self.admin_user)
+            self.events.append(event)
+
+    def test_changelists_load(self):
+        """Test that the events, users and comments changelists render."""
+        response = self.client.get(reverse('admin:sports_events_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Chess Night 0")
+        self.assertEqual(self.client.get(reverse('admin:sports_user_changelist')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:sports_eventcomment_changelist')).status_code, 200)
+
+    def test_bulk_cancel_is_a_single_update(self):
+        """Test that cancelling many events issues exactly one UPDATE."""
+        selected = [str(event.pk) for event in self.events[:3]]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:sports_events_changelist'), {
+                'action': 'cancel_events',
+                '_selected_action': selected,
+            })
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "sports_events"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Events.objects.filter(is_cancelled=True).count(), 3)
+
+    def test_archived_events_leave_public_listings(self):
+        """Test that archived events no longer appear on the index."""
+        self.client.post(reverse('admin:sports_events_changelist'), {
+            'action': 'archive_events',
+            '_selected_action': [str(self.events[0].pk)],
+        })
+        response = self.client.get(reverse('index'))
+        self.assertNotContains(response, "Chess Night 0")
+        self.assertContains(response, "Chess Night 1")
+
+    def test_estimated_count_on_unfiltered_querysets(self):
+        """Test that large unfiltered tables use the estimate and filters stay exact."""
+        paginator = EstimatedCountPaginator(Events.objects.order_by('pk'), 10)
+        paginator.exact_count_threshold = 0
+        self.assertEqual(paginator.count, self.events[-1].pk)
+
+        filtered = EstimatedCountPaginator(Events.objects.filter(title="Chess Night 1").order_by('pk'), 10)
+        filtered.exact_count_threshold = 0
+        self.assertEqual(filtered.count, 1)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NOTIFICATION_COALESCE_SECONDS=300,
+    NOTIFICATION_BATCH_SIZE=2,
+)
+class NotificationTests(TestCase):
+    """
+    Tests for coalesced, batched event notifications.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123', email='host@example.com')
+        start = timezone.now() + timedelta(days=3)
+        self.event = Events.objects.create(
+            title="Sunset Volleyball",
+            description="Beach doubles.",
+            host=self.host,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            timestamp=start + timedelta(hours=2),
+            max_attendees=10,
+            category='volleyball',
+        )
+        self.event.attendees.add(self.host)
+        for i in range(4):
+            self.event.attendees.add(
+                User.objects.create_user(username=f'player{i}', password='password123', email=f'player{i}@example.com')
+            )
+        # Attendees without an address are skipped
+        self.event.attendees.add(User.objects.create_user(username='noemail', password='password123'))
+
+    def _make_due(self):
+        EventNotification.objects.update(send_after=timezone.now() - timedelta(seconds=1))
+
+    def test_changes_within_window_are_coalesced(self):
+        """Test that several changes to one event produce a single pending row."""
+        enqueue_event_changes([self.event.id], updated=True)
+        enqueue_event_changes([self.event.id], comments=1)
+        enqueue_event_changes([self.event.id], comments=2)
+
+        notification = EventNotification.objects.get()
+        self.assertTrue(notification.updated)
+        self.assertFalse(notification.cancelled)
+        self.assertEqual(notification.new_comments, 3)
+
+    def test_nothing_is_sent_before_the_window_passes(self):
+        """Test that pending notifications wait for their coalescing window."""
+        enqueue_event_changes([self.event.id], updated=True)
+        stats = send_due_notifications()
+        self.assertEqual(stats['notifications'], 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_due_notification_is_sent_in_batches(self):
+        """Test that one message goes to each attendee with an address, in batches."""
+        enqueue_event_changes([self.event.id], updated=True, comments=2)
+        self._make_due()
+
+        stats = send_due_notifications()
+        self.assertEqual(stats['notifications'], 1)
+        self.assertEqual(stats['messages'], 5)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [
+            'host@example.com', 'player0@example.com', 'player1@example.com',
+            'player2@example.com', 'player3@example.com',
+        ])
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, "Update: Sunset Volleyball")
+        self.assertIn("2 new comments", message.body)
+        self.assertIn(reverse('event_detail', args=[self.event.id]), message.body)
+        self.assertIsNotNone(EventNotification.objects.get().sent_at)
+
+        # Already sent notifications are not sent again
+        self.assertEqual(send_due_notifications()['notifications'], 0)
+
+    def test_change_after_send_starts_a_new_notification(self):
+        """Test that a change after sending opens a fresh pending row."""
+        enqueue_event_changes([self.event.id], updated=True)
+        self._make_due()
+        send_due_notifications()
+        enqueue_event_changes([self.event.id], comments=1)
+        self.assertEqual(EventNotification.objects.count(), 2)
+        self.assertEqual(EventNotification.objects.filter(sent_at__isnull=True).count(), 1)
+
+    def test_views_enqueue_changes(self):
+        """Test that cancelling and commenting record a notification."""
+        self.client.login(username='host', password='password123')
+        self.client.post(reverse('add_comment', args=[self.event.id]), {'content': "Bring sunscreen"})
+        self.client.post(reverse('cancel_event', args=[self.event.id]))
+
+        notification = EventNotification.objects.get()
+        self.assertTrue(notification.cancelled)
+        self.assertEqual(notification.new_comments, 1)
+
+        self._make_due()
+        call_command('send_notifications', stdout=io.StringIO())
+        # The host made both changes, so only the other attendees hear of them
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertNotIn('host@example.com', [m.to[0] for m in mail.outbox])
+        self.assertEqual(mail.outbox[0].subject, "Cancelled: Sunset Volleyball")
+
+    def test_actor_is_notified_of_other_users_changes(self):
+        """Test that merging another user's change clears the actor."""
+        enqueue_event_changes([self.event.id], updated=True, actor=self.host)
+        self.assertEqual(EventNotification.objects.get().actor, self.host)
+        enqueue_event_changes([self.event.id], comments=1, actor=User.objects.get(username='player0'))
+        self.assertIsNone(EventNotification.objects.get().actor)
+
+    def test_failed_batch_is_resumed_and_other_notifications_still_sent(self):
+        """Test that a failure part-way is retried from the next recipient without stopping the run."""
+        other = Events.objects.create(
+            title="Dawn Patrol", description="Surf.", host=self.host,
+            date=self.event.date, start=self.event.start, end=self.event.end,
+            timestamp=self.event.timestamp, max_attendees=10, category='volleyball',
+        )
+        other.attendees.add(User.objects.get(username='player0'))
+        enqueue_event_changes([self.event.id], updated=True)
+        enqueue_event_changes([other.id], updated=True)
+        self._make_due()
+
+        send_messages = mail.get_connection().__class__.send_messages
+        calls = itertools.count(1)
+        connections = []
+
+        def flaky_send(backend, messages):
+            connections.append(backend)
+            # The volleyball notification's fourth message fails, part-way
+            # through its second batch
+            if next(calls) == 4:
+                raise ConnectionError("SMTP went away")
+            return send_messages(backend, messages)
+
+        with unittest.mock.patch.object(mail.get_connection().__class__, 'send_messages', flaky_send):
+            stats = send_due_notifications()
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['notifications'], 1)
+        self.assertEqual(sorted((m.subject, m.to[0]) for m in mail.outbox), [
+            ("Update: Dawn Patrol", 'player0@example.com'),
+            ("Update: Sunset Volleyball", 'host@example.com'),
+            ("Update: Sunset Volleyball", 'player0@example.com'),
+            ("Update: Sunset Volleyball", 'player1@example.com'),
+        ])
+        # The next notification went out on a new connection
+        self.assertIsNot(connections[-1], connections[0])
+
+        pending = EventNotification.objects.get(event=self.event)
+        self.assertIsNone(pending.sent_at)
+        self.assertEqual(pending.attempts, 1)
+        self.assertEqual(pending.sent_through, User.objects.get(username='player1').pk)
+        self.assertIn("SMTP went away", pending.last_error)
+        self.assertGreater(pending.send_after, timezone.now())
+
+        self._make_due()
+        mail.outbox.clear()
+        self.assertEqual(send_due_notifications()['messages'], 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['player2@example.com', 'player3@example.com'])
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_notification_is_marked_failed_after_max_attempts(self):
+        """Test that a notification that keeps failing is given up on."""
+        enqueue_event_changes([self.event.id], updated=True)
+        with unittest.mock.patch.object(
+            mail.get_connection().__class__, 'send_messages', side_effect=ConnectionError("refused")
+        ):
+            for _ in range(3):
+                self._make_due()
+                send_due_notifications()
+
+        notification = EventNotification.objects.get()
+        self.assertTrue(notification.failed)
+        self.assertEqual(notification.attempts, 2)
+        self.assertIsNotNone(notification.sent_at)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={
+    'attendance': (3, 60),
+    'comment': (2, 60),
+    'create_event': (2, 60),
+    'login': (2, 60),
+})
+class RateLimitTests(TestCase):
+    """
+    Tests for per-user write budgets and load shedding.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='runner', password='password123')
+        self.other = User.objects.create_user(username='walker', password='password123')
+        start = timezone.now() + timedelta(days=2)
+        self.event = Events.objects.create(
+            title="Morning Run",
+            description="Easy 5k.",
+            host=self.other,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=1)).time(),
+            timestamp=start + timedelta(hours=1),
+            max_attendees=10,
+            category='running',
+        )
+        self.url = reverse('toggle_attendance', args=[self.event.id])
+
+    def test_budget_is_enforced_with_retry_after(self):
+        """Test that requests over the budget get 429 with Retry-After."""
+        self.client.login(username='runner', password='password123')
+        for _ in range(3):
+            self.assertEqual(self.client.post(self.url).status_code, 200)
+
+        response = self.client.post(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 60)
+        self.assertFalse(response.json()['success'])
+
+    def test_budgets_are_per_user_and_per_scope(self):
+        """Test that one user's spent budget does not affect another user or endpoint."""
+        self.client.login(username='runner', password='password123')
+        for _ in range(4):
+            self.client.post(self.url)
+        self.assertEqual(self.client.post(self.url).status_code, 429)
+        comment = self.client.post(reverse('add_comment', args=[self.event.id]), {'content': "Count me in"})
+        self.assertEqual(comment.status_code, 200)
+
+        self.client.login(username='walker', password='password123')
+        self.assertNotEqual(self.client.post(self.url).status_code, 429)
+
+    def test_login_is_limited_by_ip(self):
+        """Test that failed logins are throttled per client address."""
+        for _ in range(2):
+            self.client.post(reverse('login'), {'username': 'runner', 'password': 'wrong'})
+        response = self.client.post(reverse('login'), {'username': 'runner', 'password': 'password123'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Other addresses keep their own budget
+        response = self.client.post(
+            reverse('login'), {'username': 'runner', 'password': 'password123'}, REMOTE_ADDR='10.0.0.2'
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_reads_are_not_limited(self):
+        """Test that GET requests never spend tokens."""
+        self.client.login(username='runner', password='password123')
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('create_event')).status_code, 200)
+
+    def test_check_is_one_cache_call_per_request(self):
+        """Test that a check after the first in a window is a single incr()."""
+        check_rate('comment', 'user:1')
+        with unittest.mock.patch.object(cache, 'add') as add, \
+                unittest.mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            self.assertEqual(check_rate('comment', 'user:1'), 0)
+            self.assertGreater(check_rate('comment', 'user:1'), 0)
+        self.assertEqual(incr.call_count, 2)
+        add.assert_not_called()
+
+    @override_settings(WRITE_CONCURRENCY_LIMIT=1)
+    def test_concurrent_writes_over_the_cap_are_shed(self):
+        """Test that a write arriving while the cap is reached gets 503."""
+        responses = []
+
+        @shed_load
+        def outer(request):
+            responses.append(inner(RequestFactory().post('/')))
+            return HttpResponse("ok")
+
+        @shed_load
+        def inner(request):
+            return HttpResponse("ok")
+
+        self.assertEqual(outer(RequestFactory().post('/')).status_code, 200)
+        self.assertEqual(responses[0].status_code, 503)
+        self.assertEqual(responses[0]['Retry-After'], '1')
+        # The slot is released once the first write finishes
+        self.assertEqual(inner(RequestFactory().post('/')).status_code, 200)
+
+
+def _create_full_event(host, players, max_attendees=2):
+    start = timezone.now() + timedelta(days=5)
+    event = Events.objects.create(
+        title="Pickup Basketball",
+        description="Half court, first to 21.",
+        host=host,
+        date=start.date(),
+        start=start.time(),
+        end=(start + timedelta(hours=2)).time(),
+        timestamp=start + timedelta(hours=2),
+        max_attendees=max_attendees,
+        category='basketball',
+    )
+    event.attendees.add(host, *players)
+    return event
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class WaitlistTests(TestCase):
+    """
+    Tests for joining the waitlist of a full event and FIFO promotion.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.player = User.objects.create_user(username='player', password='password123')
+        self.waiters = [
+            User.objects.create_user(username=f'waiter{i}', password='password123') for i in range(3)
+        ]
+        self.event = _create_full_event(self.host, [self.player])
+        self.waitlist_url = reverse('toggle_waitlist', args=[self.event.id])
+
+    def _join_waitlist(self, user):
+        self.client.force_login(user)
+        return self.client.post(self.waitlist_url)
+
+    def test_join_waitlist_reports_position(self):
+        """Test that waiters are queued in arrival order with their position."""
+        for i, waiter in enumerate(self.waiters, start=1):
+            response = self._join_waitlist(waiter)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['position'], i)
+        self.assertEqual(
+            [entry.position for entry in self.event.waitlist.all()], [1, 2, 3]
+        )
+
+    def test_leaving_waitlist_moves_others_up(self):
+        """Test that a waiter can leave and the queue closes up behind them."""
+        for waiter in self.waiters:
+            self._join_waitlist(waiter)
+        response = self._join_waitlist(self.waiters[0])
+        self.assertFalse(response.json()['on_waitlist'])
+        self.assertEqual(self.event.waitlist.get(user=self.waiters[2]).position, 2)
+
+    def test_waitlist_only_for_full_events(self):
+        """Test that attendees and events with free spots cannot be waitlisted."""
+        self.assertEqual(self._join_waitlist(self.player).status_code, 400)
+        self.event.attendees.remove(self.player)
+        self.assertEqual(self._join_waitlist(self.waiters[0]).status_code, 400)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_leave_promotes_first_waiter(self):
+        """Test that a freed spot goes to the longest-waiting user in the same request."""
+        for waiter in self.waiters:
+            self._join_waitlist(waiter)
+
+        self.client.force_login(self.player)
+        response = self.client.post(reverse('toggle_attendance', args=[self.event.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['attendees_count'], 2)
+
+        self.assertTrue(self.event.attendees.filter(pk=self.waiters[0].pk).exists())
+        self.assertEqual(list(self.event.waitlist.values_list('user__username', flat=True)), ['waiter1', 'waiter2'])
+        self.assertEqual(self.event.waitlist.get(user=self.waiters[1]).position, 1)
+
+    def test_raising_capacity_promotes_waiters(self):
+        """Test that the host raising max_attendees moves waiters in, in queue order."""
+        event = _create_full_event(self.host, [], max_attendees=1)
+        for waiter in self.waiters:
+            self.client.force_login(waiter)
+            self.client.post(reverse('toggle_waitlist', args=[event.id]))
+
+        self.client.force_login(self.host)
+        response = self.client.post(reverse('edit_event', args=[event.id]), {
+            'title': event.title,
+            'description': event.description,
+            'date': event.date.strftime('%Y-%m-%d'),
+            'start': event.start.strftime('%H:%M'),
+            'end': event.end.strftime('%H:%M'),
+            'category': event.category,
+            'skill_level': event.skill_level,
+            'max_attendees': 3,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(event.attendees.values_list('username', flat=True)), {'host', 'waiter0', 'waiter1'}
+        )
+        self.assertEqual(list(event.waitlist.values_list('user__username', flat=True)), ['waiter2'])
+
+    def test_admin_raising_capacity_promotes_waiters(self):
+        """Test that raising max_attendees in the admin also serves the waitlist."""
+        for waiter in self.waiters[:2]:
+            self._join_waitlist(waiter)
+        admin = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_login(admin)
+        event = self.event
+        response = self.client.post(reverse('admin:sports_events_change', args=[event.id]), {
+            'title': event.title,
+            'description': event.description,
+            'host': event.host_id,
+            'date': event.date.strftime('%Y-%m-%d'),
+            'start': event.start.strftime('%H:%M:%S'),
+            'end': event.end.strftime('%H:%M:%S'),
+            'time_zone': event.time_zone,
+            'category': event.category,
+            'skill_level': event.skill_level,
+            'max_attendees': 3,
+            'attendees': f'{self.host.pk},{self.player.pk}',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(event.attendees.filter(pk=self.waiters[0].pk).exists())
+        self.assertEqual(list(event.waitlist.values_list('user__username', flat=True)), ['waiter1'])
+
+    def test_event_page_shows_waitlist(self):
+        """Test that the event page offers the waitlist and shows the queue position."""
+        self._join_waitlist(self.waiters[0])
+        self.client.force_login(self.waiters[1])
+        response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.assertContains(response, "Join Waitlist")
+        self.assertContains(response, "1 waiting")
+
+        self.client.force_login(self.waiters[0])
+        response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        self.assertContains(response, "#1 in line")
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, WRITE_CONCURRENCY_LIMIT=0, SQLITE_WRITE_RETRIES=8)
+class WaitlistStressTests(TransactionTestCase):
+    """
+    Concurrent leave/join/waitlist traffic must never overfill an event or
+    promote out of order.
+    """
+
+    def test_concurrent_leave_and_join(self):
+        host = User.objects.create_user(username='host', password='password123')
+        players = [User.objects.create_user(username=f'player{i}', password='password123') for i in range(4)]
+        waiters = [User.objects.create_user(username=f'waiter{i}', password='password123') for i in range(6)]
+        event = _create_full_event(host, players, max_attendees=5)
+        for waiter in waiters:
+            WaitlistEntry.objects.create(event=event, user=waiter)
+
+        errors = []
+
+        def post(client, url):
+            try:
+                for _ in range(20):
+                    try:
+                        response = client.post(url)
+                    except OperationalError:
+                        continue  # The retry budget ran out; a real client would retry too
+                    if response.status_code != 500:
+                        return
+                errors.append("request never got through")
+            finally:
+                connection.close()
+
+        def logged_in(user):
+            client = self.client_class()
+            client.force_login(user)
+            return client
+
+        # Every player leaves while latecomers try to grab the freed spots
+        latecomers = [User.objects.create_user(username=f'late{i}', password='password123') for i in range(4)]
+        url = reverse('toggle_attendance', args=[event.id])
+        threads = [
+            threading.Thread(target=post, args=(logged_in(user), url))
+            for user in players + latecomers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        attendees = set(event.attendees.values_list('username', flat=True))
+        self.assertLessEqual(len(attendees), event.max_attendees)
+        # Nobody who left is still attending and nobody is both in and waiting
+        self.assertFalse(attendees & {p.username for p in players})
+        waiting = list(event.waitlist.values_list('user__username', flat=True))
+        self.assertFalse(attendees & set(waiting))
+        # Promotions took waiters strictly from the front of the queue
+        promoted = [w.username for w in waiters if w.username in attendees]
+        self.assertEqual(promoted, [w.username for w in waiters[:len(promoted)]])
+        self.assertEqual(waiting, [w.username for w in waiters[len(promoted):]])
+        # Each freed spot went to a waiter, so no latecomer jumped the queue
+        self.assertEqual(len(promoted), len(players))
+        self.assertEqual(len(attendees), event.max_attendees)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, SERIES_HORIZON_DAYS=28)
+class RecurrenceTests(TestCase):
+    """
+    Tests for recurring event series and their materialized occurrences.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='coach', password='password123')
+        self.today = timezone.localdate()
+
+    def _series(self, **kwargs):
+        fields = {
+            'host': self.host,
+            'title': "Tuesday Tennis",
+            'description': "Doubles ladder.",
+            'start': time(18, 0),
+            'end': time(20, 0),
+            'category': 'tennis',
+            'frequency': 'weekly',
+            'starts_on': self.today + timedelta(days=1),
+        }
+        fields.update(kwargs)
+        return EventSeries.objects.create(**fields)
+
+    def test_occurrence_dates(self):
+        """Test weekly, biweekly and monthly rules with exceptions and an end date."""
+        weekly = EventSeries(
+            frequency='weekly', starts_on=date(2030, 1, 1), until=date(2030, 1, 29),
+            exceptions=['2030-01-15']
+        )
+        self.assertEqual(list(occurrence_dates(weekly, date(2030, 1, 2), date(2030, 12, 31))), [
+            date(2030, 1, 8), date(2030, 1, 22), date(2030, 1, 29),
+        ])
+        biweekly = EventSeries(frequency='biweekly', starts_on=date(2030, 1, 1))
+        self.assertEqual(list(occurrence_dates(biweekly, date(2030, 1, 1), date(2030, 2, 1))), [
+            date(2030, 1, 1), date(2030, 1, 15), date(2030, 1, 29),
+        ])
+        monthly = EventSeries(frequency='monthly', starts_on=date(2030, 1, 31))
+        self.assertEqual(list(occurrence_dates(monthly, date(2030, 1, 1), date(2030, 5, 31))), [
+            date(2030, 1, 31), date(2030, 3, 31), date(2030, 5, 31),
+        ])
+
+    def test_materialize_up_to_horizon(self):
+        """Test that occurrences are created only within the horizon, once."""
+        series = self._series()
+        self.assertEqual(materialize(), 4)
+        occurrences = series.occurrences.order_by('date')
+        self.assertEqual(occurrences.count(), 4)
+        self.assertTrue(all(event.date <= self.today + timedelta(days=28) for event in occurrences))
+        first = occurrences.first()
+        self.assertEqual(first.timestamp, timezone.make_aware(datetime.combine(first.date, time(20, 0))))
+        self.assertEqual(list(first.attendees.all()), [self.host])
+
+        # A second run has nothing left to do
+        self.assertEqual(materialize(), 0)
+        # The window rolls forward as time passes
+        self.assertEqual(materialize(horizon_days=42), 2)
+        self.assertEqual(series.occurrences.count(), 6)
+
+    def test_materialize_is_set_based(self):
+        """Test that the query count does not grow with the number of series."""
+        for i in range(3):
+            self._series(title=f"Series {i}")
+        with CaptureQueriesContext(connection) as few:
+            materialize()
+        EventSeries.objects.all().delete()
+        for i in range(12):
+            self._series(title=f"Series {i}")
+        with CaptureQueriesContext(connection) as many:
+            materialize()
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(Events.objects.filter(series__isnull=False).count(), 48)
+
+    def test_create_repeating_event(self):
+        """Test that choosing a repeat rule creates the series and its first weeks."""
+        self.client.login(username='coach', password='password123')
+        start_date = self.today + timedelta(days=2)
+        response = self.client.post(reverse('create_event'), {
+            'title': "Sunday Long Run",
+            'description': "Easy pace, 15k.",
+            'date': start_date.strftime('%Y-%m-%d'),
+            'start': '08:00',
+            'end': '10:00',
+            'category': 'running',
+            'skill_level': 'all',
+            'max_attendees': 20,
+            'repeat': 'weekly',
+        })
+        self.assertEqual(response.status_code, 302)
+        series = EventSeries.objects.get()
+        dates = list(series.occurrences.order_by('date').values_list('date', flat=True))
+        self.assertEqual(dates[0], start_date)
+        self.assertEqual(len(dates), len(list(occurrence_dates(series, start_date, self.today + timedelta(days=28)))))
+
+        # Occurrences are plain events on the index
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['total_events'], len(dates))
+
+    def test_editing_series_updates_future_occurrences(self):
+        """Test that series changes reach future occurrences with set-based updates."""
+        series = self._series()
+        materialize()
+        first = series.occurrences.order_by('date').first()
+
+        self.client.login(username='coach', password='password123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('edit_event', args=[first.id]), {
+                'title': "Tuesday Tennis Ladder",
+                'description': "Doubles ladder.",
+                'date': first.date.strftime('%Y-%m-%d'),
+                'start': '19:00',
+                'end': '21:00',
+                'category': 'tennis',
+                'skill_level': 'all',
+                'max_attendees': 8,
+                'apply_to_series': 'on',
+            })
+        self.assertEqual(response.status_code, 302)
+        event_updates = [
+            q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "sports_events"')
+        ]
+        self.assertLessEqual(len(event_updates), 3)
+
+        for event in series.occurrences.all():
+            self.assertEqual(event.title, "Tuesday Tennis Ladder")
+            self.assertEqual(event.max_attendees, 8)
+            self.assertEqual(event.timestamp, timezone.make_aware(datetime.combine(event.date, time(21, 0))))
+        self.assertEqual(EventNotification.objects.filter(updated=True).count(), 4)
+
+    def test_exceptions_cancel_materialized_occurrences(self):
+        """Test that adding an exception cancels that occurrence and skips it in future runs."""
+        series = self._series()
+        materialize()
+        skipped = series.occurrences.order_by('date')[1].date
+        series.refresh_from_db()
+        series.exceptions = [skipped.isoformat()]
+        series.save()
+
+        self.assertEqual(sync_future_occurrences(series), (3, 1))
+        self.assertTrue(series.occurrences.get(date=skipped).is_cancelled)
+        self.assertEqual(materialize(horizon_days=42), 2)
+
+    def test_series_edit_leaves_joined_occurrences_alone(self):
+        """Test that occurrences other users joined keep their time, like a joined event's edit form."""
+        series = self._series()
+        materialize()
+        joined, *others = series.occurrences.order_by('date')
+        joined.attendees.add(User.objects.create_user(username='player', password='password123'))
+
+        series.start, series.end, series.time_zone = time(7, 0), time(9, 0), 'Europe/Paris'
+        series.save()
+        self.assertEqual(sync_future_occurrences(series), (len(others), 0))
+
+        joined.refresh_from_db()
+        self.assertEqual((joined.start, joined.time_zone), (time(18, 0), ''))
+        for event in others:
+            event.refresh_from_db()
+            self.assertEqual((event.start, event.time_zone), (time(7, 0), 'Europe/Paris'))
+
+    def test_series_edit_never_lowers_capacity_below_attendance(self):
+        """Test that lowering the series' max_attendees skips occurrences with more people going."""
+        series = self._series(max_attendees=10)
+        materialize()
+        busy = series.occurrences.order_by('date').first()
+        busy.attendees.add(*[
+            User.objects.create_user(username=f'player{i}', password='password123') for i in range(4)
+        ])
+
+        series.max_attendees = 3
+        series.save()
+        sync_future_occurrences(series)
+
+        busy.refresh_from_db()
+        self.assertEqual(busy.max_attendees, 10)
+        self.assertGreaterEqual(busy.max_attendees, busy.attendees.count())
+        self.assertEqual(
+            set(series.occurrences.exclude(pk=busy.pk).values_list('max_attendees', flat=True)), {3}
+        )
+
+
+class FacetTests(TestCase):
+    """
+    Tests for the index filter facet counts.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.host = User.objects.create_user(username='organizer', password='password123')
+        today = timezone.localdate()
+        for offset, category, skill in [
+            (0, 'soccer', 'beginner'),
+            (1, 'soccer', 'advanced'),
+            (3, 'soccer', 'beginner'),
+            (10, 'tennis', 'beginner'),
+            (10, 'chess', 'advanced'),
+        ]:
+            day = today + timedelta(days=offset)
+            Events.objects.create(
+                title=f"{category} {skill}",
+                description="Facet fixture.",
+                host=self.host,
+                date=day,
+                start=time(23, 0),
+                end=time(23, 59),
+                category=category,
+                skill_level=skill,
+            )
+
+    def test_counts_respect_the_other_filters(self):
+        """Test that each facet is filtered by every active filter but its own."""
+        counts = facet_counts({'category': 'soccer', 'skill_level': 'beginner'})
+        self.assertEqual(counts['category'], {'soccer': 2, 'tennis': 1})
+        self.assertEqual(counts['skill_level'], {'beginner': 2, 'advanced': 1})
+        self.assertEqual(counts['date'], {'today': 1, 'this_week': 1})
+
+    def test_one_grouped_query_per_facet_then_cached(self):
+        """Test that a cold lookup runs three GROUP BY queries and a warm one none."""
+        with CaptureQueriesContext(connection) as queries:
+            facet_counts({'skill_level': 'advanced'})
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all('GROUP BY' in q['sql'] for q in queries.captured_queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            facet_counts({'skill_level': 'advanced'})
+        self.assertEqual(len(queries), 0)
+
+    def test_index_shows_counts(self):
+        """Test that the filter options and date links show their counts."""
+        response = self.client.get(reverse('index'), {'skill_level': 'advanced'})
+        self.assertContains(response, "Soccer (1)")
+        self.assertContains(response, "Chess (1)")
+        self.assertContains(response, "Tennis (0)")
+        self.assertContains(response, "All Levels (0)")
+        self.assertContains(response, "Beginner (3)")
+        tomorrow = response.context['date_facets'][1]
+        self.assertEqual((tomorrow['label'], tomorrow['count']), ('Tomorrow', 1))
+        self.assertIn('skill_level=advanced', tomorrow['url'])
+
+    def test_etag_changes_when_unfiltered_events_change(self):
+        """Test that a new event outside the filter still refreshes the page's counts."""
+        url = reverse('index') + '?category=chess'
+        etag = self.client.get(url)['ETag']
+        Events.objects.create(
+            title="Evening Tennis",
+            description="Facet fixture.",
+            host=self.host,
+            date=timezone.localdate() + timedelta(days=5),
+            start=time(18, 0),
+            end=time(20, 0),
+            category='tennis',
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DayTimeFilterTests(TestCase):
+    """
+    Tests for the weekday and time-of-day filters and their derived columns.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.host = User.objects.create_user(username='organizer', password='password123')
+        # Next week's Monday, so every weekday below is upcoming
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+
+    def _event(self, title, days, start, **kwargs):
+        fields = {
+            'title': title, 'description': "Filter fixture.", 'host': self.host,
+            'date': self.monday + timedelta(days=days), 'start': start,
+            'end': time(start.hour + 1, start.minute), 'category': 'soccer',
+        }
+        fields.update(kwargs)
+        return Events.objects.create(**fields)
+
+    def test_derived_columns_follow_date_and_start(self):
+        """Test that save() and the series bulk paths keep weekday and time of day current."""
+        event = self._event("Saturday Kickabout", 5, time(9, 0))
+        self.assertEqual((event.weekday, event.time_of_day), (5, 'morning'))
+        event.date, event.start, event.end = self.monday + timedelta(days=1), time(17, 0), time(18, 0)
+        event.save()
+        event.refresh_from_db()
+        self.assertEqual((event.weekday, event.time_of_day), (1, 'evening'))
+
+        series = EventSeries.objects.create(
+            host=self.host, title="Wednesday Lunch League", description="Filter fixture.", start=time(12, 30),
+            end=time(13, 30), category='soccer', frequency='weekly', starts_on=self.monday + timedelta(days=2),
+        )
+        materialize()
+        self.assertEqual(set(series.occurrences.values_list('weekday', 'time_of_day')), {(2, 'afternoon')})
+        series.start, series.end = time(19, 0), time(20, 0)
+        series.save()
+        sync_future_occurrences(series)
+        self.assertEqual(set(series.occurrences.values_list('weekday', 'time_of_day')), {(2, 'evening')})
+
+    def test_index_filters_by_days_and_time_of_day(self):
+        """Test that the index narrows to weekday evenings, weekend mornings and single days."""
+        self._event("Monday Evening", 0, time(18, 0))
+        self._event("Friday Evening", 4, time(19, 0))
+        self._event("Friday Morning", 4, time(8, 0))
+        self._event("Sunday Morning", 6, time(10, 0))
+        self._event("Sunday Afternoon", 6, time(14, 0))
+
+        def titles(**params):
+            response = self.client.get(reverse('index'), params)
+            self.assertEqual(response.status_code, 200)
+            return sorted(event.title for event in response.context['page_obj'])
+
+        self.assertEqual(titles(days='weekdays', time_of_day='evening'), ["Friday Evening", "Monday Evening"])
+        self.assertEqual(titles(days='weekend', time_of_day='morning'), ["Sunday Morning"])
+        self.assertEqual(titles(days='sunday'), ["Sunday Afternoon", "Sunday Morning"])
+        self.assertEqual(titles(time_of_day='morning'), ["Friday Morning", "Sunday Morning"])
+        self.assertEqual(titles(days='weekend', category='tennis'), [])
+
+    def test_filters_are_index_searches(self):
+        """Test that every combination searches events_listed_when_idx on both derived columns."""
+        for filters in (
+            {'days': 'weekend', 'time_of_day': 'morning'},
+            {'days': 'weekdays'},
+            {'time_of_day': 'evening'},
+            {'days': 'friday', 'category': 'soccer'},
+        ):
+            plan = upcoming_events(filters).explain()
+            self.assertIn('USING INDEX events_listed_when_idx (weekday=? AND time_of_day=?', plan, filters)
+            self.assertNotIn('SCAN', plan, filters)
+
+
+class TypeaheadTests(TestCase):
+    """
+    Tests for the search box typeahead index and endpoint.
+    """
+
+    def setUp(self):
+        self.addCleanup(typeahead.clear)
+        self.host = User.objects.create_user(username='serena_w', password='password123')
+        start = timezone.now() + timedelta(days=3)
+        self.event = Events.objects.create(
+            title="Sunday Tennis Doubles",
+            description="Bring a racket.",
+            host=self.host,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            category='tennis',
+        )
+        typeahead.rebuild()
+
+    def _labels(self, query):
+        response = self.client.get(reverse('typeahead'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(r['kind'], r['label']) for r in response.json()['results']]
+
+    def test_prefix_index(self):
+        """Test prefix matching on any word, accents, refcounts and removal."""
+        index = PrefixIndex()
+        index.load([('event', "Fútbol Sala"), ('event', "Fútbol Sala"), ('host', 'sam')])
+        self.assertEqual(index.search('fut'), [('event', "Fútbol Sala")])
+        self.assertEqual(index.search('sal'), [('event', "Fútbol Sala")])
+        self.assertEqual(index.search('fut s'), [('event', "Fútbol Sala")])
+        self.assertEqual(index.search('sala x'), [])
+        index.discard('event', "Fútbol Sala")
+        self.assertEqual(index.search('fut'), [('event', "Fútbol Sala")])
+        index.discard('event', "Fútbol Sala")
+        self.assertEqual(index.search('fut'), [])
+        index.add('event', "Futsal")
+        self.assertEqual(index.search('fut'), [('event', "Futsal")])
+
+    def test_suggests_titles_categories_and_hosts(self):
+        """Test that the endpoint returns each kind with a useful link."""
+        results = self.client.get(reverse('typeahead'), {'q': 'ten'}).json()['results']
+        self.assertEqual([(r['kind'], r['label']) for r in results], [
+            ('category', 'Table Tennis'), ('category', 'Tennis'), ('event', "Sunday Tennis Doubles"),
+        ])
+        self.assertEqual(results[1]['url'], reverse('index') + '?category=tennis')
+        self.assertEqual(self._labels('seren'), [('host', 'serena_w')])
+
+    def test_index_follows_saves(self):
+        """Test that saving, cancelling and renaming update the index incrementally."""
+        self.event.title = "Sunday Padel Doubles"
+        self.event.save()
+        self.assertEqual(self._labels('pad'), [('event', "Sunday Padel Doubles")])
+        self.assertEqual(self._labels('tennis d'), [])
+
+        self.host.username = 'venus_w'
+        self.host.save()
+        self.assertEqual(self._labels('venu'), [('host', 'venus_w')])
+        self.assertEqual(self._labels('seren'), [])
+
+        self.event.is_cancelled = True
+        self.event.save()
+        self.assertEqual(self._labels('pad'), [])
+        self.assertEqual(self._labels('venu'), [])
+
+    @override_settings(TYPEAHEAD_INDEX=False)
+    def test_database_fallback(self):
+        """Test that suggestions come from the database while no index is built."""
+        typeahead.clear()
+        with CaptureQueriesContext(connection) as queries:
+            labels = self._labels('tenn')
+        self.assertGreater(len(queries), 0)
+        self.assertIn(('event', "Sunday Tennis Doubles"), labels)
+        self.assertIn(('category', 'Tennis'), labels)
+
+    def test_changes_during_a_rebuild_are_kept(self):
+        """Test that a save landing after the rebuild read the database is not lost in the swap."""
+        read_rows = typeahead._read_rows
+
+        def read_then_rename():
+            rows = read_rows()
+            self.event.title = "Monday Squash Ladder"
+            self.event.save()
+            return rows
+
+        with unittest.mock.patch.object(typeahead, '_read_rows', side_effect=read_then_rename):
+            typeahead.rebuild()
+        self.assertIn(('event', "Monday Squash Ladder"), self._labels('squ'))
+        self.assertNotIn(('event', "Sunday Tennis Doubles"), self._labels('sunday'))
+
+    def test_worker_startup_builds_index_and_freezes_gc_once(self):
+        """Test that the server entry point builds the index before any request."""
+        from capstone.startup import prepare_worker
+        typeahead.clear()
+        with override_settings(TYPEAHEAD_INDEX=True), \
+                unittest.mock.patch('capstone.startup.gc.freeze') as freeze:
+            prepare_worker()
+        freeze.assert_called_once_with()
+        self.assertTrue(typeahead.is_ready)
+        with unittest.mock.patch('gc.freeze') as freeze:
+            typeahead.rebuild()
+        freeze.assert_not_called()
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, WRITE_CONCURRENCY_LIMIT=0)
+class LoadTestTests(LiveServerTestCase):
+    """
+    Tests for the asyncio load generator against a live server.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='demo1234')
+        self.players = [User.objects.create_user(username=f'player{i}', password='demo1234') for i in range(2)]
+        start = timezone.now() + timedelta(days=2)
+        self.event = Events.objects.create(
+            title="Load Test Volleyball",
+            description="Many hands.",
+            host=self.host,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            category='volleyball',
+        )
+        self.plan = Plan([self.event.id], self.event.id, ['Volleyball'], ['volleyball'])
+
+    def _run(self, scenario, users):
+        return asyncio.run(run_loadtest(
+            self.live_server_url, scenario, self.plan, ['player0', 'player1'], 'demo1234', users=users, duration=1
+        ))
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 95), 0)
+
+    def test_outcomes_are_classified(self):
+        """Test that 4xx, throttling and server errors are reported in separate columns."""
+        stats = Stats()
+        for status in (200, 200, 200, 200, 400, 403, 429, 503, 500, None):
+            stats.record('toggle', status, 0.01, error='TimeoutError' if status is None else None)
+        row = next(stats.report())
+        self.assertEqual(row['errors'], 20)
+        self.assertEqual(row['client_errors'], 20)
+        self.assertEqual(row['throttled'], 20)
+
+    def test_users_that_cannot_log_in_are_reported(self):
+        """Test that the run says how many virtual users started, without retrying bad passwords."""
+        stats = asyncio.run(run_loadtest(
+            self.live_server_url, 'join-storm', self.plan, ['player0'], 'wrong', users=2, duration=1
+        ))
+        self.assertEqual((stats.users_requested, stats.users_started), (2, 0))
+        # One GET and one POST per user: a rejected password is not retried
+        self.assertEqual(sum(stats.statuses['login'].values()), 4)
+        self.assertNotIn('toggle_attendance', stats.statuses)
+
+    def test_browse_scenario(self):
+        """Test that anonymous browsing hits the listing and detail pages without errors."""
+        rows = {row['endpoint']: row for row in self._run('browse', users=2).report()}
+        for endpoint in ('index', 'index?page', 'event_detail'):
+            self.assertGreater(rows[endpoint]['requests'], 0)
+            self.assertEqual(rows[endpoint]['errors'], 0)
+
+    def test_join_storm_logs_in_and_passes_csrf(self):
+        """Test that virtual users log in and their AJAX posts pass CSRF checks."""
+        # One user: the live server threads share a single in-memory SQLite
+        # connection, so concurrent writes here would test the harness instead
+        stats = self._run('join-storm', users=1)
+        self.assertEqual(stats.users_started, 1)
+        self.assertEqual(set(stats.statuses['login']), {200, 302})
+        self.assertEqual(set(stats.statuses['toggle_attendance']), {200})
+        self.assertGreater(stats.statuses['toggle_attendance'][200], 0)
+
+
+
+class UserCardTests(TestCase):
+    """
+    Tests for the per-process cache of user avatar and profile-link cards.
+    """
+
+    def setUp(self):
+        user_cards.clear()
+        self.addCleanup(user_cards.clear)
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.players = [User.objects.create_user(username=f'player{i}', password='password123') for i in range(4)]
+        start = timezone.now() + timedelta(days=2)
+        self.event = Events.objects.create(
+            title="Card Game",
+            description="Cards.",
+            host=self.host,
+            date=start.date(),
+            start=start.time(),
+            end=(start + timedelta(hours=2)).time(),
+            category='other',
+            max_attendees=10,
+        )
+        self.event.attendees.add(self.host, *self.players)
+        for player in self.players:
+            EventComment.objects.create(event=self.event, author=player, content=f"Hi from {player.username}")
+
+    def test_get_many_loads_misses_in_one_query(self):
+        """Test that misses are loaded together and later lookups are free."""
+        ids = [player.pk for player in self.players]
+        with self.assertNumQueries(1):
+            cards = user_cards.get_many(ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_cards.get_many(ids), cards)
+        card = cards[self.players[0].pk]
+        self.assertEqual(card.username, 'player0')
+        self.assertEqual(card.profile_url, reverse('user_profile', args=['player0']))
+        self.assertEqual(card.avatar_url, avatar_url(self.players[0]))
+        self.assertIsNone(user_cards.get(10**9))
+
+    def test_evicts_least_recently_used_and_expires(self):
+        """Test the size bound and the time-to-live."""
+        cache = UserCardCache(maxsize=2, ttl=60)
+        a, b, c = self.players[:3]
+        cache.get_many([a.pk, b.pk])
+        cache.get(a.pk)  # b is now the least recently used
+        cache.get(c.pk)
+        self.assertEqual(len(cache), 2)
+        with self.assertNumQueries(0):
+            cache.get_many([a.pk, c.pk])
+        with self.assertNumQueries(1):
+            cache.get(b.pk)
+
+        expired = UserCardCache(maxsize=10, ttl=0)
+        expired.get(a.pk)
+        with self.assertNumQueries(1):
+            expired.get(a.pk)
+
+    def test_edit_profile_invalidates_card(self):
+        """Test that a new profile picture shows up on the next lookup."""
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        player = self.players[0]
+        old_url = user_cards.get(player.pk).avatar_url
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(image, 'PNG')
+        self.client.force_login(player)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(reverse('edit_profile'), {
+                'first_name': 'Pat',
+                'profile_picture': SimpleUploadedFile('me.png', image.getvalue(), content_type='image/png'),
+            })
+            self.assertRedirects(response, reverse('profile'))
+            with self.assertNumQueries(1):
+                new_url = user_cards.get(player.pk).avatar_url
+        self.assertNotEqual(new_url, old_url)
+        self.assertTrue(new_url.startswith('/media/blobs/') and new_url.endswith('.png'))
+
+    def test_event_detail_and_ajax_responses_use_cards(self):
+        """Test that pages and JSON responses show each user's name, link and avatar."""
+        response = self.client.get(reverse('event_detail', args=[self.event.id]))
+        for player in self.players:
+            self.assertContains(response, f'href="{reverse("user_profile", args=[player.username])}"')
+            self.assertContains(response, f'alt="{player.username}"')
+        # Cards were warmed for the page, so a repeat lookup needs no query
+        with self.assertNumQueries(0):
+            user_cards.get_many([player.pk for player in self.players])
+
+        self.client.force_login(self.players[0])
+        data = self.client.post(reverse('toggle_attendance', args=[self.event.id])).json()
+        self.assertNotIn('player0', [attendee['username'] for attendee in data['attendees_list']])
+        host_entry = next(a for a in data['attendees_list'] if a['username'] == 'host')
+        self.assertTrue(host_entry['is_host'])
+        self.assertEqual(host_entry['profile_picture_url'], avatar_url(self.host))
+
+        data = self.client.post(reverse('add_comment', args=[self.event.id]), {'content': 'Bye'}).json()
+        self.assertEqual(data['comment']['author'], 'player0')
+        self.assertEqual(data['comment']['author_profile_url'], reverse('user_profile', args=['player0']))
+
+
+class AgendaTests(TestCase):
+    """
+    Tests for the per-user agenda rows behind my_events and profiles.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.player = User.objects.create_user(username='player', password='password123')
+        self.start = (timezone.now() + timedelta(days=3)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+    def _event(self, title="Morning Run", days=0, **kwargs):
+        start = self.start + timedelta(days=days)
+        fields = {
+            'title': title,
+            'description': "Easy pace.",
+            'host': self.host,
+            'date': start.date(),
+            'start': start.time(),
+            'end': (start + timedelta(hours=2)).time(),
+            'category': 'running',
+        }
+        fields.update(kwargs)
+        event = Events.objects.create(**fields)
+        event.attendees.add(event.host)
+        return event
+
+    def _agenda(self, user):
+        return list(AgendaEntry.objects.filter(user=user).order_by('starts_at').values_list('event_id', 'is_host'))
+
+    def test_join_leave_and_host_rows(self):
+        """Test that hosting, joining and leaving keep one row per commitment."""
+        self.client.login(username='player', password='password123')
+        event = self._event()
+        self.assertEqual(self._agenda(self.host), [(event.id, True)])
+        entry = AgendaEntry.objects.get(user=self.host)
+        self.assertEqual(entry.starts_at, self.start)
+        self.assertEqual(entry.ends_at, event.timestamp)
+
+        url = reverse('toggle_attendance', args=[event.id])
+        self.client.post(url)
+        self.assertEqual(self._agenda(self.player), [(event.id, False)])
+        self.client.post(url)
+        self.assertEqual(self._agenda(self.player), [])
+
+        # A host who is not attending is still committed to the event
+        event.attendees.remove(self.host)
+        self.assertEqual(self._agenda(self.host), [(event.id, True)])
+        self.player.attending.add(event)
+        self.player.attending.clear()
+        self.assertEqual(self._agenda(self.player), [])
+
+    def test_edit_cancel_and_waitlist_promotion(self):
+        """Test that rescheduling moves rows, promotion adds one and cancelling keeps them."""
+        event = _create_full_event(self.host, [self.player])
+        waiter = User.objects.create_user(username='waiter', password='password123')
+        WaitlistEntry.objects.create(event=event, user=waiter)
+        self.client.login(username='player', password='password123')
+        self.client.post(reverse('toggle_attendance', args=[event.id]))
+        self.assertEqual(self._agenda(waiter), [(event.id, False)])
+
+        event.date += timedelta(days=1)
+        event.save()
+        self.assertEqual(
+            set(AgendaEntry.objects.filter(event=event).values_list('starts_at', flat=True)),
+            {timezone.make_aware(datetime.combine(event.date, event.start))}
+        )
+
+        self.client.login(username='host', password='password123')
+        self.client.post(reverse('cancel_event', args=[event.id]))
+        self.assertEqual(AgendaEntry.objects.filter(event=event).count(), 2)
+        self.assertEqual(self._agenda(waiter), [(event.id, False)])
+
+    def test_series_paths_keep_agenda(self):
+        """Test that bulk-created occurrences and set-based series edits update agendas."""
+        series = EventSeries.objects.create(
+            host=self.host, title="Tuesday Tennis", description="Ladder.", start=time(18, 0), end=time(20, 0),
+            category='tennis', frequency='weekly', starts_on=timezone.localdate() + timedelta(days=1),
+        )
+        materialize()
+        occurrences = list(series.occurrences.order_by('date'))
+        self.assertEqual(self._agenda(self.host), [(event.id, True) for event in occurrences])
+
+        series.exceptions = [occurrences[1].date.isoformat()]
+        series.end = time(21, 0)
+        series.save()
+        sync_future_occurrences(series)
+        # The skipped date is cancelled but stays on the host's agenda
+        entries = AgendaEntry.objects.filter(user=self.host)
+        self.assertEqual(entries.count(), len(occurrences))
+        self.assertTrue(entries.get(event=occurrences[1]).event.is_cancelled)
+        for entry in entries.exclude(event=occurrences[1]):
+            self.assertEqual(entry.ends_at.time(), time(21, 0))
+
+    def test_my_events_reads_agenda_index(self):
+        """Test that my_events lists commitments in start order with one covering index scan."""
+        later = self._event("Evening Run", days=2)
+        sooner = self._event("Lunch Run", days=1)
+        hosted_by_player = self._event("Player Game", days=1, host=self.player)
+        over = self._event("Finished Run", days=-5)
+        for event in (later, sooner, over):
+            event.attendees.add(self.player)
+
+        self.client.login(username='player', password='password123')
+        response = self.client.get(reverse('my_events'))
+        self.assertEqual([e.title for e in response.context['hosted_events']], ["Player Game"])
+        self.assertEqual([e.title for e in response.context['attending_events']], ["Lunch Run", "Evening Run"])
+        self.assertContains(response, "2/10 attending")
+
+        plan = agenda.upcoming_entries(self.player).explain()
+        self.assertIn('COVERING INDEX agenda_user_start_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        profile = self.client.get(reverse('user_profile', args=['player']))
+        self.assertEqual([e.title for e in profile.context['hosted_events']], ["Player Game"])
+        self.assertEqual(
+            [e.title for e in profile.context['attended_events']],
+            ["Evening Run", "Player Game", "Lunch Run", "Finished Run"]
+        )
+
+    def test_cancelled_events_stay_listed_with_badge(self):
+        """Test that My Events and profiles keep cancelled events and mark them."""
+        event = self._event("Rained Out")
+        event.attendees.add(self.player)
+        self.client.login(username='host', password='password123')
+        self.client.post(reverse('cancel_event', args=[event.id]))
+
+        self.client.login(username='player', password='password123')
+        response = self.client.get(reverse('my_events'))
+        self.assertEqual([e.title for e in response.context['attending_events']], ["Rained Out"])
+        self.assertContains(response, '<span class="badge bg-danger">Cancelled</span>', html=True)
+
+        profile = self.client.get(reverse('user_profile', args=['host']))
+        self.assertEqual([e.title for e in profile.context['hosted_events']], ["Rained Out"])
+        self.assertContains(profile, '<span class="badge bg-danger">Cancelled</span>', html=True)
+
+class RollupTests(TestCase):
+    """
+    Tests for the incremental category/week rollups and the staff dashboard.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.player = User.objects.create_user(username='player', password='password123')
+        self.staff_user = User.objects.create_user(username='analyst', password='password123', is_staff=True)
+        self.week = rollups.week_of(timezone.now())
+
+    def _stats(self, category='basketball'):
+        row = CategoryWeekStats.objects.filter(week=self.week, category=category).first()
+        return row and (row.events_created, row.average_fill, row.cancellations, row.comments)
+
+    def _all_stats(self):
+        return {
+            (row.week, row.category): tuple(getattr(row, field) for field in rollups.COUNTERS)
+            for row in CategoryWeekStats.objects.all()
+            if any(getattr(row, field) for field in rollups.COUNTERS)
+        }
+
+    def test_write_paths_update_rollups(self):
+        """Test that creating, joining, leaving, cancelling and commenting adjust the counters."""
+        event = _create_full_event(self.host, [], max_attendees=4)
+        self.assertEqual(self._stats(), (1, 25, 0, 0))
+
+        self.client.login(username='player', password='password123')
+        self.client.post(reverse('toggle_attendance', args=[event.id]))
+        self.assertEqual(self._stats(), (1, 50, 0, 0))
+        self.client.post(reverse('add_comment', args=[event.id]), {'content': "Bringing a ball."})
+        self.assertEqual(self._stats(), (1, 50, 0, 1))
+        self.client.post(reverse('toggle_attendance', args=[event.id]))
+        self.assertEqual(self._stats(), (1, 25, 0, 1))
+
+        event.category = 'tennis'
+        event.save()
+        # Comments move with their event
+        self.assertEqual(self._stats(), (0, 0, 0, 0))
+        self.assertEqual(self._stats('tennis'), (1, 25, 0, 1))
+
+        self.client.login(username='host', password='password123')
+        self.client.post(reverse('cancel_event', args=[event.id]))
+        self.assertEqual(self._stats('tennis'), (1, 25, 1, 1))
+
+        EventComment.objects.filter(event=event).delete()
+        event.delete()
+        self.assertEqual(self._all_stats(), {})
+
+    def test_set_based_writes_are_tracked(self):
+        """Test that bulk series occurrences and the admin cancel action reach the rollups."""
+        series = EventSeries.objects.create(
+            host=self.host, title="Tuesday Tennis", description="Ladder.", start=time(18, 0), end=time(20, 0),
+            category='tennis', frequency='weekly', starts_on=timezone.localdate() + timedelta(days=1),
+        )
+        created = materialize()
+        self.assertEqual(self._stats('tennis'), (created, 10, 0, 0))
+
+        series.max_attendees = 5
+        series.save()
+        sync_future_occurrences(series)
+        self.assertEqual(self._stats('tennis'), (created, 20, 0, 0))
+
+        self.client.login(username='analyst', password='password123')
+        self.staff_user.is_superuser = True
+        self.staff_user.save()
+        self.client.post(reverse('admin:sports_events_changelist'), {
+            'action': 'cancel_events',
+            '_selected_action': [str(pk) for pk in series.occurrences.values_list('pk', flat=True)[:2]],
+        })
+        self.assertEqual(self._stats('tennis'), (created, 20, 2, 0))
+
+    def test_backfill_matches_incremental_counts(self):
+        """Test that a chunked, resumable backfill rebuilds exactly what the write paths kept."""
+        events = [_create_full_event(self.host, [self.player], max_attendees=n) for n in (2, 3, 5)]
+        events[1].is_cancelled = True
+        events[1].save()
+        for event in events:
+            EventComment.objects.create(event=event, author=self.player, content="See you there.")
+        expected = self._all_stats()
+        self.assertTrue(expected)
+
+        call_command('backfill_rollups', '--rebuild', '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(self._all_stats(), expected)
+        self.assertTrue(RollupProgress.objects.get(pk=1).complete)
+
+        # Interrupted after the first chunk: live writes to rows the backfill
+        # has not reached are left for it, so nothing is counted twice
+        progress_reports = []
+        with unittest.mock.patch('sports.rollups.snapshot', side_effect=[rollups.snapshot(
+            [events[0].pk, events[1].pk]
+        ), RuntimeError("killed")]):
+            with self.assertRaises(RuntimeError):
+                rollups.backfill(batch_size=2, rebuild=True, progress_callback=lambda *r: progress_reports.append(r))
+        self.assertEqual(progress_reports, [('events', 2)])
+        self.assertEqual(RollupProgress.objects.get(pk=1).events_through, events[1].pk)
+        events[2].attendees.remove(self.player)
+        events[0].attendees.remove(self.player)
+        self.assertEqual(rollups.backfill(batch_size=2), (1, 3))
+        after_resume = self._all_stats()
+        call_command('backfill_rollups', '--rebuild', stdout=io.StringIO())
+        self.assertEqual(self._all_stats(), after_resume)
+
+    def test_dashboard_is_staff_only_and_reads_rollups(self):
+        """Test that the dashboard needs staff and queries nothing but the rollup tables."""
+        _create_full_event(self.host, [self.player], max_attendees=4)
+        url = reverse('analytics_dashboard')
+        self.client.login(username='player', password='password123')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='analyst', password='password123')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'category': 'basketball', 'weeks': '4'})
+        self.assertContains(response, "Basketball")
+        self.assertContains(response, "50%")
+        self.assertNotContains(response, "still being counted")
+        tables = set(re.findall(r'FROM "(\w+)"', " ".join(q['sql'] for q in queries.captured_queries)))
+        self.assertEqual(tables - {'sports_user', 'django_session'}, {'sports_categoryweekstats', 'sports_rollupprogress'})
+
+        RollupProgress.objects.create(pk=1)
+        self.assertContains(self.client.get(url), "still being counted")
+
+class MediaGCTests(TestCase):
+    """
+    Tests for gc_media: orphaned upload collection and purging long-cancelled events.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.old = (timezone.now() - timedelta(days=7)).timestamp()
+
+    def _file(self, name, old=True):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        if old:
+            os.utime(path, (self.old, self.old))
+        return path
+
+    def _event(self, days_ago, cancelled=True):
+        day = timezone.localdate() - timedelta(days=days_ago)
+        return Events.objects.create(
+            title="Old Game", description="Rained out.", host=self.host, date=day,
+            start=time(10, 0), end=time(12, 0), category='soccer', is_cancelled=cancelled,
+        )
+
+    def test_only_old_unreferenced_uploads_are_deleted(self):
+        """Test that referenced, recent, stock and non-upload files survive collection."""
+        event = self._event(1, cancelled=False)
+        event.image = 'events/game.jpg'
+        event.save()
+        self.host.profile_picture = 'profile_pics/host.png'
+        self.host.save()
+        kept = [
+            self._file('events/game.jpg'),
+            self._file('profile_pics/host.png'),
+            self._file('events/soccer.jpeg'),  # populate_demo's stock image
+            self._file('events/upload_in_progress.jpg', old=False),
+            self._file('CACHE/unrelated.bin'),
+        ]
+        orphans = [self._file('events/replaced.jpg'), self._file('profile_pics/nested/old_avatar.png')]
+
+        output = io.StringIO()
+        call_command('gc_media', '--dry-run', '--rate', '0', stdout=output)
+        self.assertIn("Would delete 2 orphaned media file(s)", output.getvalue())
+        self.assertTrue(all(os.path.exists(path) for path in kept + orphans))
+
+        batches = []
+        self.assertEqual(delete_orphans(batch_size=1, progress_callback=lambda batch: batches.append(list(batch))),
+                         (2, 200))
+        self.assertEqual(len(batches), 2)
+        self.assertTrue(all(os.path.exists(path) for path in kept))
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+
+        # Replacing an image leaves the previous file behind for the next run
+        event.image = 'events/new.jpg'
+        event.save()
+        self.assertEqual(delete_orphans(), (1, 100))
+        self.assertFalse(os.path.exists(kept[0]))
+
+    def test_purge_is_bounded_and_resumable(self):
+        """Test that old cancelled events go in batches and an interrupted run resumes."""
+        late = self._event(400, cancelled=False)
+        stale = [self._event(400) for _ in range(5)]
+        EventComment.objects.create(event=stale[0], author=self.host, content="Shame.")
+        recent = self._event(10)
+        active = self._event(400, cancelled=False)
+
+        self.assertEqual(purge_cancelled_events(older_than_days=180, batch_size=2, dry_run=True), 5)
+        self.assertEqual(Events.objects.count(), 8)
+
+        throttle = unittest.mock.Mock(wait=unittest.mock.Mock(side_effect=[None, RuntimeError("killed")]))
+        with self.assertRaises(RuntimeError):
+            purge_cancelled_events(older_than_days=180, batch_size=2, throttle=throttle)
+        self.assertEqual(Events.objects.filter(pk__in=[event.pk for event in stale]).count(), 1)
+        checkpoint = MaintenanceCheckpoint.objects.get(name='purge_cancelled_events')
+        self.assertEqual(checkpoint.position, stale[3].pk)
+
+        # The resumed run skips what the checkpoint has passed; the next pass starts over
+        Events.objects.filter(pk=late.pk).update(is_cancelled=True)
+        self.assertEqual(purge_cancelled_events(older_than_days=180, batch_size=2), 1)
+        self.assertTrue(Events.objects.filter(pk=late.pk).exists())
+        self.assertEqual(MaintenanceCheckpoint.objects.get(name='purge_cancelled_events').position, 0)
+        self.assertEqual(purge_cancelled_events(older_than_days=180, batch_size=2), 1)
+        self.assertEqual(set(Events.objects.all()), {recent, active})
+        self.assertFalse(EventComment.objects.exists())
+
+    def test_throttle_paces_batches(self):
+        """Test that the throttle sleeps just long enough to hold the rate."""
+        now, sleeps = [0.0], []
+        throttle = Throttle(100, sleep=sleeps.append, clock=lambda: now[0])
+        throttle.wait(50)
+        now[0] = 0.2
+        throttle.wait(50)
+        self.assertAlmostEqual(sleeps[0], 0.5)
+        self.assertAlmostEqual(sleeps[1], 0.8)
+        Throttle(None, sleep=sleeps.append).wait(1000)
+        self.assertEqual(len(sleeps), 2)
+
+class ContentAddressedStorageTests(TestCase):
+    """
+    Tests for deduplicated media blobs, their reference counts and migration of old files.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.host = User.objects.create_user(username='host', password='password123')
+
+    def _event(self, image=None):
+        start = timezone.now() + timedelta(days=2)
+        return Events.objects.create(
+            title="Pickup Game", description="Bring water.", host=self.host, date=start.date(),
+            start=time(10, 0), end=time(12, 0), category='soccer', image=image,
+        )
+
+    def _upload(self, data, name='photo.JPG'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile(name, data, content_type='image/jpeg')
+
+    def _files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.media_root)
+            for directory, _, names in os.walk(self.media_root) for name in names
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        """Test that repeated content is written once and counted per row."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        data = b'\xff\xd8' + os.urandom(200_000)
+        with unittest.mock.patch.object(
+            SimpleUploadedFile, 'chunks', autospec=True, side_effect=SimpleUploadedFile.chunks
+        ) as read, unittest.mock.patch.object(
+            ContentAddressedStorage, '_commit_blob', autospec=True, side_effect=ContentAddressedStorage._commit_blob
+        ) as write:
+            first = self._event(self._upload(data))
+            second = self._event(self._upload(data, name='copy.jpg'))
+            other = self._event(self._upload(b'different'))
+        # Each upload is read once; the duplicate's temporary copy is dropped
+        self.assertEqual(read.call_count, 3)
+        self.assertEqual(write.call_count, 2)
+
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(first.image.name, f"blobs/{digest[:2]}/{digest[2:4]}/{digest}.jpg")
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(len(self._files()), 2)
+        with first.image.open() as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).refs, 2)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).size, len(data))
+
+        # Deleting one row keeps the shared file; deleting through the storage only drops a reference
+        second.delete()
+        first.image.delete(save=False)
+        self.assertEqual(MediaBlob.objects.get(name=second.image.name).refs, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, second.image.name)))
+
+    def test_gc_recounts_and_collects_blobs(self):
+        """Test that gc_media fixes drifted counts and removes unreferenced blobs."""
+        event = self._event(self._upload(b'shared image'))
+        blob = event.image.name
+        # Copies made without an upload (like series occurrences) are not counted live
+        Events.objects.bulk_create([Events(
+            title="Copy", description="Copy.", host=self.host, date=event.date, start=event.start,
+            end=event.end, starts_at=event.starts_at, timestamp=event.timestamp, weekday=event.weekday,
+            time_of_day=event.time_of_day, category='soccer', image=blob,
+        )])
+        self.assertEqual(delete_orphans(grace=timedelta(0)), (0, 0))
+        self.assertEqual(MediaBlob.objects.get(name=blob).refs, 2)
+
+        Events.objects.all().delete()
+        self.assertEqual(delete_orphans(grace=timedelta(0)), (1, len(b'shared image')))
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertEqual(self._files(), [])
+
+    def test_dedupe_media_moves_legacy_copies(self):
+        """Test that old per-upload copies are replaced by one blob the rows share."""
+        data = b'stock soccer photo'
+        for name in ('events/soccer_a.jpeg', 'events/soccer_b.jpeg', 'events/soccer_c.jpeg'):
+            os.makedirs(os.path.join(self.media_root, 'events'), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(data)
+        events = [self._event() for _ in range(4)]
+        for event, name in zip(events, ['events/soccer_a.jpeg', 'events/soccer_a.jpeg',
+                                        'events/soccer_b.jpeg', 'events/soccer_c.jpeg']):
+            Events.objects.filter(pk=event.pk).update(image=name)
+        self.host.profile_picture = 'profile_pics/missing.png'
+        self.host.save()
+
+        self.assertEqual(deduplicate_media(dry_run=True), (3, 1))
+        self.assertFalse(MediaBlob.objects.exists())
+        output = io.StringIO()
+        call_command('dedupe_media', '--rate', '0', stdout=output)
+        self.assertIn("Moved 3 file name(s)", output.getvalue())
+
+        names = set(Events.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get().refs, 4)
+        self.assertEqual(delete_orphans(grace=timedelta(0)), (3, 3 * len(data)))
+        self.assertEqual(self._files(), [names.pop()])
+
+class CompressionTests(TestCase):
+    """
+    Tests for brotli/gzip response compression and optional HTML minification.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123', is_staff=True)
+        start = timezone.now() + timedelta(days=1)
+        for i in range(12):
+            Events.objects.create(
+                title=f"Pickup Game {i}", description="Bring water.", host=self.host, date=start.date(),
+                start=start.time(), end=(start + timedelta(hours=1)).time(), category='soccer',
+            )
+
+    @unittest.skipUnless(brotli, "brotli is not installed")
+    def test_pages_are_negotiated_and_compressed(self):
+        """Test that brotli is preferred, gzip is the fallback and plain clients get plain HTML."""
+        plain = self.client.get(reverse('index'))
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        self.assertIn(b'Pickup Game', brotli.decompress(response.content))
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        # The weakened ETag still validates
+        cached = self.client.get(
+            reverse('index'), HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(cached.status_code, 304)
+
+        response = self.client.get(reverse('index'), HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Pickup Game', gzip.decompress(response.content))
+
+    def test_streaming_small_and_binary_responses(self):
+        """Test that streams are compressed incrementally and tiny or compressed bodies pass through."""
+        self.client.login(username='host', password='password123')
+        plain = b''.join(self.client.get(reverse('export_events'), {'format': 'csv'}).streaming_content)
+        response = self.client.get(reverse('export_events'), {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+        # Already gzipped by the view
+        response = self.client.get(reverse('export_events'), {'gzip': '1'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+        with override_settings(TYPEAHEAD_INDEX=False):
+            tiny = self.client.get(reverse('typeahead'), {'q': 'zz'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', tiny)
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            os.makedirs(os.path.join(media_root, 'events'))
+            with open(os.path.join(media_root, 'events', 'game.jpg'), 'wb') as f:
+                f.write(b'\xff\xd8' + b'a' * 4096)
+            image = self.client.get('/media/events/game.jpg', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertNotIn('Content-Encoding', image)
+            self.assertEqual(len(b''.join(image.streaming_content)), 4098)
+
+    @override_settings(HTML_MINIFY=True, HTML_MINIFY_MIN_SIZE=0)
+    def test_minify_keeps_significant_whitespace(self):
+        """Test that indentation is stripped from sports pages but not from preformatted content."""
+        html = "<ul>\n    <li>a  b</li>\n\n    <li>\xa0c</li>\n</ul>\n<pre>\n  keep\n</pre>\n  <script>\n  var x;\n</script>"
+        self.assertEqual(
+            minify_html(html),
+            "<ul>\n<li>a  b</li>\n<li>\xa0c</li>\n</ul>\n<pre>\n  keep\n</pre>\n<script>\n  var x;\n</script>"
+        )
+
+        response = self.client.get(reverse('index'))
+        self.assertNotIn(b'\n    ', response.content.split(b'<script')[0])
+        self.assertContains(response, "Pickup Game")
+        with override_settings(HTML_MINIFY=False):
+            self.assertLess(len(response.content), len(self.client.get(reverse('index')).content))
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class BatchAttendanceTests(TestCase):
+    """
+    Tests for joining and leaving several events in one request.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.player = User.objects.create_user(username='player', password='password123')
+        self.url = reverse('batch_attendance')
+        self.client.login(username='player', password='password123')
+
+    def _event(self, days=3, **kwargs):
+        start = (timezone.now() + timedelta(days=days)).replace(hour=10, minute=0, second=0, microsecond=0)
+        fields = {
+            'title': "League Match", 'description': "Week fixture.", 'host': self.host,
+            'date': start.date(), 'start': start.time(), 'end': time(12, 0), 'category': 'soccer',
+        }
+        fields.update(kwargs)
+        event = Events.objects.create(**fields)
+        event.attendees.add(event.host)
+        return event
+
+    def _post(self, **payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_mixed_batch_reports_each_event(self):
+        """Test that valid intents are applied and every rejected one says why."""
+        open_events = [self._event() for _ in range(3)]
+        full = _create_full_event(self.host, [User.objects.create_user(username='other', password='password123')])
+        past = self._event(days=-3)
+        cancelled = self._event(is_cancelled=True)
+        own = self._event(host=self.player)
+        attended, not_attended = self._event(), self._event()
+        attended.attendees.add(self.player)
+        WaitlistEntry.objects.create(event=open_events[0], user=self.player)
+
+        response = self._post(
+            join=[event.id for event in open_events] + [full.id, past.id, cancelled.id, own.id, 999999],
+            leave=[attended.id, not_attended.id],
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['joined'], data['left']), (3, 1))
+        statuses = {result['event_id']: result['status'] for result in data['results']}
+        self.assertEqual(statuses, {
+            open_events[0].id: 'joined', open_events[1].id: 'joined', open_events[2].id: 'joined',
+            full.id: 'full', past.id: 'past', cancelled.id: 'cancelled', own.id: 'host', 999999: 'not_found',
+            attended.id: 'left', not_attended.id: 'not_attending',
+        })
+        first = data['results'][0]
+        self.assertEqual((first['attendees_count'], first['spots_available']), (2, 8))
+        self.assertIn('waitlist_url', data['results'][3])
+
+        self.assertEqual(
+            set(self.player.attending.values_list('pk', flat=True)), {event.id for event in open_events} | {own.id}
+        )
+        self.assertFalse(WaitlistEntry.objects.filter(user=self.player).exists())
+        self.assertEqual(
+            set(AgendaEntry.objects.filter(user=self.player, is_host=False).values_list('event_id', flat=True)),
+            {event.id for event in open_events}
+        )
+        # Rollups see the bulk changes too: three events at 20%, five at 10%
+        self.assertEqual(CategoryWeekStats.objects.get(category='soccer').fill_percent_total, 3 * 20 + 5 * 10)
+
+    def test_leaving_promotes_waiters(self):
+        """Test that a spot freed by a batch leave goes to the head of the waitlist."""
+        event = _create_full_event(self.host, [self.player])
+        waiter = User.objects.create_user(username='waiter', password='password123')
+        WaitlistEntry.objects.create(event=event, user=waiter)
+        result = self._post(leave=[event.id]).json()['results'][0]
+        self.assertEqual((result['status'], result['attendees_count']), ('left', 2))
+        self.assertEqual(set(event.attendees.values_list('username', flat=True)), {'host', 'waiter'})
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        """Test that checks and writes are set-based."""
+        few, many = [self._event() for _ in range(2)], [self._event() for _ in range(8)]
+        with CaptureQueriesContext(connection) as small:
+            self._post(join=[event.id for event in few])
+        with CaptureQueriesContext(connection) as large:
+            self._post(join=[event.id for event in many])
+        self.assertEqual(len(small), len(large))
+        with CaptureQueriesContext(connection) as leave_all:
+            self._post(leave=[event.id for event in few + many])
+        self.assertLess(len(leave_all), 25)
+        self.assertFalse(self.player.attending.exists())
+
+    def test_rejects_malformed_requests(self):
+        """Test that bad payloads, overlaps and oversized batches are refused before any work."""
+        event = self._event()
+        self.assertEqual(self.client.post(self.url, 'join=1', content_type='text/plain').status_code, 400)
+        self.assertEqual(self._post(join=["1"]).status_code, 400)
+        self.assertEqual(self._post().status_code, 400)
+        self.assertEqual(self._post(join=[event.id], leave=[event.id]).status_code, 400)
+        with override_settings(ATTENDANCE_BATCH_MAX=2):
+            self.assertEqual(self._post(join=[1, 2, 3]).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self._post(join=[event.id]).status_code, 302)
+
+class LiveEventsTests(TestCase):
+    """
+    Tests for per-event time zones, the stored UTC start, and the live listings.
+    """
+
+    def setUp(self):
+        self.host = User.objects.create_user(username='host', password='password123')
+        self.now = timezone.make_aware(datetime(2030, 5, 1, 12, 0))
+
+    def _event(self, title, start, hours=2, **kwargs):
+        fields = {
+            'title': title, 'description': "Open run.", 'host': self.host, 'date': start.date(),
+            'start': start.time(), 'end': (start + timedelta(hours=hours)).time(), 'category': 'running',
+        }
+        fields.update(kwargs)
+        return Events.objects.create(**fields)
+
+    def test_local_times_are_stored_in_utc(self):
+        """Test that starts_at and timestamp follow the event's zone, DST included."""
+        summer = self._event("Summer Run", datetime(2030, 7, 1, 18, 0), time_zone='America/New_York')
+        winter = self._event("Winter Run", datetime(2030, 1, 7, 18, 0), time_zone='America/New_York')
+        site = self._event("Site Run", datetime(2030, 1, 7, 18, 0))
+        utc = timezone.make_aware
+        self.assertEqual(summer.starts_at, utc(datetime(2030, 7, 1, 22, 0)))
+        self.assertEqual(summer.timestamp, utc(datetime(2030, 7, 2, 0, 0)))
+        self.assertEqual(winter.starts_at, utc(datetime(2030, 1, 7, 23, 0)))
+        self.assertEqual(site.starts_at, utc(datetime(2030, 1, 7, 18, 0)))
+
+        summer.attendees.add(self.host)
+        entry = AgendaEntry.objects.get(event=summer)
+        self.assertEqual((entry.starts_at, entry.ends_at), (summer.starts_at, summer.timestamp))
+
+    def test_series_occurrences_follow_zone_across_dst(self):
+        """Test that materialized and re-synced occurrences get each date's own UTC offset."""
+        series = EventSeries.objects.create(
+            host=self.host, title="Sunday Long Run", description="Easy pace.", start=time(10, 0),
+            end=time(12, 0), category='running', frequency='weekly', time_zone='Europe/London',
+            starts_on=date(2030, 3, 24), until=date(2030, 3, 31),
+        )
+        materialize(horizon_days=30, today=date(2030, 3, 20))
+        starts = list(series.occurrences.order_by('date').values_list('starts_at', flat=True))
+        # British Summer Time begins on 31 March 2030
+        self.assertEqual(starts, [
+            timezone.make_aware(datetime(2030, 3, 24, 10, 0)), timezone.make_aware(datetime(2030, 3, 31, 9, 0)),
+        ])
+
+        series.start, series.end = time(11, 0), time(13, 0)
+        series.save()
+        sync_future_occurrences(series)
+        spans = list(series.occurrences.order_by('date').values_list('starts_at', 'timestamp'))
+        self.assertEqual(spans, [
+            (timezone.make_aware(datetime(2030, 3, 24, 11, 0)), timezone.make_aware(datetime(2030, 3, 24, 13, 0))),
+            (timezone.make_aware(datetime(2030, 3, 31, 10, 0)), timezone.make_aware(datetime(2030, 3, 31, 12, 0))),
+        ])
+
+    def test_live_and_starting_soon_listings(self):
+        """Test that the listings pick running and imminent events and skip cancelled or finished ones."""
+        now = timezone.localtime(self.now).replace(tzinfo=None)
+        self._event("Running Now", now - timedelta(hours=1))
+        self._event("Cancelled Now", now - timedelta(hours=1), is_cancelled=True)
+        self._event("Finished", now - timedelta(hours=3))
+        self._event("Soon", now + timedelta(minutes=30))
+        self._event("Later", now + timedelta(hours=3))
+        self._event("Later Elsewhere", now + timedelta(hours=6), time_zone='Asia/Tokyo')
+
+        live = Events.objects.live(self.now)
+        soon = Events.objects.starting_soon(self.now)
+        self.assertEqual([event.title for event in live], ["Running Now"])
+        self.assertEqual([event.title for event in soon], ["Soon"])
+        # 18:00 in Tokyo is 09:00 UTC, before this noon
+        self.assertFalse(Events.objects.starting_soon(self.now, within=timedelta(hours=24)).filter(
+            title="Later Elsewhere"
+        ).exists())
+
+        with unittest.mock.patch('django.utils.timezone.now', return_value=self.now):
+            response = self.client.get(reverse('live_events'), {'hours': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event.title for event in response.context['live']], ["Running Now"])
+        self.assertEqual([event.title for event in response.context['starting_soon']], ["Soon", "Later"])
+        self.assertNotContains(response, "Cancelled Now")
+
+    def test_listings_are_index_range_scans(self):
+        """Test that both listings read events_listed_start_idx in order, without a sort or table scan."""
+        for qs in (Events.objects.live(self.now), Events.objects.starting_soon(self.now)):
+            plan = qs.explain()
+            self.assertIn('USING INDEX events_listed_start_idx', plan)
+            self.assertNotIn('SCAN', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_form_rejects_unknown_time_zone(self):
+        """Test that the event form only accepts known IANA zones."""
+        data = {
+            'title': "Zone Run", 'description': "Open run.", 'date': (date.today() + timedelta(days=7)).isoformat(),
+            'start': '18:00', 'end': '20:00', 'category': 'running', 'skill_level': 'all', 'max_attendees': 10,
+        }
+        self.assertIn('time_zone', EventForm({**data, 'time_zone': 'Mars/Olympus_Mons'}).errors)
+        self.assertTrue(EventForm({**data, 'time_zone': 'Europe/Paris'}).is_valid())
+        self.assertTrue(EventForm({**data, 'time_zone': ''}).is_valid())
+
+def _bump_counter(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('hits')
+    cache.set('child', os.getpid())
+
+
+class SharedCacheTests(TestCase):
+    """
+    Tests for the SQLite cache shared between worker processes and the page
+    summaries cached in it.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.caches = {'default': {'BACKEND': 'sports.sharedcache.SQLiteCache', 'LOCATION': self.path}}
+
+    def test_cache_api(self):
+        """Test get/set/add/incr/touch/delete with expiry, as Django's cache API defines them."""
+        cache = SQLiteCache(self.path, {})
+        cache.set('summary', {'title': "Pickup Game"})
+        self.assertEqual(cache.get('summary'), {'title': "Pickup Game"})
+        self.assertFalse(cache.add('summary', 'other'))
+        self.assertTrue(cache.add('fresh', 'value'))
+        cache.set('count', 1)
+        self.assertEqual(cache.incr('count', 4), 5)
+        self.assertEqual(cache.get_many(['count', 'fresh', 'missing']), {'count': 5, 'fresh': 'value'})
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+        cache.set('brief', 'gone', timeout=0)
+        self.assertIsNone(cache.get('brief'))
+        self.assertTrue(cache.add('brief', 'back'))  # an expired entry counts as missing
+        self.assertTrue(cache.touch('brief', timeout=None))
+        self.assertTrue(cache.delete('brief'))
+        self.assertFalse(cache.has_key('brief'))
+        self.assertEqual(cache.get_or_set('built', lambda: [1, 2]), [1, 2])
+        cache.clear()
+        self.assertIsNone(cache.get('summary'))
+
+    def test_evicts_least_recently_used(self):
+        """Test that a write past MAX_ENTRIES drops the entries read least recently."""
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2}})
+        clock = itertools.count(timezone.now().timestamp(), 10)
+        with unittest.mock.patch('sports.sharedcache.time.time', side_effect=lambda: next(clock)):
+            for key in 'abcd':
+                cache.set(key, key)
+            self.assertEqual(cache.get('a'), 'a')  # refreshes a's access time
+            cache.set('e', 'e')
+        # Five entries against a limit of four: down to four minus a half
+        self.assertEqual(cache.get_many('abcde'), {'a': 'a', 'e': 'e'})
+
+    def test_shared_between_processes(self):
+        """Test that workers in other processes see one store and increment it atomically."""
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork")
+        cache = SQLiteCache(self.path, {})
+        cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=_bump_counter, args=(self.path, 50)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for _ in range(50):
+            cache.incr('hits')
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(cache.get('hits'), 200)
+        self.assertIn(cache.get('child'), [worker.pid for worker in workers])
+
+    def test_pages_are_served_from_the_cache_until_their_data_changes(self):
+        """Test that repeat views skip the summary queries and a join shows up at once."""
+        host = User.objects.create_user(username='host', password='password123')
+        User.objects.create_user(username='player', password='password123')
+        start = (timezone.now() + timedelta(days=3)).replace(hour=10, minute=0, second=0, microsecond=0)
+        event = Events.objects.create(
+            title="Pickup Game", description="Bring water.", host=host, date=start.date(),
+            start=start.time(), end=time(12, 0), category='soccer', max_attendees=10,
+        )
+        event.attendees.add(host)
+        url = reverse('event_detail', args=[event.id])
+
+        with override_settings(CACHES=self.caches):
+            for path in (url, reverse('index')):
+                with CaptureQueriesContext(connection) as cold:
+                    self.assertEqual(self.client.get(path).status_code, 200)
+                with CaptureQueriesContext(connection) as warm:
+                    self.assertContains(self.client.get(path), "Pickup Game")
+                self.assertLess(len(warm), len(cold), path)
+
+            self.client.login(username='player', password='password123')
+            self.client.post(reverse('toggle_attendance', args=[event.id]))
+            self.assertContains(self.client.get(url), "2/10")
+
+    def test_cached_pages_hold_no_account_data(self):
+        """Test that page entries carry only rendered fields and need no queries to render."""
+        host = User.objects.create_user(username='host', password='password123', email='host@example.com')
+        start = timezone.now() + timedelta(days=3)
+        event = Events.objects.create(
+            title="Pickup Game", description="Bring water.", host=host, date=start.date(),
+            start=start.time(), end=(start + timedelta(hours=2)).time(), category='soccer', max_attendees=10,
+        )
+        event.attendees.add(host)
+        EventComment.objects.create(event=event, author=host, content="See you there")
+
+        with override_settings(CACHES=self.caches):
+            for path in (reverse('event_detail', args=[event.id]), reverse('index')):
+                self.client.get(path)
+                # Only the version query: no deferred field is loaded on render
+                with CaptureQueriesContext(connection) as warm:
+                    self.assertContains(self.client.get(path), "Pickup Game")
+                self.assertEqual(len(warm), 1, path)
+
+        with sqlite3.connect(self.path) as db:
+            values = [value for value, in db.execute('SELECT value FROM cache_entries')]
+        self.assertTrue(values)
+        for value in values:
+            self.assertNotIn(host.password.encode(), value)
+            self.assertNotIn(b'host@example.com', value)
+
+    def test_cache_file_is_private(self):
+        """Test that the file is created owner-only and files others can write are refused."""
+        SQLiteCache(self.path, {}).set('key', 'value')
+        for name in (self.path, self.path + '-wal', self.path + '-shm'):
+            self.assertEqual(os.stat(name).st_mode & 0o777, 0o600, name)
+
+        shared = self.path + '.shared'
+        open(shared, 'w').close()
+        os.chmod(shared, 0o666)
+        with self.assertRaises(ImproperlyConfigured):
+            SQLiteCache(shared, {}).get('key')
+        if os.getuid() == 0:
+            other = self.path + '.other'
+            open(other, 'w').close()
+            os.chown(other, 1, 1)
+            with self.assertRaises(ImproperlyConfigured):
+                SQLiteCache(other, {}).get('key')
+
+class StartupTests(TestCase):
+    """
+    Tests for cold-start import costs and the startup_profile command.
+    """
+
+    def test_django_templates_do_not_load_jinja2_engine(self):
+        """Test that pages rendered by the Django engine leave the Jinja2 backend unbuilt."""
+        from django.template import engines
+        # Changing TEMPLATES resets the engine cache
+        with override_settings(TEMPLATES=settings.TEMPLATES, JINJA2_TEMPLATES=[]):
+            self.assertEqual(self.client.get(reverse('index')).status_code, 200)
+            self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+            self.assertNotIn('jinja2', engines._engines)
+
+    def test_startup_profile_reports_phases(self):
+        """Test that the command measures a cold worker in a fresh interpreter."""
+        output = io.StringIO()
+        call_command('startup_profile', path='/login/', runs=1, top=3, stdout=output)
+        report = output.getvalue()
+        self.assertIn('GET /login/ (HTTP 200 OK)', report)
+        for phase in ('settings', 'setup', 'first request', 'warm request', 'total'):
+            self.assertIn(phase, report)
+        self.assertIn('django.core.wsgi', report)
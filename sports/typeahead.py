@@ -0,0 +1,327 @@
+"""
+Typeahead suggestions for the index search box.
+
+Suggestions come from an in-memory prefix index: one sorted array of
+"token, kind, label" keys searched with bisect, so a lookup costs
+O(log n + limit) however many events exist. The index covers upcoming event
+titles, sport categories and the usernames of hosts with upcoming events.
+
+Each worker builds its index at startup (capstone/startup.py), or else in a
+background thread on first use, and answers from a database prefix query
+until the index is ready. Model save and delete signals keep it current.
+Set-based UPDATEs bypass signals, so the index is also rebuilt every
+TYPEAHEAD_REBUILD_SECONDS, which additionally drops events that have ended.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .facets import upcoming_events
+from .models import SPORTS, User
+
+TOKEN_RE = re.compile(r'\w+')
+SEP = '\x1f'  # sorts before any printable character
+
+# Keys examined per lookup at most, which bounds multi-word queries
+MAX_SCAN = 2000
+
+CATEGORY_VALUES = {label: value for value, label in SPORTS}
+
+
+def normalize(text):
+    """Lowercase and strip accents so "Fútbol" matches "fut"."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+class PrefixIndex:
+    """
+    Sorted array of "token<SEP>kind<SEP>label" keys.
+
+    Keys are reference counted so several events with the same title share
+    one entry, and an entry disappears when its last event does.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _entry_keys(kind, label):
+        return {SEP.join((token, kind, label)) for token in tokenize(label)}
+
+    def load(self, entries):
+        """Bulk load (kind, label) pairs, replacing the current contents."""
+        refs = {}
+        for kind, label in entries:
+            for key in self._entry_keys(kind, label):
+                refs[key] = refs.get(key, 0) + 1
+        keys = sorted(refs)
+        with self._lock:
+            self._keys, self._refs = keys, refs
+
+    def add(self, kind, label):
+        with self._lock:
+            for key in self._entry_keys(kind, label):
+                count = self._refs.get(key, 0)
+                if not count:
+                    bisect.insort(self._keys, key)
+                self._refs[key] = count + 1
+
+    def discard(self, kind, label):
+        with self._lock:
+            for key in self._entry_keys(kind, label):
+                count = self._refs.get(key, 0)
+                if count > 1:
+                    self._refs[key] = count - 1
+                elif count:
+                    del self._refs[key]
+                    position = bisect.bisect_left(self._keys, key)
+                    del self._keys[position]
+
+    def search(self, query, limit=8):
+        """
+        Return up to `limit` distinct (kind, label) pairs whose words start
+        with every word of the query.
+
+        The scan is anchored on the longest query word, the most selective
+        one, and the remaining words are checked against each candidate.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        anchor = max(reversed(words), key=len)
+        others = list(words)
+        others.remove(anchor)
+
+        keys = self._keys
+        results, seen = [], set()
+        start = bisect.bisect_left(keys, anchor)
+        for key in keys[start:start + MAX_SCAN]:
+            if not key.startswith(anchor):
+                break
+            _, kind, label = key.split(SEP)
+            if (kind, label) in seen:
+                continue
+            if others:
+                # " word" marks the start of a word in the space-joined tokens
+                haystack = ' ' + ' '.join(tokenize(label))
+                if not all(' ' + word in haystack for word in others):
+                    continue
+            seen.add((kind, label))
+            results.append((kind, label))
+            if len(results) >= limit:
+                break
+        return results
+
+
+class Typeahead:
+    """
+    Process-wide suggestion index kept in step with Events and User rows.
+
+    Signal-driven changes and rebuilds are serialized by a lock. Changes
+    that arrive while a rebuild reads the database are also logged and
+    replayed onto the new index once it is swapped in, so none are lost to
+    a snapshot taken just before them.
+    """
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        self._events = {}     # event id -> (title, host id) for indexed events
+        self._usernames = {}  # host id -> username
+        self._built_at = None
+        self._building = threading.Lock()  # one rebuild at a time
+        self._lock = threading.Lock()      # guards the index and the change log
+        self._pending = None  # changes seen during a rebuild, else None
+
+    @property
+    def is_ready(self):
+        return self._built_at is not None
+
+    def clear(self):
+        """Drop the index; the next search starts a fresh build."""
+        with self._lock:
+            self.index = PrefixIndex()
+            self._events, self._usernames, self._built_at = {}, {}, None
+
+    def load(self, event_rows, usernames):
+        """Build from (id, title, host_id) rows and a {host_id: username} map."""
+        with self._lock:
+            self._load(event_rows, usernames)
+
+    def _load(self, event_rows, usernames):
+        events = {pk: (title, host_id) for pk, title, host_id in event_rows}
+        entries = [('category', label) for _, label in SPORTS]
+        for title, host_id in events.values():
+            entries.append(('event', title))
+            entries.append(('host', usernames[host_id]))
+
+        index = PrefixIndex()
+        index.load(entries)
+        self.index, self._events, self._usernames = index, events, dict(usernames)
+        self._built_at = time.monotonic()
+
+    def rebuild(self):
+        """Load every upcoming event from the database."""
+        with self._building:
+            self._rebuild()
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            rows, usernames = self._read_rows()
+            with self._lock:
+                self._load(rows, usernames)
+                for change in self._pending:
+                    self._apply(change)
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _read_rows(self):
+        rows = list(upcoming_events({}).order_by().values_list('pk', 'title', 'host_id'))
+        usernames = dict(User.objects.filter(
+            pk__in={host_id for _, _, host_id in rows}
+        ).values_list('pk', 'username'))
+        return rows, usernames
+
+    def ensure_fresh(self):
+        """Start a background rebuild when the index is missing or stale."""
+        if not settings.TYPEAHEAD_INDEX:
+            return
+        stale = (
+            self._built_at is None or
+            time.monotonic() - self._built_at > settings.TYPEAHEAD_REBUILD_SECONDS
+        )
+        if stale and self._building.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self._rebuild()
+        finally:
+            connection.close()
+            self._building.release()
+
+    def search(self, query, limit=8):
+        """Suggestions from the index, or from the database until it is built."""
+        self.ensure_fresh()
+        if self.is_ready:
+            pairs = self.index.search(query, limit)
+        else:
+            pairs = search_database(query, limit)
+        return [suggestion(kind, label) for kind, label in pairs]
+
+    @property
+    def _tracking(self):
+        # Changes matter once there is an index or one is being built
+        return self.is_ready or self._pending is not None
+
+    def event_changed(self, event):
+        if not self._tracking:
+            return
+        username = None
+        if not (event.is_cancelled or event.is_archived) and event.timestamp >= timezone.now():
+            username = self._usernames.get(event.host_id)
+            if username is None:
+                username = User.objects.values_list('username', flat=True).get(pk=event.host_id)
+        self._record(('event', event.pk, event.title, event.host_id, username))
+
+    def event_deleted(self, event):
+        if self._tracking:
+            self._record(('event', event.pk, None, None, None))
+
+    def user_changed(self, user):
+        if self._tracking:
+            self._record(('user', user.pk, user.username))
+
+    def _record(self, change):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self.is_ready:
+                self._apply(change)
+
+    def _apply(self, change):
+        # Changes are idempotent, so replaying one the rebuild already saw is harmless
+        if change[0] == 'event':
+            _, event_id, title, host_id, username = change
+            self._forget_event(event_id)
+            if username is not None:  # still listed
+                self._usernames[host_id] = username
+                self._events[event_id] = (title, host_id)
+                self.index.add('event', title)
+                self.index.add('host', username)
+        else:
+            _, user_id, username = change
+            old = self._usernames.get(user_id)
+            if old is None or old == username:
+                return
+            hosted = sum(1 for _, host_id in self._events.values() if host_id == user_id)
+            for _ in range(hosted):
+                self.index.discard('host', old)
+                self.index.add('host', username)
+            self._usernames[user_id] = username
+
+    def _forget_event(self, event_id):
+        previous = self._events.pop(event_id, None)
+        if previous:
+            title, host_id = previous
+            self.index.discard('event', title)
+            self.index.discard('host', self._usernames[host_id])
+
+
+def suggestion(kind, label):
+    if kind == 'host':
+        url = reverse('user_profile', args=[label])
+    elif kind == 'category':
+        url = reverse('index') + '?' + urlencode({'category': CATEGORY_VALUES[label]})
+    else:
+        url = reverse('index') + '?' + urlencode({'search': label})
+    return {'kind': kind, 'label': label, 'url': url}
+
+
+def search_database(query, limit=8):
+    """Prefix search straight from the database, used while the index builds."""
+    query = query.strip()
+    if not query:
+        return []
+    needle = normalize(query)
+    pairs = [
+        ('category', label) for _, label in SPORTS
+        if any(token.startswith(needle) for token in tokenize(label))
+    ]
+    upcoming = upcoming_events({})
+    hosts = User.objects.filter(
+        username__istartswith=query,
+        events_hosted__in=upcoming
+    ).order_by('username').values_list('username', flat=True).distinct()[:limit]
+    titles = upcoming.filter(
+        Q(title__istartswith=query) | Q(title__icontains=' ' + query)
+    ).order_by('title').values_list('title', flat=True).distinct()[:limit]
+    pairs += [('host', username) for username in hosts]
+    pairs += [('event', title) for title in titles]
+    return pairs[:limit]
+
+
+typeahead = Typeahead()
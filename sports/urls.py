@@ -5,6 +5,8 @@ urlpatterns = [
     # Main pages
     path("", views.index, name="index"),
     path("events/past/", views.past_events, name="past_events"),
+    path("events/live/", views.live_events, name="live_events"),
+    path("events/typeahead/", views.typeahead, name="typeahead"),
     path("events/<int:event_id>/", views.event_detail, name="event_detail"),
     
     # Event management
@@ -12,7 +14,11 @@ urlpatterns = [
     path("events/<int:event_id>/edit/", views.edit_event, name="edit_event"),
     path("events/<int:event_id>/cancel/", views.cancel_event, name="cancel_event"),
     path("events/<int:event_id>/toggle-attendance/", views.toggle_attendance, name="toggle_attendance"),
+    path("events/attendance/", views.batch_attendance, name="batch_attendance"),
+    path("events/<int:event_id>/waitlist/", views.toggle_waitlist, name="toggle_waitlist"),
     path("events/<int:event_id>/comment/", views.add_comment, name="add_comment"),
+    path("events/export/", views.export_events, name="export_events"),
+    path("dashboard/", views.analytics_dashboard, name="analytics_dashboard"),
     
     # User management
     path("profile/", views.user_profile, name="profile"),
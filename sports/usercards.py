@@ -0,0 +1,119 @@
+"""
+Compact "mini cards" for rendering a user's avatar and profile link.
+
+Attendee lists, comments and their AJAX responses only need a user's id,
+username, avatar URL and profile URL. Cards hold just those, built once and
+kept in a bounded per-process LRU with a TTL. Views warm the cache for a
+whole page with one `IN` query, and templates read it with the `user_card`
+tag. Saving a user drops their card in this process (see signals.py). Other
+processes pick the change up when the TTL expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+
+from .models import User
+
+
+def avatar_url(user):
+    """Return a user's profile picture URL or the default avatar."""
+    if user.profile_picture:
+        return user.profile_picture.url
+    return static('sports/images/default_avatar.png')
+
+
+class UserCard:
+    __slots__ = ('id', 'username', 'avatar_url', 'profile_url')
+
+    def __init__(self, id, username, avatar_url, profile_url):
+        self.id = id
+        self.username = username
+        self.avatar_url = avatar_url
+        self.profile_url = profile_url
+
+    def __repr__(self):
+        return f"<UserCard {self.id} {self.username}>"
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.pk, user.username, avatar_url(user), reverse('user_profile', args=[user.username]))
+
+
+class UserCardCache:
+    """Thread-safe LRU of UserCard objects with a time-to-live."""
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()  # user id -> (card, expires at)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize if self._maxsize is not None else settings.USER_CARD_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.USER_CARD_TTL_SECONDS
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        """Return one card, loading it on a miss, or None for an unknown user."""
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids):
+        """Return {user id: card}, loading every miss with one query."""
+        cards, missing = {}, set()
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry and entry[1] > now:
+                    self._entries.move_to_end(user_id)
+                    cards[user_id] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.add(user_id)
+            self.misses += len(missing)
+        if missing:
+            users = User.objects.filter(pk__in=missing).only('id', 'username', 'profile_picture')
+            for user in users:
+                cards[user.pk] = self._store(UserCard.from_user(user))
+        return cards
+
+    def card_for(self, user):
+        """Return the card for a User already in memory, without a query."""
+        with self._lock:
+            entry = self._entries.get(user.pk)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(user.pk)
+                self.hits += 1
+                return entry[0]
+        return self._store(UserCard.from_user(user))
+
+    def _store(self, card):
+        with self._lock:
+            self._entries[card.id] = (card, time.monotonic() + self.ttl)
+            self._entries.move_to_end(card.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return card
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+user_cards = UserCardCache()
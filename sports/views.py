@@ -1,93 +1,155 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponseRedirect, HttpResponseBadRequest, StreamingHttpResponse
 from django.urls import reverse
 from django.db import IntegrityError, transaction
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Max
 from django.core.paginator import Paginator
 from django.utils import timezone
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, require_safe
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from django.conf import settings
-from datetime import datetime
+from datetime import timedelta
+import json
 
-from .models import User, Events, EventComment
+from .models import User, Events, EventComment, EventSeries, WaitlistEntry, CategoryWeekStats, RollupProgress, SPORTS
+from .db import retry_on_locked
+from .ratelimit import rate_limit, shed_load
+from .conditional import conditional_page, page_version
+from .notifications import enqueue_event_changes
+from .facets import date_buckets, facet_counts, upcoming_events
+from .typeahead import typeahead as typeahead_index
+from .usercards import user_cards
+from .summaries import event_page, index_page
+from . import agenda, rollups
+from .recurrence import SERIES_FIELDS, materialize, sync_future_occurrences
+from .export import EXPORT_FORMATS, export_events as export_event_blocks
 from .forms import (
     EventForm, UserProfileForm, CustomUserCreationForm,
     EventFilterForm, CommentForm
 )
 
-def _get_profile_picture_url(user):
+def _render(request, template_name, context=None):
+    """Render with the engine selected for this template in JINJA2_TEMPLATES."""
+    # Naming the engine keeps render() from instantiating every configured
+    # backend, so Jinja2 is only imported once a template is routed to it
+    using = 'jinja2' if template_name in settings.JINJA2_TEMPLATES else 'django'
+    return render(request, template_name, context, using=using)
+
+
+def _filter_upcoming_events(filter_form):
+    """Return the upcoming events matching the index filter form."""
+    return upcoming_events(_active_filters(filter_form))
+
+
+def _active_filters(filter_form):
+    return filter_form.cleaned_data if filter_form.is_valid() else {}
+
+
+def _date_facet_links(request, date_counts):
+    """Date facets as links that keep the other filters and reset the page."""
+    links = []
+    for key, label, first, last in date_buckets(timezone.localdate()):
+        query = request.GET.copy()
+        query.pop('page', None)
+        query['date_from'] = first.isoformat()
+        if last:
+            query['date_to'] = last.isoformat()
+        else:
+            query.pop('date_to', None)
+        links.append({'label': label, 'count': date_counts.get(key, 0), 'url': '?' + query.urlencode()})
+    return links
+
+
+def _index_validators(request):
     """
-    Helper function to get a user's profile picture URL or the default.
+    Version the listing by the newest change and size of all upcoming
+    events, since the facet counts depend on events outside the filter.
     """
-    if user.profile_picture:
-        return user.profile_picture.url
-    return settings.STATIC_URL + 'sports/images/default_avatar.png'
+    page = upcoming_events({}).aggregate(
+        last_updated=Max('updated_at'),
+        count=Count('id'),
+    )
+    version = (request.GET.urlencode(), page['last_updated'], page['count'])
+    return version, page['last_updated']
 
 
+@require_safe
+def typeahead(request):
+    """Suggest event titles, sports and hosts for the search box."""
+    query = request.GET.get('q', '')[:100]
+    response = JsonResponse({'results': typeahead_index.search(query)})
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+@conditional_page(_index_validators)
 def index(request):
     """Display the homepage with upcoming events."""
     # Get filter form
     filter_form = EventFilterForm(request.GET)
     
     # Base queryset for upcoming events
-    now = timezone.now()
-    events = Events.objects.filter( 
-        timestamp__gte=now,
-        is_cancelled=False
-    ).select_related('host').prefetch_related('attendees')
-    
-    # Apply filters if form is valid
-    if filter_form.is_valid():
-        if filter_form.cleaned_data['category']:
-            events = events.filter(category=filter_form.cleaned_data['category'])
-        if filter_form.cleaned_data['skill_level']:
-            events = events.filter(skill_level=filter_form.cleaned_data['skill_level'])
-        if filter_form.cleaned_data['date_from']:
-            events = events.filter(date__gte=filter_form.cleaned_data['date_from'])
-        if filter_form.cleaned_data['date_to']:
-            events = events.filter(date__lte=filter_form.cleaned_data['date_to'])
-        if filter_form.cleaned_data['search']:
-            search_term = filter_form.cleaned_data['search']
-            events = events.filter(
-                Q(title__icontains=search_term) | 
-                Q(description__icontains=search_term)
-            )
+    events = _filter_upcoming_events(filter_form)
     
-    # Pagination
-    paginator = Paginator(events, 9)  # Show 9 events per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination, shared with other workers through the cache
+    page_obj = index_page(events, request.GET.get('page'), page_version(request))
+
+    counts = facet_counts(_active_filters(filter_form))
+    filter_form.show_counts(counts)
     
     context = {
         'page_obj': page_obj,
         'filter_form': filter_form,
-        'total_events': paginator.count,
+        'total_events': page_obj.paginator.count,
+        'date_facets': _date_facet_links(request, counts['date']),
     }
     
-    return render(request, "sports/index.html", context)
+    return _render(request, "sports/index.html", context)
 
+def _event_detail_validators(request, event_id):
+    """
+    Version an event page by the event row, which join/leave also touches,
+    and by its newest comment, all in one aggregate query.
+    """
+    event = Events.objects.filter(pk=event_id).aggregate(
+        last_updated=Max('updated_at'),
+        ends_at=Max('timestamp'),
+        last_comment=Max('comments__updated_at'),
+        comments=Count('comments'),
+    )
+    if event['last_updated'] is None:
+        return None
+    is_past = event['ends_at'] < timezone.now()
+    version = (event_id, event['last_updated'], event['last_comment'], event['comments'], is_past)
+    return version, max(filter(None, [event['last_updated'], event['last_comment']]))
+
+
+@conditional_page(_event_detail_validators)
 def event_detail(request, event_id):
     """Display detailed view of a single event."""
-    event = get_object_or_404(
-        Events.objects.select_related('host').prefetch_related(
-            'attendees',
-            'comments__author'
-        ), 
-        pk=event_id
-    )
+    event = event_page(event_id, page_version(request))
     comments = event.comments.all()
     comment_form = CommentForm()
+    # Warm the cards the template shows with one query
+    user_cards.get_many(
+        [attendee.pk for attendee in event.attendees.all()[:10]] +
+        [comment.author_id for comment in comments]
+    )
     
     is_attending = False
     can_join = False
+    waitlist_entry = None
+    waitlist_count = event.waitlist.count() if event.is_full else 0
     
     if request.user.is_authenticated:
         is_attending = request.user in event.attendees.all()
         can_join = event.can_join(request.user)
+        if waitlist_count:
+            waitlist_entry = event.waitlist.filter(user=request.user).first()
     
     context = {
         'event': event,
@@ -95,11 +157,15 @@ def event_detail(request, event_id):
         'comment_form': comment_form,
         'is_attending': is_attending,
         'can_join': can_join,
+        'waitlist_count': waitlist_count,
+        'waitlist_position': waitlist_entry.position if waitlist_entry else None,
     }
     
-    return render(request, "sports/event_detail.html", context)
+    return _render(request, "sports/event_detail.html", context)
 
 @login_required
+@rate_limit('create_event')
+@shed_load
 def create_event(request):
     """Create a new event."""
     if request.method == "POST":
@@ -109,17 +175,26 @@ def create_event(request):
             # Create event but don't save yet
             event = form.save(commit=False)
             event.host = request.user
-            
-            # Set timestamp for event end
             event_date = form.cleaned_data['date']
-            end_time = form.cleaned_data['end']
-            event_end = datetime.combine(event_date, end_time)
-            event.timestamp = timezone.make_aware(event_end)
             
-            event.save()
-            
-            # Add host as first attendee
-            event.attendees.add(request.user)
+            with transaction.atomic():
+                if form.cleaned_data.get('repeat'):
+                    event.series = EventSeries.objects.create(
+                        host=request.user,
+                        frequency=form.cleaned_data['repeat'],
+                        starts_on=event_date,
+                        until=form.cleaned_data['repeat_until'],
+                        materialized_until=event_date,
+                        **{field: getattr(event, field) for field in SERIES_FIELDS}
+                    )
+                event.save()
+                
+                # Add host as first attendee
+                event.attendees.add(request.user)
+
+            if event.series_id:
+                # Later occurrences up to the horizon; the scheduled job keeps it rolling
+                materialize(series_ids=[event.series_id])
             
             messages.success(request, "Event created successfully!")
             return redirect('event_detail', event_id=event.id)
@@ -128,7 +203,7 @@ def create_event(request):
     else:
         form = EventForm()
     
-    return render(request, "sports/create_event.html", {'form': form})
+    return _render(request, "sports/create_event.html", {'form': form})
 
 @login_required
 def edit_event(request, event_id):
@@ -154,13 +229,18 @@ def edit_event(request, event_id):
         form = EventForm(request.POST, request.FILES, instance=event)
         
         if form.is_valid():
-            # Update timestamp
-            event_date = form.cleaned_data['date']
-            end_time = form.cleaned_data['end']
-            event_end = datetime.combine(event_date, end_time)
-            event.timestamp = timezone.make_aware(event_end)
-            
-            form.save()
+            with transaction.atomic():
+                form.save()
+                # A raised max_attendees opens spots for the waitlist
+                Events.objects.select_for_update().get(pk=event.id).fill_from_waitlist()
+                enqueue_event_changes([event.id], updated=True, actor=request.user)
+                if form.cleaned_data.get('apply_to_series'):
+                    series = event.series
+                    for field in SERIES_FIELDS:
+                        setattr(series, field, getattr(event, field))
+                    # Leave materialized_until to the scheduled job
+                    series.save(update_fields=SERIES_FIELDS + ['updated_at'])
+                    sync_future_occurrences(series, since=event.date, actor=request.user)
             messages.success(request, "Event updated successfully!")
             return redirect('event_detail', event_id=event.id)
         else:
@@ -168,13 +248,16 @@ def edit_event(request, event_id):
     else:
         form = EventForm(instance=event)
     
-    return render(request, "sports/edit_event.html", {
+    return _render(request, "sports/edit_event.html", {
         'form': form,
         'event': event
     })
 
 @login_required
 @require_http_methods(["POST"])
+@rate_limit('attendance')
+@shed_load
+@retry_on_locked
 def toggle_attendance(request, event_id):
     """Toggle user's attendance for an event atomically."""
     event = get_object_or_404(Events, pk=event_id)
@@ -204,6 +287,7 @@ def toggle_attendance(request, event_id):
 
         if user in event_locked.attendees.all():
             event_locked.attendees.remove(user)
+            event_locked.fill_from_waitlist()
             message = "You've left the event"
             button_text = "Join Event"
             attending = False
@@ -212,23 +296,29 @@ def toggle_attendance(request, event_id):
                 return JsonResponse({
                     'success': False,
                     'message': 'Event is full',
+                    'waitlist_url': reverse('toggle_waitlist', args=[event_id]),
                 }, status=400)
             event_locked.attendees.add(user)
+            WaitlistEntry.objects.filter(event=event_locked, user=user).delete()
             message = "You've joined the event"
             button_text = "Leave Event"
             attending = True
+
+        # Attendance is part of the event page, so bump its version
+        Events.objects.filter(pk=event_id).update(updated_at=timezone.now())
     
     # Refresh event to get updated data
     event.refresh_from_db()
     
     # Prepare attendee list for the response
-    attendees = event.attendees.all()[:10]
+    attendee_ids = list(event.attendees.values_list('pk', flat=True)[:10])
+    cards = user_cards.get_many(attendee_ids)
     attendees_list = [{
-        'username': attendee.username,
-        'profile_url': reverse('user_profile', args=[attendee.username]),
-        'profile_picture_url': _get_profile_picture_url(attendee),
-        'is_host': attendee == event.host
-    } for attendee in attendees]
+        'username': cards[attendee_id].username,
+        'profile_url': cards[attendee_id].profile_url,
+        'profile_picture_url': cards[attendee_id].avatar_url,
+        'is_host': attendee_id == event.host_id
+    } for attendee_id in attendee_ids]
 
     return JsonResponse({
         'success': True,
@@ -241,8 +331,192 @@ def toggle_attendance(request, event_id):
         'attendees_list': attendees_list,
     })
 
+BATCH_MESSAGES = {
+    'joined': "You've joined the event",
+    'left': "You've left the event",
+    'already_attending': "You're already attending this event.",
+    'not_attending': "You're not attending this event.",
+    'not_found': "Event not found.",
+    'host': "Host cannot join or leave their own event.",
+    'past': "You cannot join or leave a past event.",
+    'cancelled': "This event has been cancelled.",
+    'full': "Event is full",
+}
+
+def _batch_event_ids(value):
+    """Unique event ids from a JSON list, in order; raises ValueError on anything else."""
+    if not isinstance(value, list) or not all(type(item) is int for item in value):
+        raise ValueError
+    return list(dict.fromkeys(value))
+
+@login_required
+@require_http_methods(["POST"])
+@rate_limit('attendance_batch')
+@shed_load
+@retry_on_locked
+def batch_attendance(request):
+    """
+    Join and leave several events in one request.
+
+    Takes JSON {"join": [event ids], "leave": [event ids]} and answers with
+    one result per event. Events are checked with set-based queries and all
+    changes are applied in one transaction; events that fail a check are
+    reported and left alone.
+    """
+    try:
+        payload = json.loads(request.body)
+        join_ids = _batch_event_ids(payload.get('join', []))
+        leave_ids = _batch_event_ids(payload.get('leave', []))
+    except (ValueError, AttributeError):
+        return JsonResponse({
+            'success': False,
+            'message': 'Expected JSON with "join" and "leave" lists of event ids.'
+        }, status=400)
+    if not join_ids and not leave_ids:
+        return JsonResponse({'success': False, 'message': 'No events given.'}, status=400)
+    if set(join_ids) & set(leave_ids):
+        return JsonResponse({'success': False, 'message': 'An event cannot be both joined and left.'}, status=400)
+    if len(join_ids) + len(leave_ids) > settings.ATTENDANCE_BATCH_MAX:
+        return JsonResponse({
+            'success': False,
+            'message': f'At most {settings.ATTENDANCE_BATCH_MAX} events per request.'
+        }, status=400)
+
+    user = request.user
+    now = timezone.now()
+    intents = [(event_id, 'join') for event_id in join_ids] + [(event_id, 'leave') for event_id in leave_ids]
+    with transaction.atomic():
+        events = Events.objects.select_for_update().filter(pk__in=join_ids + leave_ids).with_attendee_count().only(
+            'host_id', 'timestamp', 'is_cancelled', 'max_attendees'
+        ).in_bulk()
+        attending = set(user.attending.filter(pk__in=list(events)).values_list('pk', flat=True))
+
+        outcomes, to_join, to_leave = {}, [], []
+        for event_id, intent in intents:
+            event = events.get(event_id)
+            if event is None:
+                outcomes[event_id] = 'not_found'
+            elif event.host_id == user.pk:
+                outcomes[event_id] = 'host'
+            elif event.timestamp < now:
+                outcomes[event_id] = 'past'
+            elif event.is_cancelled:
+                outcomes[event_id] = 'cancelled'
+            elif intent == 'join' and event_id in attending:
+                outcomes[event_id] = 'already_attending'
+            elif intent == 'leave' and event_id not in attending:
+                outcomes[event_id] = 'not_attending'
+            elif intent == 'join' and event.attendee_count >= event.max_attendees:
+                outcomes[event_id] = 'full'
+            elif intent == 'join':
+                outcomes[event_id] = 'joined'
+                event.attendee_count += 1
+                to_join.append(event_id)
+            else:
+                outcomes[event_id] = 'left'
+                event.attendee_count -= 1
+                to_leave.append(event_id)
+
+        # One through-table INSERT and one DELETE; the m2m signals keep
+        # agendas and rollups in step for the whole set
+        if to_join:
+            user.attending.add(*to_join)
+            WaitlistEntry.objects.filter(user=user, event_id__in=to_join).delete()
+        if to_leave:
+            user.attending.remove(*to_leave)
+            for event_id in WaitlistEntry.objects.filter(event_id__in=to_leave).values_list(
+                'event_id', flat=True
+            ).distinct():
+                events[event_id].attendee_count += len(events[event_id].fill_from_waitlist())
+        if to_join or to_leave:
+            # Attendance is part of the event page, so bump its version
+            Events.objects.filter(pk__in=to_join + to_leave).update(updated_at=now)
+
+    results = []
+    for event_id, intent in intents:
+        outcome = outcomes[event_id]
+        result = {
+            'event_id': event_id,
+            'intent': intent,
+            'success': outcome in ('joined', 'left'),
+            'status': outcome,
+            'message': BATCH_MESSAGES[outcome],
+        }
+        if event_id in events:
+            event = events[event_id]
+            result['attendees_count'] = event.attendee_count
+            result['spots_available'] = event.max_attendees - event.attendee_count
+        if outcome == 'full':
+            result['waitlist_url'] = reverse('toggle_waitlist', args=[event_id])
+        results.append(result)
+
+    return JsonResponse({
+        'success': True,
+        'joined': len(to_join),
+        'left': len(to_leave),
+        'results': results,
+    })
+
 @login_required
 @require_http_methods(["POST"])
+@rate_limit('attendance')
+@shed_load
+@retry_on_locked
+def toggle_waitlist(request, event_id):
+    """Join or leave the waitlist of a full event."""
+    event = get_object_or_404(Events, pk=event_id)
+    user = request.user
+
+    if user == event.host:
+        return JsonResponse({
+            'success': False,
+            'message': 'Host cannot join the waitlist for their own event.'
+        }, status=403)
+
+    if event.is_past or event.is_cancelled:
+        return JsonResponse({
+            'success': False,
+            'message': 'This event is no longer taking players.'
+        }, status=400)
+
+    with transaction.atomic():
+        event_locked = Events.objects.select_for_update().get(pk=event_id)
+
+        if event_locked.attendees.filter(pk=user.pk).exists():
+            return JsonResponse({
+                'success': False,
+                'message': "You're already attending this event."
+            }, status=400)
+
+        if WaitlistEntry.objects.filter(event=event_locked, user=user).delete()[0]:
+            entry = None
+            message = "You've left the waitlist"
+            button_text = "Join Waitlist"
+        elif not event_locked.is_full:
+            return JsonResponse({
+                'success': False,
+                'message': 'Spots are available, join the event instead.'
+            }, status=400)
+        else:
+            entry = WaitlistEntry.objects.create(event=event_locked, user=user)
+            message = f"You're #{entry.position} on the waitlist"
+            button_text = "Leave Waitlist"
+
+        # Queue positions are shown on the event page
+        Events.objects.filter(pk=event_id).update(updated_at=timezone.now())
+
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'on_waitlist': entry is not None,
+        'position': entry.position if entry else None,
+        'waitlist_count': event.waitlist.count(),
+        'button_text': button_text,
+    })
+
+@login_required
+@require_http_methods(["POST"])
+@retry_on_locked
 def cancel_event(request, event_id):
     """Cancel an event."""
     event = get_object_or_404(Events, pk=event_id)
@@ -260,7 +534,9 @@ def cancel_event(request, event_id):
         }, status=403)
     
     event.is_cancelled = True
-    event.save()
+    with transaction.atomic():
+        event.save()
+        enqueue_event_changes([event.id], cancelled=True, actor=request.user)
     
     return JsonResponse({
         'success': True,
@@ -275,11 +551,9 @@ def user_profile(request, username=None):
     else:
         user = request.user
     
-    # Get user's hosted events
-    hosted_events = Events.objects.filter(host=user).select_related('host').prefetch_related('attendees').order_by('-date')[:5]
-    
-    # Get user's attended events
-    attended_events = user.attending.all().select_related('host').prefetch_related('attendees').order_by('-date')[:5]
+    # Latest hosted and attended events, straight from the user's agenda
+    hosted_events = agenda.events_for(agenda.recent_entries(user, 5, hosting=True))
+    attended_events = agenda.events_for(agenda.recent_entries(user, 5))
     
     context = {
         'profile_user': user,
@@ -288,7 +562,7 @@ def user_profile(request, username=None):
         'is_own_profile': user == request.user,
     }
     
-    return render(request, "sports/profile.html", context)
+    return _render(request, "sports/profile.html", context)
 
 @login_required
 def edit_profile(request):
@@ -303,46 +577,60 @@ def edit_profile(request):
     else:
         form = UserProfileForm(instance=request.user)
     
-    return render(request, "sports/edit_profile.html", {'form': form})
+    return _render(request, "sports/edit_profile.html", {'form': form})
 
 @login_required
 def my_events(request):
     """Display user's events (hosted and attending)."""
-    now = timezone.now()
-
-    # Hosted events
-    hosted = Events.objects.filter(
-        host=request.user, 
-        timestamp__gte=now
-    ).select_related('host').prefetch_related('attendees').order_by('date', 'start')
-    
-    # Attending events
-    attending = request.user.attending.filter(
-        timestamp__gte=now
-    ).exclude(host=request.user).select_related('host').prefetch_related('attendees').order_by('date', 'start')
+    # One range scan of the agenda index, then the events by primary key
+    entries = list(agenda.upcoming_entries(request.user))
+    events = agenda.events_for(entries, Events.objects.select_related('host').with_attendee_count())
+    is_host = dict(entries)
     
     context = {
-        'hosted_events': hosted,
-        'attending_events': attending,
+        'hosted_events': [event for event in events if is_host[event.pk]],
+        'attending_events': [event for event in events if not is_host[event.pk]],
     }
     
-    return render(request, "sports/my_events.html", context)
+    return _render(request, "sports/my_events.html", context)
 
 def past_events(request):
     """Display past events."""
     now = timezone.now()
     events = Events.objects.filter( 
-        timestamp__lt=now
+        timestamp__lt=now,
+        is_archived=False
     ).select_related('host').prefetch_related('attendees').order_by('-date')
     
     paginator = Paginator(events, 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    return render(request, "sports/past_events.html", {'page_obj': page_obj})
+    return _render(request, "sports/past_events.html", {'page_obj': page_obj})
+
+# Upper bound on each list of the live page
+LIVE_EVENTS_LIMIT = 24
+
+def live_events(request):
+    """Events happening now and those starting within the next few hours."""
+    try:
+        hours = min(max(int(request.GET.get('hours', 2)), 1), 24)
+    except ValueError:
+        hours = 2
+    now = timezone.now()
+    # Both lists are range scans of events_listed_start_idx
+    events = Events.objects.select_related('host').with_attendee_count()
+    return _render(request, "sports/live_events.html", {
+        'live': events.live(now)[:LIVE_EVENTS_LIMIT],
+        'starting_soon': events.starting_soon(now, within=timedelta(hours=hours))[:LIVE_EVENTS_LIMIT],
+        'hours': hours,
+    })
 
 @login_required
 @require_http_methods(["POST"])
+@rate_limit('comment')
+@shed_load
+@retry_on_locked
 def add_comment(request, event_id):
     """Add a comment to an event."""
     event = get_object_or_404(Events, pk=event_id)
@@ -352,15 +640,18 @@ def add_comment(request, event_id):
         comment = form.save(commit=False)
         comment.event = event
         comment.author = request.user
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            enqueue_event_changes([event.id], comments=1, actor=request.user)
         
         # Prepare data for AJAX response
+        author = user_cards.card_for(request.user)
         return JsonResponse({
             'success': True,
             'comment': {
-                'author': comment.author.username,
-                'author_pic_url': _get_profile_picture_url(comment.author),
-                'author_profile_url': reverse('user_profile', args=[comment.author.username]),
+                'author': author.username,
+                'author_pic_url': author.avatar_url,
+                'author_profile_url': author.profile_url,
                 'content': comment.content,
                 # Use a cross-platform compatible way to format time.
                 # The '%-I' format code is not supported on Windows.
@@ -374,7 +665,63 @@ def add_comment(request, event_id):
         'message': 'Invalid comment content.'
     }, status=400)
 
+@staff_member_required
+def export_events(request):
+    """Stream every event as NDJSON or CSV, optionally gzipped, for analytics."""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unknown export format.")
+    compress = request.GET.get('gzip') == '1'
+
+    filename = f"events.{export_format}"
+    content_type = EXPORT_FORMATS[export_format]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(
+        export_event_blocks(export_format, compress=compress),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@staff_member_required
+def analytics_dashboard(request):
+    """Fill rates and activity per category and week, read from the rollups only."""
+    try:
+        weeks = min(max(int(request.GET.get('weeks', 12)), 1), 104)
+    except ValueError:
+        weeks = 12
+    category = request.GET.get('category', '')
+    if category not in dict(SPORTS):
+        category = ''
+
+    since = rollups.week_of(timezone.now()) - timedelta(weeks=weeks - 1)
+    stats = CategoryWeekStats.objects.filter(week__gte=since)
+    if category:
+        stats = stats.filter(category=category)
+    stats = list(stats)
+
+    totals = {}
+    for row in stats:
+        total = totals.setdefault(row.category, CategoryWeekStats(category=row.category))
+        for field in rollups.COUNTERS:
+            setattr(total, field, getattr(total, field) + getattr(row, field))
+
+    progress = RollupProgress.objects.filter(pk=1).first()
+    return _render(request, "sports/dashboard.html", {
+        'stats': stats,
+        'totals': sorted(totals.values(), key=lambda total: -total.events_created),
+        'weeks': weeks,
+        'category': category,
+        'categories': SPORTS,
+        'backfill_pending': progress is not None and not progress.complete,
+    })
+
 # Authentication views
+@rate_limit('login', per_user=False)
+@shed_load
 def login_view(request):
     """User login."""
     if request.method == "POST":
@@ -395,9 +742,9 @@ def login_view(request):
             return redirect(next_url)
         else:
             messages.error(request, "Invalid username or password.")
-            return render(request, "sports/login.html")
+            return _render(request, "sports/login.html")
     
-    return render(request, "sports/login.html")
+    return _render(request, "sports/login.html")
 
 def logout_view(request):
     """User logout."""
@@ -418,4 +765,4 @@ def register(request):
     else:
         form = CustomUserCreationForm()
     
-    return render(request, "sports/register.html", {'form': form})
+    return _render(request, "sports/register.html", {'form': form})